@@ -70,8 +70,14 @@ for col in df_imputed.columns:
 df_imputed.columns = _clean_cols
 
 df_imputed = df_imputed.iloc[:50, :]
+
+# 同时保留未插补的版本（缺失值保持为空），供EM参数学习按真实缺失处理
+df_missing = pd.DataFrame(df.values, columns=_clean_cols, index=df.index).iloc[:50, :]
+df_missing.index.name = df_imputed.index.name
 #输出df_imputed的维度
 print(df_imputed.shape)
 print(df_imputed.head())
 #将df_imputed保存到文件中（保存到脚本同目录）
-df_imputed.to_csv(BASE_DIR / '缩减数据_规格.csv', index=True)
\ No newline at end of file
+df_imputed.to_csv(BASE_DIR / '缩减数据_规格.csv', index=True)
+df_missing.to_csv(BASE_DIR / '缩减数据_规格_含缺失.csv', index=True)
+print('未插补数据缺失值数量:', int(df_missing.isna().sum().sum()))
\ No newline at end of file
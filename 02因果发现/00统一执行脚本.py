@@ -12,6 +12,7 @@ import os
 import sys
 import subprocess
 import time
+import argparse
 from datetime import datetime
 
 def print_header(title):
@@ -25,7 +26,7 @@ def print_step(step_num, total_steps, algorithm_name):
     print(f"\n[步骤 {step_num}/{total_steps}] 正在执行: {algorithm_name}")
     print("-" * 60)
 
-def run_algorithm_script(script_path, algorithm_name):
+def run_algorithm_script(script_path, algorithm_name, extra_args=None):
     """运行单个算法脚本"""
     start_time = time.time()
     
@@ -39,8 +40,10 @@ def run_algorithm_script(script_path, algorithm_name):
         print(f"📄 脚本路径: {script_path}")
         
         # 运行脚本
+        if extra_args:
+            print(f"⚙️  运行参数: {' '.join(extra_args)}")
         result = subprocess.run(
-            [sys.executable, script_path],
+            [sys.executable, script_path] + (extra_args or []),
             capture_output=True,
             text=True,
             encoding='utf-8'
@@ -130,7 +133,23 @@ def check_results(script_dir):
     
     return results_summary
 
-def run_all_algorithms():
+def build_budget_args(algorithm, time_window, n_jobs=None):
+    """
+    按夜间时间窗口为支持随时模式的算法分配时间预算
+    
+    预算 = 时间窗口 × 算法占比；同时开启 --resume，
+    使得上一晚未完成的搜索从检查点继续（数据或搜索设置变化时检查点指纹不匹配，重新搜索）。
+    支持并行评分的算法（GES）额外传入进程数。
+    """
+    args = []
+    share = algorithm.get("budget_share")
+    if time_window is not None and share:
+        args += ["--time-budget", f"{time_window * share:.0f}", "--resume"]
+    if n_jobs and algorithm.get("parallel"):
+        args += ["--n-jobs", str(n_jobs)]
+    return args or None
+
+def run_all_algorithms(time_window=None, n_jobs=None):
     """运行所有算法"""
     print_header("02阶段 因果发现算法 统一执行")
     
@@ -149,18 +168,21 @@ def run_all_algorithms():
             "name": "02 爬山算法 (Hill Climbing)",
             "script": "02爬山算法.py", 
             "description": "使用爬山搜索算法，基于AIC-D评分标准",
-            "required": True
+            "required": True,
+            "budget_share": 0.4  # 时间窗口中分配给爬山算法的比例
         },
         {
             "name": "03 贪婪等价搜索 (GES)",
             "script": "03贪婪等价搜索.py",
             "description": "使用贪婪等价搜索算法，基于AIC-D评分标准",
-            "required": True
+            "required": True,
+            "budget_share": 0.4,  # 时间窗口中分配给GES的比例
+            "parallel": True  # 支持候选算子并行评分
         },
         {
             "name": "04 树搜索 (TAN方法)",
             "script": "04树搜索.py",
-            "description": "使用树增强朴素贝叶斯方法，以第一个节点为根",
+            "description": "使用树增强朴素贝叶斯方法，根节点取最上游领域层级",
             "required": True
         },
         {
@@ -185,6 +207,8 @@ def run_all_algorithms():
     
     print(f"📂 工作目录: {script_dir}")
     print(f"🔢 发现 {len(algorithms)} 个算法")
+    if time_window is not None:
+        print(f"⏰ 时间窗口: {time_window:.0f}秒（爬山算法/GES按占比分配预算，超出预算返回当前最优结构）")
     
     # 询问是否执行专家在循环算法
     expert_algorithm = next((alg for alg in algorithms if "专家在循环" in alg["name"]), None)
@@ -220,7 +244,9 @@ def run_all_algorithms():
         script_path = os.path.join(script_dir, algorithm["script"])
         
         # 执行算法
-        success, exec_time, status = run_algorithm_script(script_path, algorithm["name"])
+        success, exec_time, status = run_algorithm_script(
+            script_path, algorithm["name"], build_budget_args(algorithm, time_window, n_jobs)
+        )
         
         # 记录执行结果
         execution_results.append({
@@ -273,8 +299,15 @@ def run_all_algorithms():
         return False
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="02阶段 因果发现算法 统一执行")
+    parser.add_argument('--time-window', type=float, default=None,
+                        help="夜间时间窗口（秒），爬山算法和GES按占比分配时间预算")
+    parser.add_argument('--n-jobs', type=int, default=None,
+                        help="GES并行评分的进程数")
+    args = parser.parse_args()
+    
     try:
-        success = run_all_algorithms()
+        success = run_all_algorithms(time_window=args.time_window, n_jobs=args.n_jobs)
         
         if success:
             print(f"\n✅ 06 统一执行脚本完成！所有算法执行成功")
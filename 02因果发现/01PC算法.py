@@ -16,6 +16,7 @@ import networkx as nx
 from datetime import datetime
 import numpy as np
 from pgmpy.estimators import PC
+from 领域约束 import build_expert_knowledge, enforce_constraints_on_dag
 
 # 设置中文字体
 import matplotlib
@@ -168,9 +169,15 @@ def run_pc_algorithm():
     # 3. 初始化PC算法估计器
     print("正在运行PC算法...")
     est = PC(data=df)
-    
-    # 4. 运行估计算法
-    estimated_model = est.estimate(variant="stable", ci_test="chi_square", significance_level=0.05)
+    expert_knowledge, _ = build_expert_knowledge(df.columns, temporal=True)
+    
+    # 4. 运行估计算法：领域约束只参与定向，不在检验前从骨架中删除跨层级的变量对
+    estimated_model = est.estimate(variant="stable", ci_test="chi_square", significance_level=0.05,
+                                   expert_knowledge=expert_knowledge,
+                                   enforce_expert_knowledge=False)
+    if expert_knowledge is not None:
+        # 碰撞点等已定向的边若违反层级方向：反向合法则反转，否则删除
+        estimated_model, _ = enforce_constraints_on_dag(estimated_model, df.columns)
     
     # 5. 获取结果
     edges_list = list(estimated_model.edges())
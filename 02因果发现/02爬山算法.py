@@ -18,7 +18,11 @@ import networkx as nx
 import os
 import time
 import json
+import argparse
 from datetime import datetime
+from 领域约束 import estimate_with_constraints, load_tier_constraints
+from 随时搜索 import AnytimeHillClimbSearch, save_score_trajectory
+from 候选父节点 import select_candidate_parents
 
 # 设置中文字体
 import matplotlib
@@ -153,7 +157,8 @@ def save_dag_results(dag, output_folder, df_columns):
     
     return txt_file, csv_file, graph_file, json_file, results
 
-def run_hillclimbing_algorithm():
+def run_hillclimbing_algorithm(time_budget=None, max_iter=None, resume=False, checkpoint_interval=60,
+                               candidate_method=None, max_candidates=10, max_indegree=None):
     """运行爬山算法"""
     print("=" * 60)
     print("02 爬山算法 (Hill Climbing Search) - 开始执行")
@@ -170,8 +175,32 @@ def run_hillclimbing_algorithm():
     start_time = time.time()
     
     try:
-        hc = HillClimbSearch(df)
-        dag = hc.estimate(scoring_method='aic-d')
+        if time_budget is not None or max_iter is not None or resume or candidate_method:
+            # 随时模式：按预算搜索，定期保存检查点并记录评分轨迹
+            forbidden_edges, required_edges = load_tier_constraints(df.columns)
+            candidate_parents = None
+            if candidate_method:
+                # 两阶段模式：先筛选候选父节点，再只在候选集合内搜索
+                candidate_parents = select_candidate_parents(df, candidate_method, max_candidates, forbidden_edges)
+                max_indegree = max_indegree or 5
+                print(f"最大入度: {max_indegree}")
+            search = AnytimeHillClimbSearch(df, scoring_method='aic-d',
+                                            forbidden_edges=forbidden_edges,
+                                            required_edges=required_edges,
+                                            candidate_parents=candidate_parents,
+                                            max_indegree=max_indegree)
+            dag = search.estimate(
+                time_budget=time_budget,
+                max_iter=max_iter,
+                checkpoint_file=os.path.join(output_dir, "HillClimbing_AIC-D_检查点.json"),
+                checkpoint_interval=checkpoint_interval,
+                resume=resume
+            )
+            trajectory_csv, _ = save_score_trajectory(search, output_dir, "HillClimbing_AIC-D")
+            print(f"✓ 停止原因: {search.stop_reason}，评分轨迹: {trajectory_csv}")
+        else:
+            hc = HillClimbSearch(df)
+            dag = estimate_with_constraints(hc, df.columns, scoring_method='aic-d')
         
         end_time = time.time()
         execution_time = end_time - start_time
@@ -208,9 +237,31 @@ def run_hillclimbing_algorithm():
         print(f"❌ 爬山算法执行失败: {str(e)}")
         raise
 
+def parse_args():
+    """解析命令行参数（不指定预算时按原方式运行到收敛）"""
+    parser = argparse.ArgumentParser(description="02 爬山算法")
+    parser.add_argument('--time-budget', type=float, default=None, help="墙钟时间预算（秒）")
+    parser.add_argument('--max-iter', type=int, default=None, help="累计迭代上限")
+    parser.add_argument('--resume', action='store_true', help="从检查点恢复继续搜索")
+    parser.add_argument('--checkpoint-interval', type=float, default=60, help="检查点保存间隔（秒）")
+    parser.add_argument('--candidate-parents', choices=['mi', 'pc'], default=None,
+                        help="两阶段模式：按互信息(mi)或PC骨架(pc)筛选候选父节点")
+    parser.add_argument('--max-candidates', type=int, default=10, help="每个节点的候选父节点上限（pc 按互信息截取骨架邻居）")
+    parser.add_argument('--max-indegree', type=int, default=None, help="最大入度（两阶段模式默认5）")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        output_dir, edge_count = run_hillclimbing_algorithm()
+        output_dir, edge_count = run_hillclimbing_algorithm(
+            time_budget=args.time_budget,
+            max_iter=args.max_iter,
+            resume=args.resume,
+            checkpoint_interval=args.checkpoint_interval,
+            candidate_method=args.candidate_parents,
+            max_candidates=args.max_candidates,
+            max_indegree=args.max_indegree
+        )
         print(f"\n✅ 02 爬山算法执行成功！发现 {edge_count} 条因果边")
     except Exception as e:
         print(f"\n❌ 02 爬山算法执行失败: {str(e)}")
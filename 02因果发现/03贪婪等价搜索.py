@@ -16,7 +16,12 @@ import networkx as nx
 import os
 import time
 import json
+import argparse
 from datetime import datetime
+from 领域约束 import estimate_with_constraints, load_tier_constraints
+from 随时搜索 import AnytimeGES, save_score_trajectory
+from 并行GES import ParallelGES
+from 候选父节点 import select_candidate_parents
 
 # 设置中文字体
 import matplotlib
@@ -151,7 +156,8 @@ def save_dag_results(dag, output_folder, df_columns):
     
     return txt_file, csv_file, graph_file, json_file, results
 
-def run_ges_algorithm():
+def run_ges_algorithm(time_budget=None, max_iter=None, resume=False, checkpoint_interval=60, n_jobs=None,
+                      candidate_method=None, max_candidates=10, max_indegree=None):
     """运行贪婪等价搜索算法"""
     print("=" * 60)
     print("03 贪婪等价搜索 (GES) - 开始执行")
@@ -168,8 +174,37 @@ def run_ges_algorithm():
     start_time = time.time()
     
     try:
-        ges = GES(df)
-        dag = ges.estimate(scoring_method='aic-d')
+        if time_budget is not None or max_iter is not None or resume or n_jobs or candidate_method:
+            # 随时模式：按预算搜索，定期保存检查点并记录评分轨迹
+            forbidden_edges, required_edges = load_tier_constraints(df.columns)
+            search_kwargs = dict(scoring_method='aic-d',
+                                 forbidden_edges=forbidden_edges,
+                                 required_edges=required_edges,
+                                 max_indegree=max_indegree)
+            if candidate_method:
+                # 两阶段模式：先筛选候选父节点，再只在候选集合内搜索
+                search_kwargs['candidate_parents'] = select_candidate_parents(
+                    df, candidate_method, max_candidates, forbidden_edges)
+                search_kwargs['max_indegree'] = max_indegree or 5
+                print(f"最大入度: {search_kwargs['max_indegree']}")
+            if n_jobs and n_jobs > 1:
+                # 每一步的候选算子分批并行评分，结果与串行搜索一致
+                print(f"使用 {n_jobs} 个进程并行评分候选算子")
+                search = ParallelGES(df, n_jobs=n_jobs, **search_kwargs)
+            else:
+                search = AnytimeGES(df, **search_kwargs)
+            dag = search.estimate(
+                time_budget=time_budget,
+                max_iter=max_iter,
+                checkpoint_file=os.path.join(output_dir, "GreedyEquivalence_AIC-D_检查点.json"),
+                checkpoint_interval=checkpoint_interval,
+                resume=resume
+            )
+            trajectory_csv, _ = save_score_trajectory(search, output_dir, "GreedyEquivalence_AIC-D")
+            print(f"✓ 停止原因: {search.stop_reason}，评分轨迹: {trajectory_csv}")
+        else:
+            ges = GES(df)
+            dag = estimate_with_constraints(ges, df.columns, scoring_method='aic-d')
         
         end_time = time.time()
         execution_time = end_time - start_time
@@ -206,9 +241,33 @@ def run_ges_algorithm():
         print(f"❌ 贪婪等价搜索执行失败: {str(e)}")
         raise
 
+def parse_args():
+    """解析命令行参数（不指定预算时按原方式运行到收敛）"""
+    parser = argparse.ArgumentParser(description="03 贪婪等价搜索")
+    parser.add_argument('--time-budget', type=float, default=None, help="墙钟时间预算（秒）")
+    parser.add_argument('--max-iter', type=int, default=None, help="累计迭代上限")
+    parser.add_argument('--resume', action='store_true', help="从检查点恢复继续搜索")
+    parser.add_argument('--checkpoint-interval', type=float, default=60, help="检查点保存间隔（秒）")
+    parser.add_argument('--candidate-parents', choices=['mi', 'pc'], default=None,
+                        help="两阶段模式：按互信息(mi)或PC骨架(pc)筛选候选父节点")
+    parser.add_argument('--max-candidates', type=int, default=10, help="每个节点的候选父节点上限（pc 按互信息截取骨架邻居）")
+    parser.add_argument('--max-indegree', type=int, default=None, help="最大入度（两阶段模式默认5）")
+    parser.add_argument('--n-jobs', type=int, default=None, help="并行评分的进程数（>1 时启用并行GES）")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        output_dir, edge_count = run_ges_algorithm()
+        output_dir, edge_count = run_ges_algorithm(
+            time_budget=args.time_budget,
+            max_iter=args.max_iter,
+            resume=args.resume,
+            checkpoint_interval=args.checkpoint_interval,
+            n_jobs=args.n_jobs,
+            candidate_method=args.candidate_parents,
+            max_candidates=args.max_candidates,
+            max_indegree=args.max_indegree
+        )
         print(f"\n✅ 03 贪婪等价搜索执行成功！发现 {edge_count} 条因果边")
     except Exception as e:
         print(f"\n❌ 03 贪婪等价搜索执行失败: {str(e)}")
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 """
 04 树搜索 (Tree Search)
-非交互式版本，使用TAN方法，默认第一个节点作为根节点
+非交互式版本，使用TAN方法，根节点取最上游领域层级的第一个变量
 
 作者: 因果发现系统
 日期: 2025年
@@ -17,6 +17,9 @@ import os
 import time
 import json
 from datetime import datetime
+import argparse
+from 领域约束 import select_top_tier_root, top_tier_variables, enforce_constraints_on_dag
+from 互信息矩阵 import AllRootsTAN
 
 # 设置中文字体
 import matplotlib
@@ -156,7 +159,28 @@ def save_tree_results(model, output_folder, df_columns, root_node):
     
     return txt_file, csv_file, graph_file, json_file, results
 
-def run_tree_search_algorithm():
+def run_all_roots_tan(df, output_dir, n_jobs=None):
+    """
+    全根节点TAN：一次计算互信息矩阵，为每个候选根节点构建TAN并按似然排序
+    
+    Returns:
+        tuple: (最优DAG, 最优根节点)
+    """
+    candidate_roots = top_tier_variables(df.columns)
+    print(f"候选根节点: {len(candidate_roots)} 个（最上游领域层级）")
+    
+    tan = AllRootsTAN(df, n_jobs=n_jobs)
+    model, ranking = tan.estimate(candidate_roots)
+    root_node = ranking.loc[0, "根节点"]
+    
+    ranking_file = os.path.join(output_dir, "TAN_根节点排序.csv")
+    ranking.to_csv(ranking_file, index=False, encoding="utf-8-sig")
+    print(f"✓ 根节点排序已保存: {ranking_file}")
+    print(f"✓ 最优根节点: {root_node} (评分 {ranking.loc[0, '总评分']:.4f})")
+    
+    return model, root_node
+
+def run_tree_search_algorithm(all_roots=False, n_jobs=None):
     """运行树搜索算法"""
     print("=" * 60)
     print("04 树搜索 (Tree Search - TAN) - 开始执行")
@@ -168,17 +192,25 @@ def run_tree_search_algorithm():
     # 2. 创建输出文件夹
     output_dir = create_output_folder()
     
-    # 3. 使用第一个节点作为根节点
-    root_node = df.columns[0]
-    print(f"使用根节点: {root_node}")
+    # 3. 从最上游领域层级中选择根节点（TAN的根节点指向所有变量）
+    root_node = select_top_tier_root(df.columns)
+    if not all_roots:
+        print(f"使用根节点: {root_node}")
     
     # 4. 运行TAN算法
     print("正在运行树搜索 (TAN算法)...")
     start_time = time.time()
     
     try:
-        ts = TreeSearch(df)
-        model = ts.estimate(estimator_type='tan', class_node=root_node)
+        if all_roots:
+            # 全根节点模式：共享一次互信息计算，由数据选择根节点
+            model, root_node = run_all_roots_tan(df, output_dir, n_jobs)
+        else:
+            ts = TreeSearch(df)
+            model = ts.estimate(estimator_type='tan', class_node=root_node)
+        
+        # TreeSearch 不支持专家知识，对树结构做事后约束修正
+        model, _ = enforce_constraints_on_dag(model, df.columns)
         
         end_time = time.time()
         execution_time = end_time - start_time
@@ -216,9 +248,18 @@ def run_tree_search_algorithm():
         print(f"❌ 树搜索执行失败: {str(e)}")
         raise
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="04 树搜索 (TAN)")
+    parser.add_argument('--all-roots', action='store_true',
+                        help="为所有候选根节点构建TAN并按似然选择根节点")
+    parser.add_argument('--n-jobs', type=int, default=None, help="全根节点模式的并行线程数")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        output_dir, edge_count = run_tree_search_algorithm()
+        output_dir, edge_count = run_tree_search_algorithm(all_roots=args.all_roots, n_jobs=args.n_jobs)
         print(f"\n✅ 04 树搜索执行成功！发现 {edge_count} 条因果边")
     except Exception as e:
         print(f"\n❌ 04 树搜索执行失败: {str(e)}")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并行GES (Parallel Greedy Equivalence Search)
+在每一步中把所有候选算子需要的局部评分分批交给工作进程计算
+
+    1. 主进程按固定顺序枚举当前阶段全部合法算子（加边/删边/反转）；
+       成环检查查每阶段一次递推的可达集合表，不再逐对调用 nx.has_path
+    2. 收集算子涉及的 (变量, 父节点集合) 评分键，去掉共享缓存中已有的
+    3. 未缓存的键分批并行计算，结果合并回主进程缓存
+    4. 按枚举顺序取评分提升最大的算子（相同提升取先出现者）
+
+评分函数与串行版本完全相同，选择规则也相同，因此搜索路径与
+随时搜索.AnytimeGES 一致，检查点可以在两者之间互相恢复。
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from 结构评分 import LocalScorer
+from 随时搜索 import AnytimeGES
+
+# 工作进程内的评分器（由 initializer 构建，每个进程只编码一次）
+_WORKER_SCORER = None
+
+
+def _init_worker(variables, codes, cardinality, scoring_method):
+    global _WORKER_SCORER
+    _WORKER_SCORER = LocalScorer.from_arrays(variables, codes, cardinality, scoring_method)
+
+
+def _score_batch(keys):
+    """工作进程：计算一批局部评分"""
+    return [(key, _WORKER_SCORER.local_score(key[0], key[1])) for key in keys]
+
+
+class ParallelGES(AnytimeGES):
+    """候选算子并行评分的GES"""
+
+    def __init__(self, data, n_jobs=None, min_parallel_keys=32, **kwargs):
+        """
+        Args:
+            data: pd.DataFrame，离散数据
+            n_jobs: 工作进程数，默认使用全部CPU
+            min_parallel_keys: 未缓存评分键少于该值时直接在主进程计算
+            **kwargs: 传给 AnytimeGES 的参数（评分方法、约束、入度上限等）
+        """
+        super().__init__(data, **kwargs)
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.min_parallel_keys = min_parallel_keys
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.n_jobs,
+                initializer=_init_worker,
+                initargs=(self.scorer.variables, self.scorer.codes,
+                          self.scorer.cardinality, self.scoring_method)
+            )
+        return self._executor
+
+    def _ensure_scored(self, keys):
+        """并行计算缓存中缺失的局部评分并合并回共享缓存"""
+        cache = self.scorer.cache
+        missing = [key for key in dict.fromkeys(keys) if key not in cache]
+        if not missing:
+            return
+
+        if self.n_jobs <= 1 or len(missing) < self.min_parallel_keys:
+            for variable, parents in missing:
+                self.scorer.local_score(variable, parents)
+            return
+
+        # 每个进程约分配4批，兼顾负载均衡与进程间通信开销
+        n_batches = min(len(missing), self.n_jobs * 4)
+        batches = [missing[i::n_batches] for i in range(n_batches)]
+        for scored in self._get_executor().map(_score_batch, batches):
+            self.scorer.update_cache(scored)
+
+    def _enumerate_phase_ops(self):
+        """按与串行版本相同的顺序枚举当前阶段的合法算子及其评分键"""
+        phase = self.PHASES[self.phase]
+        make_key = self.scorer.make_key
+        ops, keys = [], []
+
+        if phase == 'forward':
+            reach = self._reachability()
+            for counter, (u, v) in enumerate(self._add_pairs(), 1):
+                self._check_budget(counter)
+                if self._can_add(u, v, reach):
+                    parents = self._parents(v)
+                    ops.append(('+', (u, v)))
+                    keys += [make_key(v, parents + [u]), make_key(v, parents)]
+        elif phase == 'backward':
+            for u, v in list(self.graph.edges()):
+                if self._can_remove(u, v):
+                    parents = self._parents(v)
+                    ops.append(('-', (u, v)))
+                    keys += [make_key(v, [p for p in parents if p != u]), make_key(v, parents)]
+        else:
+            reach = self._reachability()
+            counter = 0
+            for u, v in list(self.graph.edges()):
+                counter += 1
+                self._check_budget(counter)
+                if self._can_flip(u, v, reach):
+                    parents_v, parents_u = self._parents(v), self._parents(u)
+                    ops.append(('flip', (u, v)))
+                    keys += [make_key(v, [p for p in parents_v if p != u]), make_key(v, parents_v),
+                             make_key(u, parents_u + [v]), make_key(u, parents_u)]
+
+        return ops, keys
+
+    def _phase_candidates(self):
+        ops, keys = self._enumerate_phase_ops()
+        self._ensure_scored(keys)
+
+        # 评分已全部命中缓存，下面的增量计算不再触发数据扫描
+        for operation in ops:
+            op, (u, v) = operation
+            if op == '+':
+                yield operation, self._delta_add(u, v)
+            elif op == '-':
+                yield operation, self._delta_remove(u, v)
+            else:
+                yield operation, self._delta_flip(u, v)
+
+    def estimate(self, *args, **kwargs):
+        try:
+            return super().estimate(*args, **kwargs)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+随时搜索 (Anytime Structure Search)
+带时间/迭代预算和断点续跑的爬山搜索与贪婪等价搜索
+
+与 pgmpy 的 HillClimbSearch / GES 使用相同的算子与评分（AIC-D / BIC-D），
+区别在于:
+    - 可设置墙钟时间预算或迭代上限，预算耗尽时返回当前最优DAG
+    - 定期将当前DAG、评分、搜索状态写入检查点文件
+    - 可从检查点恢复继续搜索；检查点记录数据与搜索设置的指纹，
+      数据、候选父节点、约束或搜索参数变化后旧检查点不再复用
+    - 记录每次迭代后的评分轨迹
+"""
+
+import os
+import json
+import time
+import hashlib
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+import matplotlib.pyplot as plt
+from pgmpy.base import DAG
+
+from 结构评分 import LocalScorer
+
+
+class _BudgetExhausted(Exception):
+    """搜索过程中预算耗尽"""
+
+
+class AnytimeStructureSearch(ABC):
+    """随时搜索基类：负责预算控制、检查点与评分轨迹"""
+
+    algorithm_name = "AnytimeSearch"
+
+    def __init__(self, data, scoring_method='aic-d', forbidden_edges=None,
+                 required_edges=None, max_indegree=None, candidate_parents=None, scorer=None):
+        """
+        Args:
+            data: pd.DataFrame，离散数据
+            scoring_method: 'aic-d' 或 'bic-d'
+            forbidden_edges: 禁止边集合（如领域层级约束）
+            required_edges: 必需边列表
+            max_indegree: 最大入度限制
+            candidate_parents: {变量: 候选父节点集合}，None 表示不限制
+            scorer: 可复用的 LocalScorer（共享评分缓存）
+        """
+        self.scoring_method = scoring_method
+        self.scorer = scorer or LocalScorer(data, scoring_method)
+        self.variables = list(self.scorer.variables)
+        self.forbidden = set(map(tuple, forbidden_edges or []))
+        self.required = set(map(tuple, required_edges or []))
+        self.max_indegree = max_indegree
+        self.candidate_parents = candidate_parents
+
+        # 候选模式下预先列出允许的加边 (u, v)，保持与全量枚举相同的先后顺序
+        self._candidate_pairs = None
+        if candidate_parents is not None:
+            self._candidate_pairs = [
+                (u, v) for u in self.variables for v in self.variables
+                if u in candidate_parents.get(v, ())
+            ]
+
+        self.graph = nx.DiGraph()
+        self.graph.add_nodes_from(self.variables)
+        self.graph.add_edges_from(self.required)
+
+        self.current_score = self._total_score()
+        self.iteration = 0
+        self.elapsed = 0.0
+        self.trajectory = [self._trajectory_point("初始化")]
+        self.converged = False
+        self.stop_reason = None
+        self._deadline = None
+
+    # ------------------------------------------------------------
+    # 评分与合法性检查
+    # ------------------------------------------------------------
+
+    def _parents(self, node):
+        return list(self.graph.predecessors(node))
+
+    def _total_score(self):
+        return sum(self.scorer.local_score(v, self._parents(v)) for v in self.variables)
+
+    def _delta_add(self, u, v):
+        parents = self._parents(v)
+        return self.scorer.local_score(v, parents + [u]) - self.scorer.local_score(v, parents)
+
+    def _delta_remove(self, u, v):
+        parents = self._parents(v)
+        reduced = [p for p in parents if p != u]
+        return self.scorer.local_score(v, reduced) - self.scorer.local_score(v, parents)
+
+    def _delta_flip(self, u, v):
+        return self._delta_remove(u, v) + self._delta_add(v, u)
+
+    def _is_candidate(self, u, v):
+        return self.candidate_parents is None or u in self.candidate_parents.get(v, ())
+
+    def _reachability(self):
+        """
+        当前DAG中每个节点可到达的节点集合（含自身），逆拓扑序一次递推得到；
+        一次枚举中的全部成环检查都查这张表，不再逐对调用 nx.has_path
+        """
+        reach = {}
+        for node in reversed(list(nx.topological_sort(self.graph))):
+            reachable = {node}
+            for child in self.graph.successors(node):
+                reachable |= reach[child]
+            reach[node] = reachable
+        return reach
+
+    def _can_add(self, u, v, reach=None):
+        if u == v or (u, v) in self.forbidden or not self._is_candidate(u, v):
+            return False
+        if self.graph.has_edge(u, v) or self.graph.has_edge(v, u):
+            return False
+        if self.max_indegree is not None and self.graph.in_degree(v) >= self.max_indegree:
+            return False
+        if reach is not None:
+            return u not in reach[v]
+        return not nx.has_path(self.graph, v, u)
+
+    def _can_remove(self, u, v):
+        return (u, v) not in self.required
+
+    def _can_flip(self, u, v, reach=None):
+        if (u, v) in self.required or (v, u) in self.forbidden or not self._is_candidate(v, u):
+            return False
+        if self.max_indegree is not None and self.graph.in_degree(u) >= self.max_indegree:
+            return False
+        # 反转后不成环 ⇔ 去掉 u→v 后不存在其它 u 到 v 的路径，
+        # 即 u 的其它子节点都到达不了 v（DAG 中子节点的路径不会经过 u→v）
+        if reach is not None:
+            return not any(v in reach[w] for w in self.graph.successors(u) if w != v)
+        self.graph.remove_edge(u, v)
+        acyclic = not nx.has_path(self.graph, u, v)
+        self.graph.add_edge(u, v)
+        return acyclic
+
+    def _check_budget(self, counter):
+        """在候选算子枚举过程中定期检查时间预算"""
+        if self._deadline is not None and counter % 256 == 0 and time.time() >= self._deadline:
+            raise _BudgetExhausted()
+
+    def _add_pairs(self):
+        """按固定顺序枚举可能的加边 (u, v)"""
+        if self._candidate_pairs is not None:
+            return iter(self._candidate_pairs)
+        return ((u, v) for u in self.variables for v in self.variables)
+
+    def _candidate_add_ops(self):
+        reach = self._reachability()
+        for counter, (u, v) in enumerate(self._add_pairs(), 1):
+            self._check_budget(counter)
+            if self._can_add(u, v, reach):
+                yield ('+', (u, v)), self._delta_add(u, v)
+
+    def _candidate_remove_ops(self):
+        for u, v in list(self.graph.edges()):
+            if self._can_remove(u, v):
+                yield ('-', (u, v)), self._delta_remove(u, v)
+
+    def _candidate_flip_ops(self):
+        reach = self._reachability()
+        counter = 0
+        for u, v in list(self.graph.edges()):
+            counter += 1
+            self._check_budget(counter)
+            if self._can_flip(u, v, reach):
+                yield ('flip', (u, v)), self._delta_flip(u, v)
+
+    def _apply(self, operation, delta):
+        op, (u, v) = operation
+        if op == '+':
+            self.graph.add_edge(u, v)
+        elif op == '-':
+            self.graph.remove_edge(u, v)
+        else:
+            self.graph.remove_edge(u, v)
+            self.graph.add_edge(v, u)
+        self.current_score += delta
+
+    @abstractmethod
+    def _step(self):
+        """返回 (operation, delta)，无改进算子时返回 None"""
+
+    # ------------------------------------------------------------
+    # 检查点与轨迹
+    # ------------------------------------------------------------
+
+    def _trajectory_point(self, operation):
+        return {
+            "迭代": self.iteration,
+            "耗时秒": round(self.elapsed, 3),
+            "评分": float(self.current_score),
+            "边数": self.graph.number_of_edges(),
+            "操作": operation
+        }
+
+    def _extra_state(self):
+        return {}
+
+    def _search_settings(self):
+        """子类的搜索参数（参与检查点指纹）"""
+        return {}
+
+    def fingerprint(self):
+        """数据（编码后的取值）与搜索设置的指纹"""
+        settings = {
+            "算法": self.algorithm_name,
+            "评分方法": self.scoring_method,
+            "变量": self.variables,
+            "基数": np.asarray(self.scorer.cardinality).tolist(),
+            "禁止边": sorted(map(list, self.forbidden)),
+            "必需边": sorted(map(list, self.required)),
+            "最大入度": self.max_indegree,
+            "候选父节点": (None if self.candidate_parents is None else
+                          {v: sorted(self.candidate_parents.get(v, ())) for v in self.variables}),
+            "搜索参数": self._search_settings()
+        }
+        digest = hashlib.sha256()
+        digest.update(str(self.scorer.codes.shape).encode('utf-8'))
+        digest.update(np.ascontiguousarray(self.scorer.codes).tobytes())
+        digest.update(json.dumps(settings, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def checkpoint_matches(self, checkpoint_file):
+        """检查点是否由相同数据与搜索设置产生（旧版本没有指纹的检查点视为不匹配）"""
+        try:
+            with open(checkpoint_file, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except Exception as e:
+            print(f"⚠ 检查点读取失败: {e}")
+            return False
+        return checkpoint.get("指纹") == self.fingerprint()
+
+    def _restore_extra_state(self, state):
+        pass
+
+    def save_checkpoint(self, checkpoint_file):
+        """保存检查点（先写临时文件再替换，避免中断时损坏）"""
+        checkpoint = {
+            "算法": self.algorithm_name,
+            "评分方法": self.scoring_method,
+            "变量": self.variables,
+            "指纹": self.fingerprint(),
+            "边": [list(e) for e in self.graph.edges()],
+            "评分": float(self.current_score),
+            "迭代次数": self.iteration,
+            "累计耗时秒": round(self.elapsed, 3),
+            "已收敛": self.converged,
+            "停止原因": self.stop_reason,
+            "搜索状态": self._extra_state(),
+            "评分轨迹": self.trajectory,
+            "保存时间": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(checkpoint_file)), exist_ok=True)
+        tmp_file = checkpoint_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, checkpoint_file)
+
+    def load_checkpoint(self, checkpoint_file):
+        """从检查点恢复搜索状态"""
+        with open(checkpoint_file, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+
+        if checkpoint.get("算法") != self.algorithm_name:
+            raise ValueError(f"检查点算法不匹配: {checkpoint.get('算法')} != {self.algorithm_name}")
+        if checkpoint.get("评分方法") != self.scoring_method:
+            raise ValueError(f"检查点评分方法不匹配: {checkpoint.get('评分方法')} != {self.scoring_method}")
+        if checkpoint.get("变量") != self.variables:
+            raise ValueError("检查点变量与当前数据不一致")
+
+        self.graph = nx.DiGraph()
+        self.graph.add_nodes_from(self.variables)
+        self.graph.add_edges_from(tuple(e) for e in checkpoint["边"])
+        self.graph.add_edges_from(self.required)
+
+        self.current_score = self._total_score()
+        self.iteration = checkpoint.get("迭代次数", 0)
+        self.elapsed = checkpoint.get("累计耗时秒", 0.0)
+        self.converged = checkpoint.get("已收敛", False)
+        self.trajectory = checkpoint.get("评分轨迹", [])
+        self._restore_extra_state(checkpoint.get("搜索状态", {}))
+        self.trajectory.append(self._trajectory_point("从检查点恢复"))
+
+        print(f"✓ 已从检查点恢复: 迭代 {self.iteration}, 评分 {self.current_score:.4f}, "
+              f"边数 {self.graph.number_of_edges()}")
+
+    # ------------------------------------------------------------
+    # 主流程
+    # ------------------------------------------------------------
+
+    def estimate(self, time_budget=None, max_iter=None, checkpoint_file=None,
+                 checkpoint_interval=60.0, resume=False, verbose=True):
+        """
+        运行随时搜索
+
+        Args:
+            time_budget: 本次运行的墙钟时间预算（秒），None 表示不限
+            max_iter: 累计迭代上限（含恢复前的迭代），None 表示不限
+            checkpoint_file: 检查点文件路径，None 表示不保存
+            checkpoint_interval: 检查点保存间隔（秒）
+            resume: 是否从检查点恢复（指纹与当前数据/设置不一致时忽略检查点，重新搜索）
+            verbose: 是否打印进度
+
+        Returns:
+            DAG: 当前最优DAG
+        """
+        if resume and checkpoint_file and os.path.exists(checkpoint_file):
+            if self.checkpoint_matches(checkpoint_file):
+                self.load_checkpoint(checkpoint_file)
+            else:
+                print("⚠ 检查点与当前数据或搜索设置不一致，忽略检查点重新搜索")
+            if self.converged:
+                print("✓ 检查点中的搜索已收敛，直接返回结果")
+                self.stop_reason = "已收敛"
+                return self.to_dag()
+
+        start = time.time()
+        base_elapsed = self.elapsed
+        last_checkpoint = start
+        self._deadline = start + time_budget if time_budget is not None else None
+
+        try:
+            while True:
+                if max_iter is not None and self.iteration >= max_iter:
+                    self.stop_reason = "达到迭代上限"
+                    break
+                if self._deadline is not None and time.time() >= self._deadline:
+                    raise _BudgetExhausted()
+
+                best = self._step()
+                if best is None:
+                    self.converged = True
+                    self.stop_reason = "已收敛"
+                    break
+
+                operation, delta = best
+                self._apply(operation, delta)
+                self.iteration += 1
+                self.elapsed = base_elapsed + time.time() - start
+                op, (u, v) = operation
+                self.trajectory.append(self._trajectory_point(f"{op} {u} -> {v}"))
+
+                if verbose and self.iteration % 10 == 0:
+                    print(f"  迭代 {self.iteration}: 评分 {self.current_score:.4f}, "
+                          f"边数 {self.graph.number_of_edges()}, 耗时 {self.elapsed:.1f}秒")
+
+                if checkpoint_file and time.time() - last_checkpoint >= checkpoint_interval:
+                    self.save_checkpoint(checkpoint_file)
+                    last_checkpoint = time.time()
+        except _BudgetExhausted:
+            self.stop_reason = "达到时间预算"
+
+        self.elapsed = base_elapsed + time.time() - start
+        self._deadline = None
+
+        if checkpoint_file:
+            self.save_checkpoint(checkpoint_file)
+
+        if verbose:
+            print(f"✓ {self.algorithm_name} 停止: {self.stop_reason}, 迭代 {self.iteration}, "
+                  f"评分 {self.current_score:.4f}, 边数 {self.graph.number_of_edges()}")
+
+        return self.to_dag()
+
+    def to_dag(self):
+        dag = DAG()
+        dag.add_nodes_from(self.variables)
+        dag.add_edges_from(self.graph.edges())
+        return dag
+
+
+class AnytimeHillClimbSearch(AnytimeStructureSearch):
+    """随时爬山搜索：每步在 加边/删边/反转 中选择评分提升最大的算子"""
+
+    algorithm_name = "AnytimeHillClimbSearch"
+
+    def __init__(self, data, tabu_length=100, epsilon=1e-4, **kwargs):
+        super().__init__(data, **kwargs)
+        self.tabu_length = tabu_length
+        self.epsilon = epsilon
+        self.tabu_list = deque(maxlen=tabu_length)
+
+    def _step(self):
+        best, best_delta = None, self.epsilon
+        for candidates in (self._candidate_add_ops(), self._candidate_remove_ops(),
+                           self._candidate_flip_ops()):
+            for operation, delta in candidates:
+                if operation in self.tabu_list:
+                    continue
+                if delta > best_delta:
+                    best, best_delta = operation, delta
+        return (best, best_delta) if best is not None else None
+
+    def _apply(self, operation, delta):
+        super()._apply(operation, delta)
+        op, (u, v) = operation
+        if op == '+':
+            self.tabu_list.append(('-', (u, v)))
+        elif op == '-':
+            self.tabu_list.append(('+', (u, v)))
+        else:
+            self.tabu_list.append(('flip', (v, u)))
+
+    def _extra_state(self):
+        return {"禁忌表": [[op, list(edge)] for op, edge in self.tabu_list]}
+
+    def _search_settings(self):
+        return {"禁忌表长度": self.tabu_length, "epsilon": self.epsilon}
+
+    def _restore_extra_state(self, state):
+        self.tabu_list = deque(((op, tuple(edge)) for op, edge in state.get("禁忌表", [])),
+                               maxlen=self.tabu_length)
+
+
+class AnytimeGES(AnytimeStructureSearch):
+    """随时贪婪等价搜索：依次执行 前向加边 → 后向删边 → 反转 三个阶段"""
+
+    algorithm_name = "AnytimeGES"
+    PHASES = ('forward', 'backward', 'flip')
+
+    def __init__(self, data, min_improvement=1e-6, **kwargs):
+        super().__init__(data, **kwargs)
+        self.min_improvement = min_improvement
+        self.phase = 0
+
+    def _phase_candidates(self):
+        phase = self.PHASES[self.phase]
+        if phase == 'forward':
+            return self._candidate_add_ops()
+        if phase == 'backward':
+            return self._candidate_remove_ops()
+        return self._candidate_flip_ops()
+
+    def _step(self):
+        while self.phase < len(self.PHASES):
+            best, best_delta = None, self.min_improvement
+            for operation, delta in self._phase_candidates():
+                if delta > best_delta:
+                    best, best_delta = operation, delta
+            if best is not None:
+                return best, best_delta
+            self.phase += 1
+        return None
+
+    def _extra_state(self):
+        return {"阶段": self.phase}
+
+    def _search_settings(self):
+        return {"最小改进": self.min_improvement}
+
+    def _restore_extra_state(self, state):
+        self.phase = state.get("阶段", 0)
+
+
+def save_score_trajectory(search, output_folder, prefix):
+    """
+    保存评分轨迹（CSV + 折线图）
+
+    Returns:
+        tuple: (CSV路径, 图片路径)
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    df = pd.DataFrame(search.trajectory)
+    csv_file = os.path.join(output_folder, f"{prefix}_评分轨迹.csv")
+    df.to_csv(csv_file, index=False, encoding='utf-8-sig')
+
+    plot_file = os.path.join(output_folder, f"{prefix}_评分轨迹.png")
+    try:
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ax.plot(df["耗时秒"], df["评分"], marker='o', markersize=3)
+        ax.set_xlabel("耗时 (秒)")
+        ax.set_ylabel(f"评分 ({search.scoring_method.upper()})")
+        ax.set_title(f"{search.algorithm_name} 评分轨迹 - {search.stop_reason}")
+        ax.grid(True, alpha=0.3)
+        plt.tight_layout()
+        plt.savefig(plot_file, dpi=300, bbox_inches='tight')
+        plt.close()
+    except Exception as e:
+        print(f"⚠ 评分轨迹图生成失败: {e}")
+        plot_file = None
+
+    return csv_file, plot_file
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+领域约束 (Domain Tier Constraints)
+根据变量名前缀划分领域层级，生成结构搜索的禁止边/必需边约束
+
+默认层级: 疾病_ → 药物_ → 检验_
+    - 下游层级指向上游层级的边（如 药物→疾病、检验→药物）一律禁止
+    - 同一层级内部、以及未匹配任何前缀的变量不做限制
+层级与额外的必需边/禁止边可通过 领域约束配置.json 调整。
+
+约束在搜索阶段生效（pgmpy ExpertKnowledge），结构搜索不再评估
+不合理方向的算子；估计器不接受 expert_knowledge 参数时（pgmpy 1.1 的 GES）
+改为搜索后由 enforce_constraints_on_dag 修正。
+PC 的层级只用于定向（全部变量都有层级时作为 temporal_order），
+骨架仍对所有变量对做条件独立性检验，定向后违反约束的边由 enforce_constraints_on_dag 修正。
+"""
+
+import os
+import json
+import inspect
+import networkx as nx
+from pgmpy.base import DAG
+from pgmpy.estimators import ExpertKnowledge
+
+# 默认领域层级（按因果先后顺序，每个层级可包含多个前缀）
+DEFAULT_DOMAIN_TIERS = [['疾病_'], ['药物_'], ['检验_']]
+
+DEFAULT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "领域约束配置.json")
+
+
+def load_constraint_config(config_file=None):
+    """
+    加载领域约束配置
+
+    配置格式:
+        {
+            "启用": true,
+            "层级": [["疾病_"], ["药物_"], ["检验_"]],
+            "必需边": [["疾病_A", "药物_B"]],
+            "禁止边": [["检验_C", "疾病_D"]]
+        }
+
+    Returns:
+        dict: 配置（文件不存在时返回默认配置）
+    """
+    config = {
+        "启用": True,
+        "层级": DEFAULT_DOMAIN_TIERS,
+        "必需边": [],
+        "禁止边": []
+    }
+
+    config_file = config_file or DEFAULT_CONFIG_FILE
+    if os.path.exists(config_file):
+        try:
+            with open(config_file, 'r', encoding='utf-8') as f:
+                config.update(json.load(f))
+        except Exception as e:
+            print(f"⚠ 领域约束配置读取失败，使用默认层级: {e}")
+
+    return config
+
+
+def assign_tiers(columns, tiers=None):
+    """
+    为每个变量分配层级序号
+
+    Args:
+        columns: 变量名列表
+        tiers: 层级前缀列表，如 [['疾病_'], ['药物_'], ['检验_']]
+
+    Returns:
+        dict: {变量名: 层级序号}，未匹配任何前缀的变量不在字典中
+    """
+    tiers = tiers or DEFAULT_DOMAIN_TIERS
+    tier_of = {}
+    for col in columns:
+        for level, prefixes in enumerate(tiers):
+            if any(str(col).startswith(p) for p in prefixes):
+                tier_of[col] = level
+                break
+    return tier_of
+
+
+def derive_tier_constraints(columns, tiers=None, required_edges=None, forbidden_edges=None):
+    """
+    从层级推导禁止边与必需边
+
+    Args:
+        columns: 变量名列表
+        tiers: 层级前缀列表
+        required_edges: 额外的必需边
+        forbidden_edges: 额外的禁止边
+
+    Returns:
+        tuple: (禁止边集合, 必需边列表)
+    """
+    columns = list(columns)
+    column_set = set(columns)
+    tier_of = assign_tiers(columns, tiers)
+
+    # 按层级分组后只枚举 下游层级 × 上游层级，避免 O(n²) 全量枚举
+    members = {}
+    for col, level in tier_of.items():
+        members.setdefault(level, []).append(col)
+
+    forbidden = set()
+    levels = sorted(members)
+    for i, upper in enumerate(levels):
+        for lower in levels[i + 1:]:
+            for source in members[lower]:
+                for target in members[upper]:
+                    forbidden.add((source, target))
+
+    for u, v in forbidden_edges or []:
+        if u in column_set and v in column_set:
+            forbidden.add((u, v))
+
+    required = []
+    for u, v in required_edges or []:
+        if u in column_set and v in column_set:
+            if (u, v) in forbidden:
+                print(f"⚠ 必需边 {u} -> {v} 与层级约束冲突，已忽略")
+                continue
+            required.append((u, v))
+
+    return forbidden, required
+
+
+def load_tier_constraints(columns, config_file=None):
+    """
+    按配置文件推导禁止边与必需边（供自实现的搜索算法直接使用）
+
+    Returns:
+        tuple: (禁止边集合, 必需边列表)，约束未启用时均为空
+    """
+    config = load_constraint_config(config_file)
+    if not config.get("启用", True):
+        return set(), []
+    return derive_tier_constraints(
+        columns, config["层级"], config.get("必需边"), config.get("禁止边")
+    )
+
+
+def tier_temporal_order(columns, tiers=None):
+    """
+    层级 → pgmpy temporal_order（每个层级一组变量）
+
+    Returns:
+        list 或 None: 有变量未匹配任何层级时返回 None（temporal_order 要求覆盖全部变量）
+    """
+    columns = list(columns)
+    tier_of = assign_tiers(columns, tiers)
+    if len(tier_of) != len(columns):
+        return None
+    levels = sorted(set(tier_of.values()))
+    return [[col for col in columns if tier_of[col] == level] for level in levels]
+
+
+def build_expert_knowledge(columns, config_file=None, verbose=True, temporal=False):
+    """
+    构建 pgmpy ExpertKnowledge 对象
+
+    Args:
+        columns: 变量名列表
+        config_file: 领域约束配置文件路径
+        verbose: 是否打印约束统计
+        temporal: 是否同时传入层级顺序 temporal_order（PC 的碰撞点定向与分离集搜索使用）
+
+    Returns:
+        tuple: (ExpertKnowledge 或 None, 约束统计信息dict)
+    """
+    config = load_constraint_config(config_file)
+    if not config.get("启用", True):
+        if verbose:
+            print("领域约束未启用")
+        return None, {"启用": False}
+
+    forbidden, required = derive_tier_constraints(
+        columns, config["层级"], config.get("必需边"), config.get("禁止边")
+    )
+
+    n = len(list(columns))
+    total_directed = n * (n - 1)
+    stats = {
+        "启用": True,
+        "层级": config["层级"],
+        "禁止边数量": len(forbidden),
+        "必需边数量": len(required),
+        "可选有向边数量": total_directed - len(forbidden),
+        "搜索空间缩减比例": round(len(forbidden) / total_directed, 4) if total_directed else 0.0
+    }
+
+    if verbose:
+        print(f"✓ 领域约束: 禁止边 {len(forbidden)} 条, 必需边 {len(required)} 条, "
+              f"有向边搜索空间缩减 {stats['搜索空间缩减比例'] * 100:.1f}%")
+
+    temporal_order = tier_temporal_order(columns, config["层级"]) if temporal else None
+    stats["层级顺序"] = temporal_order is not None
+
+    expert_knowledge = ExpertKnowledge(
+        forbidden_edges=sorted(forbidden),
+        required_edges=required,
+        temporal_order=temporal_order
+    )
+    return expert_knowledge, stats
+
+
+def top_tier_variables(columns, config_file=None):
+    """
+    返回最上游层级中的变量（约束未启用或无变量匹配前缀时返回全部变量）
+
+    TAN 的类节点指向所有其它变量，只有放在最上游层级才不会违反约束。
+    """
+    config = load_constraint_config(config_file)
+    columns = list(columns)
+    if not config.get("启用", True):
+        return columns
+
+    tier_of = assign_tiers(columns, config["层级"])
+    if not tier_of:
+        return columns
+
+    top_level = min(tier_of.values())
+    return [col for col in columns if tier_of.get(col) == top_level]
+
+
+def select_top_tier_root(columns, config_file=None):
+    """为TAN选择根节点：取最上游层级中的第一个变量"""
+    return top_tier_variables(columns, config_file)[0]
+
+
+def enforce_constraints_on_dag(model, columns, config_file=None, verbose=True):
+    """
+    对不支持专家知识的算法（TAN）以及 PC 定向结果做事后约束修正
+
+    违反约束的边：若反向合法且不成环则反转，否则删除；
+    随后补充尚未出现且不成环的必需边。
+
+    Returns:
+        tuple: (修正后的 DAG, 修正统计dict)
+    """
+    config = load_constraint_config(config_file)
+    stats = {"反转边": [], "删除边": [], "补充边": []}
+    if not config.get("启用", True):
+        return model, stats
+
+    forbidden, required = derive_tier_constraints(
+        columns, config["层级"], config.get("必需边"), config.get("禁止边")
+    )
+
+    graph = nx.DiGraph()
+    graph.add_nodes_from(model.nodes())
+    graph.add_edges_from(model.edges())
+
+    for u, v in list(graph.edges()):
+        if (u, v) not in forbidden:
+            continue
+        graph.remove_edge(u, v)
+        if (v, u) not in forbidden and not graph.has_edge(v, u) and not nx.has_path(graph, u, v):
+            graph.add_edge(v, u)
+            stats["反转边"].append((v, u))
+        else:
+            stats["删除边"].append((u, v))
+
+    for u, v in required:
+        if not graph.has_edge(u, v) and not (graph.has_node(v) and graph.has_node(u) and nx.has_path(graph, v, u)):
+            graph.add_edge(u, v)
+            stats["补充边"].append((u, v))
+
+    if verbose:
+        print(f"✓ 领域约束修正: 反转 {len(stats['反转边'])} 条, 删除 {len(stats['删除边'])} 条, "
+              f"补充 {len(stats['补充边'])} 条")
+
+    dag = DAG()
+    dag.add_nodes_from(graph.nodes())
+    dag.add_edges_from(graph.edges())
+    return dag, stats
+
+
+def estimate_with_constraints(estimator, columns, config_file=None, **estimate_kwargs):
+    """
+    运行 pgmpy 评分搜索并施加领域约束
+
+    estimate() 接受 expert_knowledge 参数时在搜索阶段排除禁止边；
+    否则（pgmpy 1.1 起 GES 移除了该参数）不带约束搜索，再用 enforce_constraints_on_dag 修正。
+
+    Returns:
+        DAG: 满足约束的结构
+    """
+    expert_knowledge, _ = build_expert_knowledge(columns, config_file)
+    if expert_knowledge is None:
+        return estimator.estimate(**estimate_kwargs)
+
+    if 'expert_knowledge' in inspect.signature(estimator.estimate).parameters:
+        return estimator.estimate(expert_knowledge=expert_knowledge, **estimate_kwargs)
+
+    print("⚠ 当前 pgmpy 版本的估计器不支持 expert_knowledge，改为搜索后修正约束")
+    dag = estimator.estimate(**estimate_kwargs)
+    dag, _ = enforce_constraints_on_dag(dag, columns, config_file)
+    return dag
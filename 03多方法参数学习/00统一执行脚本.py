@@ -4,6 +4,9 @@
 多方法参数学习统一执行脚本
 依次运行01-06所有参数学习方法和分析脚本
 包括：MLE、Bayesian、EM、SEM、边级似然增益、参数稳定性
+
+--shared 时使用单进程共享上下文：数据、因果边、图与计数表只构建一次，
+四种估计器在线程池中并发运行，结果在内存中直接传给边级似然增益与参数稳定性
 """
 
 import os
@@ -12,6 +15,9 @@ import subprocess
 import time
 from datetime import datetime
 import json
+import argparse
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 
 class ParameterLearningPipeline:
     """参数学习流水线执行器"""
@@ -31,6 +37,7 @@ class ParameterLearningPipeline:
             ("04结构方程模型估计器.py", "结构方程模型 (SEM)"),
             ("05边级似然增益.py", "边级似然增益分析"),
             ("06参数稳定性.py", "参数稳定性分析"),
+            ("07交叉验证.py", "k折交叉验证"),
             ("可视化.py", "参数学习结果可视化")
         ]
         self.execution_log = []
@@ -289,6 +296,7 @@ class ParameterLearningPipeline:
             "04SEM_结果",
             "05边级似然增益结果",
             "06参数稳定性结果",
+            "07交叉验证结果",
             "可视化"
         ]
         
@@ -312,19 +320,279 @@ class ParameterLearningPipeline:
         
         return len(missing_folders) == 0
 
+class SharedContextPipeline:
+    """单进程共享上下文的参数学习流水线"""
+    
+    # 估计器：(脚本, 类名, 估计方法, 结果键)
+    ESTIMATORS = [
+        ("01最大似然估计器.py", "MLEParameterEstimator", "mle_estimation", "MLE"),
+        ("02贝叶斯估计器.py", "BayesianParameterEstimator", "bayesian_estimation", "Bayesian"),
+        ("03期望最大化(EM).py", "EMParameterEstimator", "em_estimation", "EM"),
+        ("04结构方程模型估计器.py", "SEMParameterEstimator", "sem_estimation", "SEM")
+    ]
+    ID_COLUMNS = ['RECORD_ID', 'ID', 'id', 'record_id']
+    
+    def __init__(self, base_dir=None, max_workers=4):
+        """
+        Args:
+            base_dir: 基础目录路径，默认为脚本所在目录
+            max_workers: 并发运行估计器的线程数
+        """
+        self.base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+        self.max_workers = max_workers
+        self.modules = {}
+        self.estimators = {}
+        self.execution_log = []
+        
+        # 共享上下文
+        self.raw_data = None
+        self.binary_data = None
+        self.missing_data = None
+        self.causal_edges = []
+        self.graph = None
+        self.count_engine = None
+    
+    def _load_module(self, script_name):
+        """按文件路径导入以数字开头的脚本"""
+        if script_name not in self.modules:
+            if self.base_dir not in sys.path:
+                sys.path.insert(0, self.base_dir)
+            module_name = f"param_stage_{len(self.modules)}"
+            spec = importlib.util.spec_from_file_location(module_name, os.path.join(self.base_dir, script_name))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            self.modules[script_name] = module
+        return self.modules[script_name]
+    
+    def _binarize(self, data, keep_missing=False):
+        """与各估计器相同的预处理：排除ID列，数值列按中位数二值化"""
+        data = data.drop(columns=[c for c in data.columns if c in self.ID_COLUMNS])
+        for col in data.columns:
+            if data[col].dtype in ['float64', 'int64']:
+                binary = data[col] > data[col].median()
+                data[col] = binary.astype(float).where(data[col].notna()) if keep_missing else binary.astype(int)
+        return data
+    
+    def build_context(self):
+        """数据、因果边、图与计数表只构建一次"""
+        import pandas as pd
+        import networkx as nx
+        from 计数引擎 import CountEngine
+        
+        parent_dir = os.path.dirname(self.base_dir)
+        data_file = os.path.join(parent_dir, '01数据预处理', '缩减数据_规格.csv')
+        missing_file = os.path.join(parent_dir, '01数据预处理', '缩减数据_规格_含缺失.csv')
+        edge_file = os.path.join(parent_dir, '02因果发现', '06候选因果边集合', '精简因果边列表.csv')
+        
+        try:
+            print(f"正在加载数据文件: {data_file}")
+            self.raw_data = pd.read_csv(data_file, encoding='utf-8')
+            self.binary_data = self._binarize(self.raw_data)
+            if os.path.exists(missing_file):
+                self.missing_data = self._binarize(pd.read_csv(missing_file, encoding='utf-8'), keep_missing=True)
+            else:
+                self.missing_data = self.binary_data.astype(float)
+            print(f"✓ 数据: {self.binary_data.shape}，含缺失数据: {int(self.missing_data.isna().sum().sum())} 个缺失值")
+            
+            edges_df = pd.read_csv(edge_file, encoding='utf-8')
+            for source_col, target_col in [('源节点', '目标节点'), ('父节点', '子节点'), ('Source', 'Target')]:
+                if source_col in edges_df.columns and target_col in edges_df.columns:
+                    break
+            else:
+                print(f"❌ 未识别的因果边列格式: {edges_df.columns.tolist()}")
+                return False
+            sources = edges_df[source_col].astype(str).str.strip()
+            targets = edges_df[target_col].astype(str).str.strip()
+            columns = set(self.binary_data.columns)
+            valid = sources.isin(columns) & targets.isin(columns)
+            self.causal_edges = list(zip(sources[valid], targets[valid]))
+            self.graph = nx.DiGraph()
+            self.graph.add_edges_from(self.causal_edges)
+            print(f"✓ 因果边: {len(self.causal_edges)} 条有效边")
+            
+            self.count_engine = CountEngine(self.binary_data)
+            return True
+        except Exception as e:
+            print(f"❌ 构建共享上下文失败: {e}")
+            return False
+    
+    def _make_estimator(self, script_name, class_name):
+        """创建估计器并注入共享上下文（不再读取CSV、解析因果边）"""
+        estimator = getattr(self._load_module(script_name), class_name)()
+        estimator.causal_edges = list(self.causal_edges)
+        estimator.graph = self.graph
+        
+        if class_name == 'EMParameterEstimator':
+            estimator.data = self.missing_data.copy()
+        elif class_name == 'SEMParameterEstimator':
+            # SEM 需要在二值化数据上另行标准化
+            estimator.data = self.raw_data.copy()
+            estimator.preprocess_data()
+        else:
+            estimator.data = self.binary_data
+            estimator.count_engine = self.count_engine
+        return estimator
+    
+    def _run_estimator(self, entry):
+        script_name, class_name, method_name, key = entry
+        start_time = time.time()
+        try:
+            estimator = self._make_estimator(script_name, class_name)
+            if class_name == 'BayesianParameterEstimator' and estimator.alpha_grid is not None:
+                estimator.alpha_sweep()
+            success = bool(getattr(estimator, method_name)())
+        except Exception as e:
+            print(f"❌ {key} 估计异常: {e}")
+            estimator, success = None, False
+        return key, estimator, success, time.time() - start_time
+    
+    def run_estimators(self):
+        """MLE/Bayesian/EM/SEM 在线程池中并发估计，随后在主线程依次保存（matplotlib 非线程安全）"""
+        print(f"\n并发运行 {len(self.ESTIMATORS)} 个估计器 (线程数: {self.max_workers})...")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            outcomes = list(pool.map(self._run_estimator, self.ESTIMATORS))
+        
+        for key, estimator, success, elapsed in outcomes:
+            self.execution_log.append({'step': key, 'execution_time': elapsed, 'success': success})
+            if not success:
+                print(f"✗ {key} 估计失败 ({elapsed:.2f} 秒)")
+                continue
+            estimator.create_output_folder()
+            estimator.save_results()
+            self.estimators[key] = estimator
+            print(f"✓ {key} 估计完成 ({elapsed:.2f} 秒)")
+        return len(self.estimators) == len(self.ESTIMATORS)
+    
+    def method_results(self):
+        """边级似然增益所需的各方法结果（与各结果文件内容相同）"""
+        results = {}
+        for key, estimator in self.estimators.items():
+            result = estimator.results[key]
+            results[key] = result['structural_equations'] if key == 'SEM' else result['cpts']
+        return results
+    
+    def run_edge_gains(self):
+        """边级似然增益：直接使用内存中的估计结果与共享计数引擎"""
+        start_time = time.time()
+        try:
+            module = self._load_module("05边级似然增益.py")
+            calculator = module.EdgeLikelihoodGainCalculator()
+            calculator.data = self.raw_data
+            calculator.processed_data = self.binary_data
+            calculator.causal_edges = list(self.causal_edges)
+            calculator.graph = self.graph
+            calculator._count_engine = self.count_engine
+            calculator.results = self.method_results()
+            
+            all_gains = calculator.calculate_all_methods_gains()
+            if all_gains:
+                calculator.save_results(all_gains)
+            self.execution_log.append({'step': 'edge_gains', 'execution_time': time.time() - start_time,
+                                       'success': bool(all_gains)})
+            return all_gains
+        except Exception as e:
+            print(f"❌ 边级似然增益计算失败: {e}")
+            self.execution_log.append({'step': 'edge_gains', 'execution_time': time.time() - start_time,
+                                       'success': False})
+            return {}
+    
+    def run_stability(self, all_gains):
+        """参数稳定性：增益与二值化数据直接在内存中传入"""
+        start_time = time.time()
+        try:
+            module = self._load_module("06参数稳定性.py")
+            analyzer = module.ParameterStabilityAnalyzer()
+            analyzer.causal_edges = list(self.causal_edges)
+            analyzer.edge_gains = all_gains
+            analyzer.processed_data = self.binary_data
+            analyzer.calculate_bootstrap_intervals()
+            
+            stability_results = analyzer.calculate_parameter_stability()
+            if stability_results:
+                analyzer.save_results(stability_results)
+            self.execution_log.append({'step': 'stability', 'execution_time': time.time() - start_time,
+                                       'success': bool(stability_results)})
+            return bool(stability_results)
+        except Exception as e:
+            print(f"❌ 参数稳定性分析失败: {e}")
+            self.execution_log.append({'step': 'stability', 'execution_time': time.time() - start_time,
+                                       'success': False})
+            return False
+    
+    def run_cross_validation(self):
+        """k折交叉验证：二值化数据、含缺失数据与因果边直接在内存中传入"""
+        start_time = time.time()
+        try:
+            module = self._load_module("07交叉验证.py")
+            evaluator = module.CrossValidationEvaluator(n_workers=self.max_workers)
+            evaluator.data = self.binary_data
+            evaluator.missing_data = self.missing_data
+            evaluator.causal_edges = list(self.causal_edges)
+            evaluator.graph = self.graph
+            
+            success = evaluator.cross_validate()
+            if success:
+                evaluator.create_output_folder()
+                evaluator.save_results()
+            self.execution_log.append({'step': 'cross_validation', 'execution_time': time.time() - start_time,
+                                       'success': success})
+            return success
+        except Exception as e:
+            print(f"❌ k折交叉验证失败: {e}")
+            self.execution_log.append({'step': 'cross_validation', 'execution_time': time.time() - start_time,
+                                       'success': False})
+            return False
+    
+    def run_all(self):
+        """构建共享上下文 → 并发估计 → 边级似然增益 → 参数稳定性 → 交叉验证 → 可视化"""
+        print("多方法参数学习流水线开始执行 (共享上下文)")
+        print(f"基础目录: {self.base_dir}")
+        pipeline_start_time = time.time()
+        
+        if not self.build_context():
+            print("共享上下文构建失败，程序退出")
+            return False
+        
+        success = self.run_estimators()
+        all_gains = self.run_edge_gains()
+        success = bool(all_gains) and success
+        success = (self.run_stability(all_gains) if all_gains else False) and success
+        success = self.run_cross_validation() and success
+        
+        # 可视化只读取结果文件，仍以子进程运行
+        success = ParameterLearningPipeline(self.base_dir).run_script("可视化.py", "参数学习结果可视化") and success
+        
+        total_execution_time = time.time() - pipeline_start_time
+        print(f"\n{'='*60}")
+        print("多方法参数学习流水线执行完成 (共享上下文)")
+        print(f"{'='*60}")
+        print(f"总执行时间: {total_execution_time:.2f} 秒 ({total_execution_time/60:.1f} 分钟)")
+        for entry in self.execution_log:
+            status = '✓' if entry['success'] else '✗'
+            print(f"  {status} {entry['step']}: {entry['execution_time']:.2f} 秒")
+        return success
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="多方法参数学习统一执行脚本")
+    parser.add_argument('--shared', action='store_true',
+                        help="单进程共享上下文运行：数据与计数表只构建一次，估计器并发执行")
+    parser.add_argument('--workers', type=int, default=4, help="共享上下文模式下的估计器线程数")
+    return parser.parse_args()
+
 def main():
     """主函数"""
+    args = parse_args()
     print("多方法参数学习统一执行脚本")
     print("=" * 50)
     
-    # 创建流水线执行器
-    pipeline = ParameterLearningPipeline()
-    
-    # 运行所有脚本
-    success = pipeline.run_all()
+    # 创建流水线执行器并运行
+    if args.shared:
+        success = SharedContextPipeline(max_workers=args.workers).run_all()
+    else:
+        success = ParameterLearningPipeline().run_all()
     
     # 检查结果
-    results_complete = pipeline.check_results()
+    results_complete = ParameterLearningPipeline().check_results()
     
     # 最终状态
     print(f"\n{'='*60}")
@@ -341,6 +609,7 @@ def main():
         print("  - 04SEM_结果/")
         print("  - 05边级似然增益结果/")
         print("  - 06参数稳定性结果/")
+        print("  - 07交叉验证结果/")
         print("  - 可视化/")
     else:
         print("✗ 流水线执行存在问题")
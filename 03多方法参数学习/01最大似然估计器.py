@@ -2,21 +2,24 @@
 # -*- coding: utf-8 -*-
 """
 01最大似然估计器 (MLE Parameter Estimator)
-实现最大似然估计方法进行参数学习
+实现最大似然估计方法进行参数学习（父节点过多的节点改用 noisy-OR 等紧凑参数化）
 """
 
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import json
 import os
 from datetime import datetime
 import warnings
-from itertools import product
 import networkx as nx
 import pickle
 
+from 计数引擎 import CountEngine
+from 似然评估器 import CompiledLikelihood
+from CPT存储 import save_method_cpts
+from 紧凑CPD import COMPACT_THRESHOLD, describe_compact, estimate_compact_cpt, is_compact, use_compact
+
 warnings.filterwarnings('ignore')
 
 # 设置中文字体
@@ -29,7 +32,7 @@ class MLEParameterEstimator:
     最大似然估计参数学习器
     """
     
-    def __init__(self, data_file=None):
+    def __init__(self, data_file=None, compact_family='noisy_or', compact_threshold=COMPACT_THRESHOLD):
         # 设置数据文件路径
         if data_file is None:
             script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -42,6 +45,9 @@ class MLEParameterEstimator:
         self.graph = nx.DiGraph()
         self.results = {}
         self.output_folder = None
+        self.count_engine = None  # 可由统一执行脚本注入共享的计数引擎
+        self.compact_family = compact_family  # 'noisy_or' / 'logistic' / None（始终使用完整表）
+        self.compact_threshold = compact_threshold  # 父节点数超过该值时使用紧凑参数化
         
     def load_data(self):
         """加载数据文件"""
@@ -129,7 +135,6 @@ class MLEParameterEstimator:
         
         try:
             cpts = {}
-            total_log_likelihood = 0
             
             # 获取图中的所有节点
             graph_nodes = set(self.graph.nodes())
@@ -143,67 +148,28 @@ class MLEParameterEstimator:
                 nodes_to_process = [node for node in self.data.columns if node in graph_nodes]
                 print(f"处理图中的 {len(nodes_to_process)} 个节点")
             
+            # 每个节点一次 bincount 得到全部父节点组合的频数
+            engine = self.count_engine or CountEngine(self.data)
+            
             for node in nodes_to_process:
                 parents = list(self.graph.predecessors(node))
-                
-                if not parents:
-                    # 边际概率
-                    counts = self.data[node].value_counts().sort_index()
-                    total_count = len(self.data)
-                    probs = [counts.get(i, 0) / total_count for i in [0, 1]]
-                    
-                    cpts[node] = {
-                        'type': 'marginal',
-                        'parents': [],
-                        'probabilities': probs
-                    }
-                    
-                    # 计算对数似然
-                    for i, prob in enumerate(probs):
-                        if prob > 0:
-                            count = counts.get(i, 0)
-                            total_log_likelihood += count * np.log(prob)
-                
+                if use_compact(parents, self.compact_family, self.compact_threshold):
+                    cpts[node] = estimate_compact_cpt(engine, node, parents, self.compact_family)[0]
                 else:
-                    # 条件概率
-                    parent_combinations = list(product([0, 1], repeat=len(parents)))
-                    conditional_probs = {}
-                    
-                    for combo in parent_combinations:
-                        condition = dict(zip(parents, combo))
-                        mask = pd.Series([True] * len(self.data))
-                        
-                        for parent, value in condition.items():
-                            mask &= (self.data[parent] == value)
-                        
-                        subset = self.data[mask]
-                        
-                        if len(subset) > 0:
-                            counts = subset[node].value_counts().sort_index()
-                            total_count = len(subset)
-                            probs = [counts.get(i, 0) / total_count for i in [0, 1]]
-                        else:
-                            probs = [0.5, 0.5]
-                        
-                        key = ','.join(map(str, combo))
-                        conditional_probs[key] = probs
-                        
-                        # 计算对数似然
-                        for i, prob in enumerate(probs):
-                            if prob > 0:
-                                count = counts.get(i, 0) if len(subset) > 0 else 0
-                                if count > 0:
-                                    total_log_likelihood += count * np.log(prob)
-                    
-                    cpts[node] = {
-                        'type': 'conditional',
-                        'parents': parents,
-                        'probabilities': conditional_probs
-                    }
+                    cpts[node] = engine.estimate_cpt(node, parents)[0]
+            
+            n_compact = sum(is_compact(cpt) for cpt in cpts.values())
+            if n_compact:
+                print(f"{n_compact} 个节点父节点数超过 {self.compact_threshold}，使用 {self.compact_family} 参数化")
+            
+            # 编译后的CPT对整个数据集做一次 gather 打分
+            node_log_likelihood = CompiledLikelihood(cpts).per_node(self.data)
+            total_log_likelihood = sum(node_log_likelihood.values())
             
             self.results['MLE'] = {
                 'cpts': cpts,
                 'log_likelihood': total_log_likelihood,
+                'node_log_likelihood': node_log_likelihood,
                 'method': 'Maximum Likelihood Estimation',
                 'timestamp': datetime.now().isoformat()
             }
@@ -242,6 +208,9 @@ class MLEParameterEstimator:
         with open(pkl_file, 'wb') as f:
             pickle.dump(result['cpts'], f)
         
+        # 保存为数组化CPT（.npz，可内存映射快速加载）
+        save_method_cpts(result['cpts'], self.output_folder, 'MLE')
+        
         # 创建汇总CSV
         self.create_summary_csv()
         
@@ -270,6 +239,16 @@ class MLEParameterEstimator:
                         'P(1)': f"{probs[1]:.4f}",
                         '条件': '无条件'
                     })
+                elif is_compact(cpt_info):
+                    # 紧凑参数化：一行列出全部参数
+                    summary_data.append({
+                        '节点': node,
+                        '类型': f"紧凑参数化 ({cpt_info['type']})",
+                        '父节点': ', '.join(cpt_info['parents']),
+                        'P(0)': '',
+                        'P(1)': '',
+                        '条件': describe_compact(cpt_info)
+                    })
                 else:
                     # 条件概率
                     parents = cpt_info['parents']
@@ -318,6 +297,10 @@ class MLEParameterEstimator:
                         probs = cpt_info['probabilities']
                         f.write(f"P({node}=0) = {probs[0]:.6f}\n")
                         f.write(f"P({node}=1) = {probs[1]:.6f}\n")
+                    elif is_compact(cpt_info):
+                        f.write(f"父节点: {', '.join(cpt_info['parents'])}\n")
+                        f.write(f"参数个数: {cpt_info['n_parameters']}\n")
+                        f.write(f"参数: {describe_compact(cpt_info)}\n")
                     else:
                         parents = cpt_info['parents']
                         f.write(f"父节点: {', '.join(parents)}\n")
@@ -351,6 +334,8 @@ class MLEParameterEstimator:
                         '目标值': 1,
                         '概率': probs[1]
                     })
+                elif is_compact(cpt_info):
+                    continue  # 参数见详细结果文本
                 else:
                     parents = cpt_info['parents']
                     parent_str = ', '.join(parents)
@@ -13,9 +13,15 @@ import json
 import os
 from datetime import datetime
 import warnings
-from itertools import product
 import networkx as nx
 import pickle
+import argparse
+
+from 计数引擎 import CountEngine
+from 似然评估器 import CompiledLikelihood
+from 狄利克雷先验 import cell_alpha, log_marginal_likelihood, posterior_probabilities
+from CPT存储 import save_method_cpts
+from 紧凑CPD import COMPACT_THRESHOLD, describe_compact, estimate_compact_cpt, is_compact, use_compact
 
 warnings.filterwarnings('ignore')
 
@@ -29,7 +35,8 @@ class BayesianParameterEstimator:
     贝叶斯参数估计器
     """
     
-    def __init__(self, data_file=None, alpha=1.0):
+    def __init__(self, data_file=None, alpha=1.0, alpha_grid=None, prior='bd', per_node_alpha=False,
+                 compact_family='logistic', compact_threshold=COMPACT_THRESHOLD, compact_l2=1.0):
         # 设置数据文件路径
         if data_file is None:
             script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -43,6 +50,16 @@ class BayesianParameterEstimator:
         self.results = {}
         self.output_folder = None
         self.alpha = alpha  # Dirichlet先验参数
+        self.alpha_grid = alpha_grid  # α扫描网格（None 表示不扫描）
+        self.prior = prior  # 'bd'：每个单元格 α（α=1 即K2）；'bdeu'：等价样本量 α
+        self.per_node_alpha = per_node_alpha  # 扫描后按节点分别取最优 α
+        self.node_alphas = {}
+        self._family_counts = None
+        self.count_engine = None  # 可由统一执行脚本注入共享的计数引擎
+        # 父节点数超过阈值的节点改用紧凑参数化：logistic 的 L2 正则即系数的零均值高斯先验（MAP）
+        self.compact_family = compact_family
+        self.compact_threshold = compact_threshold
+        self.compact_l2 = compact_l2
         
     def load_data(self):
         """加载数据文件"""
@@ -124,6 +141,90 @@ class BayesianParameterEstimator:
         
         print(f"数据预处理完成，最终数据维度: {self.data.shape}")
 
+    def _get_nodes_to_process(self):
+        """需要估计CPT的节点"""
+        # 获取图中的所有节点
+        graph_nodes = set(self.graph.nodes())
+        
+        # 如果图为空，使用所有数据列
+        if not graph_nodes:
+            print("图为空，处理所有数据列")
+            return list(self.data.columns)
+        
+        # 只处理图中存在的节点
+        nodes_to_process = [node for node in self.data.columns if node in graph_nodes]
+        print(f"处理图中的 {len(nodes_to_process)} 个节点")
+        return nodes_to_process
+
+    def _get_family_counts(self):
+        """各表格节点的条件频数（只计数一次，扫描与估计共用；紧凑参数化的节点不展开 2^k 频数表）"""
+        if self._family_counts is None:
+            engine = self.count_engine or CountEngine(self.data)
+            self._family_counts = {}
+            for node in self._get_nodes_to_process():
+                parents = list(self.graph.predecessors(node))
+                if not use_compact(parents, self.compact_family, self.compact_threshold):
+                    self._family_counts[node] = (parents, engine.family_counts(node, parents))
+        return self._family_counts
+    
+    def _compact_cpts(self):
+        """父节点数超过阈值的节点：L2 正则化的紧凑CPD"""
+        engine = self.count_engine or CountEngine(self.data)
+        cpts = {}
+        for node in self._get_nodes_to_process():
+            parents = list(self.graph.predecessors(node))
+            if use_compact(parents, self.compact_family, self.compact_threshold):
+                kwargs = {'l2': self.compact_l2} if self.compact_family == 'logistic' else {}
+                cpt = estimate_compact_cpt(engine, node, parents, self.compact_family, **kwargs)[0]
+                cpt['prior_alpha'] = None
+                cpts[node] = cpt
+        return cpts
+
+    def alpha_sweep(self):
+        """
+        α 扫描：对整组 α 一次广播计算各节点的BD边缘似然，选出每个节点与全局最优 α
+        """
+        alphas = np.asarray(self.alpha_grid, dtype=np.float64)
+        print(f"\n开始α扫描 (先验: {self.prior}, {len(alphas)} 个取值: {alphas.min():g} ~ {alphas.max():g})...")
+        
+        try:
+            family_counts = self._get_family_counts()
+            
+            nodes = list(family_counts.keys())
+            scores = np.array([log_marginal_likelihood(counts, alphas, self.prior)
+                               for _, counts in family_counts.values()])  # (节点, α)
+            if scores.size == 0:
+                print("没有可扫描的节点")
+                return False
+            total_scores = scores.sum(axis=0)
+            
+            best_global = float(alphas[int(np.argmax(total_scores))])
+            best_per_node = {node: float(alphas[int(np.argmax(scores[i]))]) for i, node in enumerate(nodes)}
+            
+            self.results['Bayesian_sweep'] = {
+                'alphas': alphas.tolist(),
+                'prior': self.prior,
+                'node_scores': pd.DataFrame(scores, index=nodes, columns=alphas),
+                'total_scores': total_scores.tolist(),
+                'best_alpha': best_global,
+                'best_log_marginal_likelihood': float(total_scores.max()),
+                'best_alpha_per_node': best_per_node,
+                'per_node_log_marginal_likelihood': float(scores.max(axis=1).sum())
+            }
+            
+            # 后续CPT估计使用选出的 α
+            self.alpha = best_global
+            self.node_alphas = best_per_node if self.per_node_alpha else {}
+            
+            print(f"全局最优 α = {best_global:g}，对数边缘似然 = {total_scores.max():.4f}")
+            if self.per_node_alpha:
+                print(f"按节点取最优 α，对数边缘似然 = {scores.max(axis=1).sum():.4f}")
+            return True
+            
+        except Exception as e:
+            print(f"α扫描失败: {e}")
+            return False
+
     def bayesian_estimation(self):
         """贝叶斯参数估计"""
         print(f"\n开始贝叶斯参数估计 (α={self.alpha})...")
@@ -131,82 +232,41 @@ class BayesianParameterEstimator:
         try:
             cpts = {}
             
-            # 获取图中的所有节点
-            graph_nodes = set(self.graph.nodes())
-            
-            # 如果图为空，使用所有数据列
-            if not graph_nodes:
-                nodes_to_process = self.data.columns
-                print("图为空，处理所有数据列")
-            else:
-                # 只处理图中存在的节点
-                nodes_to_process = [node for node in self.data.columns if node in graph_nodes]
-                print(f"处理图中的 {len(nodes_to_process)} 个节点")
-            
-            for node in nodes_to_process:
-                parents = list(self.graph.predecessors(node))
-                
-                if not parents:
-                    # 边际概率
-                    counts = self.data[node].value_counts().sort_index()
-                    total_count = len(self.data)
-                    
-                    # 贝叶斯估计：加入先验
-                    probs = [(counts.get(i, 0) + self.alpha) / (total_count + 2 * self.alpha) for i in [0, 1]]
-                    
-                    cpts[node] = {
-                        'type': 'marginal',
-                        'parents': [],
-                        'probabilities': probs,
-                        'prior_alpha': self.alpha,
-                        'sample_counts': [counts.get(i, 0) for i in [0, 1]]
-                    }
+            for node, (parents, counts) in self._get_family_counts().items():
+                # 单元格先验：bd 直接为 α，bdeu 为 α / (q·2)
+                alpha_jk = float(cell_alpha([self.node_alphas.get(node, self.alpha)], len(counts), self.prior)[0])
+                probs = posterior_probabilities(counts, alpha_jk)
                 
+                cpt = CountEngine.to_cpt(parents, probs)
+                cpt['prior_alpha'] = alpha_jk
+                sample_counts = counts.astype(int).tolist()
+                if parents:
+                    cpt['sample_counts'] = dict(zip(cpt['probabilities'].keys(), sample_counts))
                 else:
-                    # 条件概率
-                    parent_combinations = list(product([0, 1], repeat=len(parents)))
-                    conditional_probs = {}
-                    sample_counts_dict = {}
-                    
-                    for combo in parent_combinations:
-                        condition = dict(zip(parents, combo))
-                        mask = pd.Series([True] * len(self.data))
-                        
-                        for parent, value in condition.items():
-                            mask &= (self.data[parent] == value)
-                        
-                        subset = self.data[mask]
-                        
-                        if len(subset) > 0:
-                            counts = subset[node].value_counts().sort_index()
-                            total_count = len(subset)
-                            # 贝叶斯估计
-                            probs = [(counts.get(i, 0) + self.alpha) / (total_count + 2 * self.alpha) for i in [0, 1]]
-                            sample_counts = [counts.get(i, 0) for i in [0, 1]]
-                        else:
-                            probs = [0.5, 0.5]
-                            sample_counts = [0, 0]
-                        
-                        key = ','.join(map(str, combo))
-                        conditional_probs[key] = probs
-                        sample_counts_dict[key] = sample_counts
-                    
-                    cpts[node] = {
-                        'type': 'conditional',
-                        'parents': parents,
-                        'probabilities': conditional_probs,
-                        'prior_alpha': self.alpha,
-                        'sample_counts': sample_counts_dict
-                    }
+                    cpt['sample_counts'] = sample_counts[0]
+                cpts[node] = cpt
+            
+            compact_cpts = self._compact_cpts()
+            if compact_cpts:
+                cpts.update(compact_cpts)
+                print(f"{len(compact_cpts)} 个节点父节点数超过 {self.compact_threshold}，使用 {self.compact_family} 参数化")
+            
+            # 后验均值参数下的数据对数似然
+            node_log_likelihood = CompiledLikelihood(cpts).per_node(self.data)
+            total_log_likelihood = sum(node_log_likelihood.values())
             
             self.results['Bayesian'] = {
                 'cpts': cpts,
                 'alpha': self.alpha,
+                'prior': self.prior,
+                'node_alphas': self.node_alphas,
+                'log_likelihood': total_log_likelihood,
+                'node_log_likelihood': node_log_likelihood,
                 'method': 'Bayesian Estimation',
                 'timestamp': datetime.now().isoformat()
             }
             
-            print("贝叶斯估计完成")
+            print(f"贝叶斯估计完成，对数似然: {total_log_likelihood:.4f}")
             return True
             
         except Exception as e:
@@ -240,14 +300,71 @@ class BayesianParameterEstimator:
         with open(pkl_file, 'wb') as f:
             pickle.dump(result['cpts'], f)
         
+        # 保存为数组化CPT（.npz，可内存映射快速加载）
+        save_method_cpts(result['cpts'], self.output_folder, 'Bayesian')
+        
         # 创建汇总CSV
         self.create_summary_csv()
         
         # 创建详细结果文件
         self.create_detailed_results()
         
+        # α扫描报告
+        if 'Bayesian_sweep' in self.results:
+            self.save_sweep_results()
+        
         print(f"贝叶斯估计结果已保存到: {self.output_folder}")
 
+    def save_sweep_results(self):
+        """保存α扫描结果：逐节点边缘似然CSV、最优α JSON与曲线图"""
+        try:
+            sweep = self.results['Bayesian_sweep']
+            
+            node_scores = sweep['node_scores']
+            rows = []
+            for node in node_scores.index:
+                for alpha, score in zip(sweep['alphas'], node_scores.loc[node].values):
+                    rows.append({
+                        '节点': node,
+                        'α': alpha,
+                        '先验类型': sweep['prior'],
+                        '对数边缘似然': score,
+                        '是否节点最优': alpha == sweep['best_alpha_per_node'][node]
+                    })
+            for alpha, score in zip(sweep['alphas'], sweep['total_scores']):
+                rows.append({
+                    '节点': '全部节点',
+                    'α': alpha,
+                    '先验类型': sweep['prior'],
+                    '对数边缘似然': score,
+                    '是否节点最优': alpha == sweep['best_alpha']
+                })
+            csv_file = os.path.join(self.output_folder, "Bayesian_α扫描.csv")
+            pd.DataFrame(rows).to_csv(csv_file, index=False, encoding='utf-8')
+            
+            json_file = os.path.join(self.output_folder, "Bayesian_α扫描结果.json")
+            with open(json_file, 'w', encoding='utf-8') as f:
+                json.dump({k: v for k, v in sweep.items() if k != 'node_scores'},
+                          f, ensure_ascii=False, indent=2)
+            
+            plt.figure(figsize=(10, 6))
+            plt.semilogx(sweep['alphas'], sweep['total_scores'], 'b-o', linewidth=2, markersize=4)
+            plt.axvline(x=sweep['best_alpha'], color='r', linestyle='--', alpha=0.7,
+                        label=f"最优 α = {sweep['best_alpha']:g}")
+            plt.xlabel('α')
+            plt.ylabel('对数边缘似然')
+            plt.title(f"贝叶斯估计 α 扫描 ({sweep['prior']})")
+            plt.grid(True, alpha=0.3)
+            plt.legend()
+            plot_file = os.path.join(self.output_folder, "Bayesian_α扫描.png")
+            plt.savefig(plot_file, dpi=300, bbox_inches='tight')
+            plt.close()
+            
+            print(f"α扫描结果已保存: {csv_file}")
+            
+        except Exception as e:
+            print(f"保存α扫描结果失败: {e}")
+
     def create_summary_csv(self):
         """创建条件概率表汇总CSV"""
         try:
@@ -272,6 +389,19 @@ class BayesianParameterEstimator:
                         '样本计数_1': counts[1],
                         '先验参数α': cpt_info['prior_alpha']
                     })
+                elif is_compact(cpt_info):
+                    # 紧凑参数化：一行列出全部参数
+                    summary_data.append({
+                        '节点': node,
+                        '类型': f"紧凑参数化 ({cpt_info['type']})",
+                        '父节点': ', '.join(cpt_info['parents']),
+                        'P(0)': '',
+                        'P(1)': '',
+                        '条件': describe_compact(cpt_info),
+                        '样本计数_0': '',
+                        '样本计数_1': '',
+                        '先验参数α': ''
+                    })
                 else:
                     # 条件概率
                     parents = cpt_info['parents']
@@ -327,6 +457,10 @@ class BayesianParameterEstimator:
                         f.write(f"样本计数: [0: {counts[0]}, 1: {counts[1]}]\n")
                         f.write(f"P({node}=0) = ({counts[0]} + {cpt_info['prior_alpha']}) / ({sum(counts)} + {2*cpt_info['prior_alpha']}) = {probs[0]:.6f}\n")
                         f.write(f"P({node}=1) = ({counts[1]} + {cpt_info['prior_alpha']}) / ({sum(counts)} + {2*cpt_info['prior_alpha']}) = {probs[1]:.6f}\n")
+                    elif is_compact(cpt_info):
+                        f.write(f"父节点: {', '.join(cpt_info['parents'])}\n")
+                        f.write(f"参数个数: {cpt_info['n_parameters']}\n")
+                        f.write(f"参数: {describe_compact(cpt_info)}\n")
                     else:
                         parents = cpt_info['parents']
                         f.write(f"父节点: {', '.join(parents)}\n")
@@ -361,6 +495,8 @@ class BayesianParameterEstimator:
                             '先验参数α': cpt_info['prior_alpha'],
                             '后验计算': f"({counts[i]} + {cpt_info['prior_alpha']}) / ({sum(counts)} + {2*cpt_info['prior_alpha']})"
                         })
+                elif is_compact(cpt_info):
+                    continue  # 参数见详细结果文本
                 else:
                     parents = cpt_info['parents']
                     parent_str = ', '.join(parents)
@@ -404,6 +540,10 @@ class BayesianParameterEstimator:
         # 加载因果边
         self.load_causal_edges()
         
+        # α扫描（计数只做一次，与估计共用）
+        if self.alpha_grid is not None and not self.alpha_sweep():
+            print("α扫描失败，使用给定的 α")
+        
         # 运行贝叶斯估计
         if not self.bayesian_estimation():
             print("贝叶斯估计失败")
@@ -417,9 +557,27 @@ class BayesianParameterEstimator:
         print(f"结果已保存到: {self.output_folder}")
         return True
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="贝叶斯参数估计")
+    parser.add_argument('--alpha', type=float, default=1.0, help="Dirichlet先验参数α")
+    parser.add_argument('--alpha-grid', type=str, default=None,
+                        help="α扫描网格：逗号分隔的取值，或 'auto'（10^-2 ~ 10^2 共17个）")
+    parser.add_argument('--prior', choices=['bd', 'bdeu'], default='bd',
+                        help="bd：每个单元格α（α=1即K2）；bdeu：等价样本量α")
+    parser.add_argument('--per-node-alpha', action='store_true', help="扫描后每个节点使用各自最优α")
+    return parser.parse_args()
+
 def main():
-    # 可以通过参数调整先验参数α
-    estimator = BayesianParameterEstimator(alpha=1.0)
+    # 可以通过参数调整先验参数α，或用 --alpha-grid 按边缘似然选择α
+    args = parse_args()
+    alpha_grid = None
+    if args.alpha_grid == 'auto':
+        alpha_grid = np.logspace(-2, 2, 17)
+    elif args.alpha_grid:
+        alpha_grid = [float(a) for a in args.alpha_grid.split(',')]
+    
+    estimator = BayesianParameterEstimator(alpha=args.alpha, alpha_grid=alpha_grid,
+                                           prior=args.prior, per_node_alpha=args.per_node_alpha)
     estimator.run()
 
 if __name__ == "__main__":
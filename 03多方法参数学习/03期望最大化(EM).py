@@ -2,21 +2,23 @@
 # -*- coding: utf-8 -*-
 """
 03期望最大化(EM) (Expectation-Maximization Parameter Estimator)
-实现EM算法进行参数学习
+实现EM算法进行参数学习（SQUAREM 加速，可选多次随机重启并在进程池中并行）
 """
 
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import json
 import os
 from datetime import datetime
 import warnings
-from itertools import product
+import argparse
 import networkx as nx
 import pickle
 
+from EM引擎 import MissingDataEM, fit_with_restarts
+from CPT存储 import save_method_cpts
+
 warnings.filterwarnings('ignore')
 
 # 设置中文字体
@@ -29,12 +31,15 @@ class EMParameterEstimator:
     期望最大化(EM)参数估计器
     """
     
-    def __init__(self, data_file=None, max_iterations=100, tolerance=1e-6):
-        # 设置数据文件路径
+    def __init__(self, data_file=None, max_iterations=100, tolerance=1e-6, acceleration='squarem',
+                 n_restarts=5, random_state=42, n_workers=None):
+        # 设置数据文件路径（优先使用未插补的数据，缺失值交给EM处理）
         if data_file is None:
             script_dir = os.path.dirname(os.path.abspath(__file__))
             parent_dir = os.path.dirname(script_dir)
-            self.data_file = os.path.join(parent_dir, '01数据预处理/缩减数据_规格.csv')
+            self.data_file = os.path.join(parent_dir, '01数据预处理/缩减数据_规格_含缺失.csv')
+            if not os.path.exists(self.data_file):
+                self.data_file = os.path.join(parent_dir, '01数据预处理/缩减数据_规格.csv')
         else:
             self.data_file = data_file
         self.data = None
@@ -44,6 +49,10 @@ class EMParameterEstimator:
         self.output_folder = None
         self.max_iterations = max_iterations
         self.tolerance = tolerance
+        self.acceleration = acceleration  # None 为普通EM
+        self.n_restarts = n_restarts
+        self.random_state = random_state
+        self.n_workers = n_workers  # 随机重启的进程数，None 为CPU核数
         
     def load_data(self):
         """加载数据文件"""
@@ -106,7 +115,7 @@ class EMParameterEstimator:
             return False
     
     def preprocess_data(self):
-        """数据预处理：排除ID列并二值化"""
+        """数据预处理：排除ID列并二值化（缺失值保持为NaN）"""
         print("正在进行数据预处理...")
         
         # 排除ID列和其他非特征列
@@ -121,13 +130,16 @@ class EMParameterEstimator:
         for col in self.data.columns:
             if self.data[col].dtype in ['float64', 'int64']:
                 median_val = self.data[col].median()
-                self.data[col] = (self.data[col] > median_val).astype(int)
+                observed = self.data[col].notna()
+                self.data[col] = (self.data[col] > median_val).astype(float).where(observed)
         
         print(f"数据预处理完成，最终数据维度: {self.data.shape}")
+        print(f"缺失值数量: {int(self.data.isna().sum().sum())}")
 
     def em_estimation(self):
         """EM算法参数估计"""
-        print(f"\n开始EM算法参数估计 (最大迭代次数: {self.max_iterations}, 收敛阈值: {self.tolerance})...")
+        print(f"\n开始EM算法参数估计 (最大迭代次数: {self.max_iterations}, 收敛阈值: {self.tolerance}, "
+              f"加速: {self.acceleration or '无'}, 随机重启: {self.n_restarts})...")
         
         try:
             # 获取图中的所有节点
@@ -142,45 +154,53 @@ class EMParameterEstimator:
                 nodes_to_process = [node for node in self.data.columns if node in graph_nodes]
                 print(f"处理图中的 {len(nodes_to_process)} 个节点")
             
-            # 初始化参数
-            cpts = self._initialize_parameters(nodes_to_process)
-            
-            # EM迭代
-            log_likelihood_history = []
+            # 缺失项的期望频数由批量精确推断得到，完整观测部分只计数一次
+            parents_of = {node: list(self.graph.predecessors(node)) for node in nodes_to_process}
+            engine = MissingDataEM(self.data[list(nodes_to_process)], parents_of, random_state=self.random_state)
+            print(f"含缺失的行: {engine.n_missing_rows}, 缺失值: {engine.n_missing_values}, "
+                  f"独立缺失分量: {len(engine.components)}")
             
-            for iteration in range(self.max_iterations):
-                # E步：计算期望
-                expected_counts = self._e_step(cpts, nodes_to_process)
-                
-                # M步：更新参数
-                new_cpts = self._m_step(expected_counts, nodes_to_process)
-                
-                # 计算对数似然
-                log_likelihood = self._calculate_likelihood(new_cpts, nodes_to_process)
-                log_likelihood_history.append(log_likelihood)
-                
-                # 检查收敛
-                if iteration > 0:
-                    improvement = log_likelihood - log_likelihood_history[-2]
-                    print(f"迭代 {iteration + 1}: 对数似然 = {log_likelihood:.6f}, 改进 = {improvement:.6f}")
-                    
-                    if abs(improvement) < self.tolerance:
-                        print(f"在第 {iteration + 1} 次迭代后收敛")
-                        break
-                else:
-                    print(f"迭代 {iteration + 1}: 对数似然 = {log_likelihood:.6f}")
-                
-                cpts = new_cpts
+            fit_kwargs = {'max_iterations': self.max_iterations, 'tolerance': self.tolerance,
+                          'acceleration': self.acceleration}
+            if self.n_restarts > 1:
+                restarts = fit_with_restarts(self.data[list(nodes_to_process)], parents_of, self.n_restarts,
+                                             self.random_state, self.n_workers, **fit_kwargs)
+                fit = restarts['best']
+                for i, run in enumerate(restarts['restarts']):
+                    marker = '✓' if run is fit else ' '
+                    print(f"  {marker} 重启 {i + 1} (种子 {run['seed']}): 迭代 {run['iterations']}, "
+                          f"最终对数似然 {run['final_log_likelihood']:.6f}")
+            else:
+                fit = engine.fit(**fit_kwargs)
+                fit['seed'] = self.random_state
+                restarts = {'restarts': [fit]}
+            cpts = engine.to_cpts(fit['thetas'])
             
             self.results['EM'] = {
                 'cpts': cpts,
                 'method': 'Expectation-Maximization',
-                'iterations': iteration + 1,
-                'final_log_likelihood': log_likelihood,
-                'log_likelihood_history': log_likelihood_history,
+                'iterations': fit['iterations'],
+                'final_log_likelihood': fit['final_log_likelihood'],
+                'log_likelihood_history': fit['log_likelihood_history'],
                 'max_iterations': self.max_iterations,
                 'tolerance': self.tolerance,
-                'converged': abs(improvement) < self.tolerance if iteration > 0 else False,
+                'converged': fit['converged'],
+                'em_evaluations': fit['em_evaluations'],
+                'acceleration': self.acceleration,
+                'random_state': self.random_state,
+                'best_seed': fit['seed'],
+                'restarts': [
+                    {
+                        'seed': run['seed'],
+                        'iterations': run['iterations'],
+                        'final_log_likelihood': run['final_log_likelihood'],
+                        'converged': run['converged'],
+                        'log_likelihood_history': run['log_likelihood_history']
+                    }
+                    for run in restarts['restarts']
+                ],
+                'missing_values': engine.n_missing_values,
+                'missing_rows': engine.n_missing_rows,
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -191,160 +211,6 @@ class EMParameterEstimator:
             print(f"EM算法估计失败: {e}")
             return False
 
-    def _initialize_parameters(self, nodes_to_process):
-        """初始化参数"""
-        cpts = {}
-        
-        for node in nodes_to_process:
-            parents = list(self.graph.predecessors(node))
-            
-            if not parents:
-                # 边际概率：随机初始化
-                prob_1 = np.random.uniform(0.3, 0.7)
-                cpts[node] = {
-                    'type': 'marginal',
-                    'parents': [],
-                    'probabilities': [1 - prob_1, prob_1]
-                }
-            else:
-                # 条件概率：随机初始化
-                parent_combinations = list(product([0, 1], repeat=len(parents)))
-                conditional_probs = {}
-                
-                for combo in parent_combinations:
-                    prob_1 = np.random.uniform(0.3, 0.7)
-                    key = ','.join(map(str, combo))
-                    conditional_probs[key] = [1 - prob_1, prob_1]
-                
-                cpts[node] = {
-                    'type': 'conditional',
-                    'parents': parents,
-                    'probabilities': conditional_probs
-                }
-        
-        return cpts
-
-    def _e_step(self, cpts, nodes_to_process):
-        """E步：计算期望计数"""
-        expected_counts = {}
-        
-        for node in nodes_to_process:
-            parents = list(self.graph.predecessors(node))
-            
-            if not parents:
-                # 边际概率的期望计数
-                counts = [0.0, 0.0]
-                for _, row in self.data.iterrows():
-                    value = int(row[node])
-                    counts[value] += 1.0
-                
-                expected_counts[node] = {
-                    'type': 'marginal',
-                    'counts': counts
-                }
-            else:
-                # 条件概率的期望计数
-                parent_combinations = list(product([0, 1], repeat=len(parents)))
-                conditional_counts = {}
-                
-                for combo in parent_combinations:
-                    key = ','.join(map(str, combo))
-                    conditional_counts[key] = [0.0, 0.0]
-                
-                for _, row in self.data.iterrows():
-                    # 获取父节点的值
-                    parent_values = [int(row[parent]) for parent in parents]
-                    combo_key = ','.join(map(str, parent_values))
-                    
-                    # 获取子节点的值
-                    child_value = int(row[node])
-                    conditional_counts[combo_key][child_value] += 1.0
-                
-                expected_counts[node] = {
-                    'type': 'conditional',
-                    'parents': parents,
-                    'counts': conditional_counts
-                }
-        
-        return expected_counts
-
-    def _m_step(self, expected_counts, nodes_to_process):
-        """M步：更新参数"""
-        new_cpts = {}
-        
-        for node in nodes_to_process:
-            count_info = expected_counts[node]
-            
-            if count_info['type'] == 'marginal':
-                # 更新边际概率
-                counts = count_info['counts']
-                total = sum(counts)
-                
-                if total > 0:
-                    probs = [count / total for count in counts]
-                else:
-                    probs = [0.5, 0.5]
-                
-                new_cpts[node] = {
-                    'type': 'marginal',
-                    'parents': [],
-                    'probabilities': probs
-                }
-            else:
-                # 更新条件概率
-                parents = count_info['parents']
-                conditional_probs = {}
-                
-                for combo_key, counts in count_info['counts'].items():
-                    total = sum(counts)
-                    
-                    if total > 0:
-                        probs = [count / total for count in counts]
-                    else:
-                        probs = [0.5, 0.5]
-                    
-                    conditional_probs[combo_key] = probs
-                
-                new_cpts[node] = {
-                    'type': 'conditional',
-                    'parents': parents,
-                    'probabilities': conditional_probs
-                }
-        
-        return new_cpts
-
-    def _calculate_likelihood(self, cpts, nodes_to_process):
-        """计算对数似然"""
-        log_likelihood = 0.0
-        
-        for _, row in self.data.iterrows():
-            row_likelihood = 0.0
-            
-            for node in nodes_to_process:
-                if node not in cpts:
-                    continue
-                
-                cpt_info = cpts[node]
-                node_value = int(row[node])
-                
-                if cpt_info['type'] == 'marginal':
-                    prob = cpt_info['probabilities'][node_value]
-                else:
-                    parents = cpt_info['parents']
-                    parent_values = [int(row[parent]) for parent in parents]
-                    combo_key = ','.join(map(str, parent_values))
-                    prob = cpt_info['probabilities'][combo_key][node_value]
-                
-                # 避免对数为负无穷
-                if prob > 0:
-                    row_likelihood += np.log(prob)
-                else:
-                    row_likelihood += np.log(1e-10)
-            
-            log_likelihood += row_likelihood
-        
-        return log_likelihood
-
     def create_output_folder(self):
         """创建输出文件夹"""
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -372,6 +238,9 @@ class EMParameterEstimator:
         with open(pkl_file, 'wb') as f:
             pickle.dump(result['cpts'], f)
         
+        # 保存为数组化CPT（.npz，可内存映射快速加载）
+        save_method_cpts(result['cpts'], self.output_folder, 'EM')
+        
         # 创建汇总CSV
         self.create_summary_csv()
         
@@ -448,7 +317,17 @@ class EMParameterEstimator:
                 f.write(f"收敛阈值: {result['tolerance']}\n")
                 f.write(f"实际迭代次数: {result['iterations']}\n")
                 f.write(f"最终对数似然: {result['final_log_likelihood']:.6f}\n")
-                f.write(f"是否收敛: {'是' if result['converged'] else '否'}\n\n")
+                f.write(f"是否收敛: {'是' if result['converged'] else '否'}\n")
+                f.write(f"加速方式: {result['acceleration'] or '无'} (EM映射次数: {result['em_evaluations']})\n")
+                f.write(f"随机重启: {len(result['restarts'])} 次，主种子 {result['random_state']}，最优种子 {result['best_seed']}\n\n")
+                
+                if len(result['restarts']) > 1:
+                    f.write("各次重启:\n")
+                    for i, run in enumerate(result['restarts']):
+                        f.write(f"重启 {i+1} (种子 {run['seed']}): 迭代 {run['iterations']}, "
+                                f"最终对数似然 {run['final_log_likelihood']:.6f}, "
+                                f"{'收敛' if run['converged'] else '未收敛'}\n")
+                    f.write("\n")
                 
                 # 对数似然历史
                 f.write("对数似然历史:\n")
@@ -493,10 +372,16 @@ class EMParameterEstimator:
             
             if len(log_likelihood_history) > 1:
                 plt.figure(figsize=(10, 6))
-                plt.plot(range(1, len(log_likelihood_history) + 1), log_likelihood_history, 'b-o', linewidth=2, markersize=4)
+                # 其余重启的收敛过程作为背景
+                for run in result['restarts']:
+                    if run['seed'] != result['best_seed'] and len(run['log_likelihood_history']) > 1:
+                        history = run['log_likelihood_history']
+                        plt.plot(range(1, len(history) + 1), history, color='gray', linewidth=1, alpha=0.5)
+                plt.plot(range(1, len(log_likelihood_history) + 1), log_likelihood_history, 'b-o', linewidth=2, markersize=4,
+                         label=f"最优链 (种子 {result['best_seed']})")
                 plt.xlabel('迭代次数')
                 plt.ylabel('对数似然')
-                plt.title('EM算法收敛过程')
+                plt.title(f"EM算法收敛过程 ({len(result['restarts'])} 次随机重启，加速: {result['acceleration'] or '无'})")
                 plt.grid(True, alpha=0.3)
                 
                 # 添加收敛信息
@@ -541,9 +426,22 @@ class EMParameterEstimator:
         print(f"结果已保存到: {self.output_folder}")
         return True
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="EM算法参数估计")
+    parser.add_argument('--max-iterations', type=int, default=100, help="最大迭代次数")
+    parser.add_argument('--tolerance', type=float, default=1e-6, help="收敛阈值")
+    parser.add_argument('--acceleration', choices=['squarem', 'none'], default='squarem', help="加速方式")
+    parser.add_argument('--restarts', type=int, default=5, help="随机重启次数")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子")
+    parser.add_argument('--workers', type=int, default=None, help="随机重启的进程数")
+    return parser.parse_args()
+
 def main():
-    # 可以通过参数调整最大迭代次数和收敛阈值
-    estimator = EMParameterEstimator(max_iterations=100, tolerance=1e-6)
+    # 可以通过参数调整最大迭代次数、收敛阈值、加速方式与随机重启
+    args = parse_args()
+    estimator = EMParameterEstimator(max_iterations=args.max_iterations, tolerance=args.tolerance,
+                                     acceleration=None if args.acceleration == 'none' else args.acceleration,
+                                     n_restarts=args.restarts, random_state=args.seed, n_workers=args.workers)
     estimator.run()
 
 if __name__ == "__main__":
@@ -3,23 +3,25 @@ import pandas as pd
 import numpy as np
 import os
 from datetime import datetime
-from itertools import product
 import re
 
 class SEMRegressionPredictor:
-    def __init__(self, sem_json_path, data_path):
+    def __init__(self, sem_json_path, data_path, max_enumerated_parents=16):
         """
         初始化SEM回归预测器
         
         Args:
             sem_json_path: SEM结构方程JSON文件路径
             data_path: 原始数据CSV文件路径
+            max_enumerated_parents: 展开完整CPT的最大父节点数，超过时该节点改为按需计算
         """
         self.sem_json_path = sem_json_path
         self.data_path = data_path
+        self.max_enumerated_parents = max_enumerated_parents
         self.sem_equations = None
         self.data = None
         self.results = {}
+        self._design_cache = {}
         
     def load_data(self):
         """加载SEM结构方程和原始数据"""
@@ -69,11 +71,52 @@ class SEMRegressionPredictor:
         
         return predicted_value, prob_0, prob_1
     
+    def design_matrix(self, n_parents):
+        """
+        全部父节点组合的 2^k × k 设计矩阵（第一个父节点为最高位，与 itertools.product 顺序一致）
+        """
+        if n_parents not in self._design_cache:
+            combos = np.arange(1 << n_parents)[:, None] >> np.arange(n_parents - 1, -1, -1)
+            self._design_cache[n_parents] = (combos & 1).astype(np.int8)
+        return self._design_cache[n_parents]
+    
+    def node_probability_table(self, target_node):
+        """
+        一次矩阵-向量乘法 + sigmoid 得到节点在全部父节点组合下的预测值与 P(1)
+        
+        Returns:
+            tuple: (设计矩阵 (2^k, k), 预测值 (2^k,), P(1) (2^k,))
+        """
+        equation = self.sem_equations[target_node]
+        k = len(equation['parents'])
+        coefficients = np.zeros(k)
+        given = np.asarray(equation['coefficients'][:k], dtype=np.float64)
+        coefficients[:len(given)] = given
+        
+        design = self.design_matrix(k)
+        predicted = equation['intercept'] + design @ coefficients
+        return design, predicted, self.sigmoid(predicted)
+    
+    def predict_probabilities(self, target_node, parent_matrix):
+        """
+        按需计算：对任意一批父节点取值（行 × 父节点，列顺序与方程 parents 一致）给出 P(1)
+        用于父节点过多、不展开完整CPT的节点
+        """
+        equation = self.sem_equations[target_node]
+        k = len(equation['parents'])
+        coefficients = np.zeros(k)
+        given = np.asarray(equation['coefficients'][:k], dtype=np.float64)
+        coefficients[:len(given)] = given
+        predicted = equation['intercept'] + np.asarray(parent_matrix, dtype=np.float64) @ coefficients
+        return self.sigmoid(predicted)
+    
     def generate_conditional_probability_tables(self):
-        """生成类似MLE的条件概率表"""
+        """生成类似MLE的条件概率表（每个节点一次矩阵运算，结果以数组保存）"""
         cpt_results = {}
-        summary_data = []
-        detailed_results = []
+        node_arrays = {}
+        on_demand_nodes = {}
+        summary_frames = []
+        detailed_frames = []
         
         print("开始生成条件概率表...")
         
@@ -82,61 +125,71 @@ class SEMRegressionPredictor:
                 continue  # 跳过没有父节点的节点
                 
             parents = equation['parents']
+            
+            if len(parents) > self.max_enumerated_parents:
+                # 2^k 组合过多：只保留线性方程，使用时调用 predict_probabilities 按需计算
+                print(f"⚠ 节点 {target_node} 有 {len(parents)} 个父节点，超过 {self.max_enumerated_parents}，改为按需计算")
+                on_demand_nodes[target_node] = {
+                    "type": "on_demand_logistic",
+                    "parents": parents,
+                    "intercept": equation['intercept'],
+                    "coefficients": equation['coefficients']
+                }
+                continue
+            
             print(f"处理节点: {target_node}, 父节点: {parents}")
             
-            # 生成所有可能的父节点组合 (0, 1)
-            parent_combinations = list(product([0, 1], repeat=len(parents)))
+            design, predicted, prob_1 = self.node_probability_table(target_node)
+            prob_0 = 1 - prob_1
+            node_arrays[target_node] = {
+                'parents': parents,
+                'predicted_values': predicted,
+                'prob_1': prob_1
+            }
             
-            node_probabilities = {}
+            # 条件键 (如 "0,1,0") 与 "父节点=取值" 描述：按父节点列拼接，不逐组合循环
+            values = design.astype(str)
+            condition_keys = values[:, 0]
+            parent_condition = np.char.add(f"{parents[0]}=", values[:, 0])
+            for j in range(1, len(parents)):
+                condition_keys = np.char.add(np.char.add(condition_keys, ','), values[:, j])
+                parent_condition = np.char.add(parent_condition, np.char.add(f", {parents[j]}=", values[:, j]))
             
-            for combination in parent_combinations:
-                # 创建父节点值字典
-                parent_values = {parent: value for parent, value in zip(parents, combination)}
-                
-                # 预测概率
-                predicted_value, prob_0, prob_1 = self.predict_node_probability(target_node, parent_values)
-                
-                if predicted_value is not None:
-                    # 创建条件键 (如 "0,1,0")
-                    condition_key = ",".join(map(str, combination))
-                    node_probabilities[condition_key] = [prob_0, prob_1]
-                    
-                    # 添加到汇总数据
-                    summary_data.append({
-                        '节点': target_node,
-                        '类型': '条件概率',
-                        '父节点': ', '.join(parents),
-                        'P(0)': f"{prob_0:.4f}",
-                        'P(1)': f"{prob_1:.4f}",
-                        '条件': condition_key
-                    })
-                    
-                    # 添加到详细结果
-                    parent_condition = ', '.join([f"{parent}={value}" for parent, value in zip(parents, combination)])
-                    detailed_results.append({
-                        'node': target_node,
-                        'parents': parents,
-                        'condition': parent_condition,
-                        'prob_0': prob_0,
-                        'prob_1': prob_1,
-                        'predicted_value': predicted_value
-                    })
+            cpt_results[target_node] = {
+                "type": "conditional",
+                "parents": parents,
+                "probabilities": dict(zip(condition_keys.tolist(), np.column_stack([prob_0, prob_1]).tolist()))
+            }
             
-            # 保存节点的条件概率表
-            if node_probabilities:
-                cpt_results[target_node] = {
-                    "type": "conditional",
-                    "parents": parents,
-                    "probabilities": node_probabilities
-                }
+            n_rows = len(design)
+            summary_frames.append(pd.DataFrame({
+                '节点': target_node,
+                '类型': '条件概率',
+                '父节点': ', '.join(parents),
+                'P(0)': np.char.mod('%.4f', prob_0),
+                'P(1)': np.char.mod('%.4f', prob_1),
+                '条件': condition_keys
+            }))
+            detailed_frames.append(pd.DataFrame({
+                'node': target_node,
+                'parents': [parents] * n_rows,
+                'condition': parent_condition,
+                'prob_0': prob_0,
+                'prob_1': prob_1,
+                'predicted_value': predicted
+            }))
         
         self.results = {
             'cpt_json': cpt_results,
-            'summary_csv': summary_data,
-            'detailed_results': detailed_results
+            'cpt_arrays': node_arrays,
+            'on_demand_nodes': on_demand_nodes,
+            'summary_csv': pd.concat(summary_frames, ignore_index=True) if summary_frames else pd.DataFrame(),
+            'detailed_results': pd.concat(detailed_frames, ignore_index=True) if detailed_frames else pd.DataFrame()
         }
         
         print(f"成功生成 {len(cpt_results)} 个节点的条件概率表")
+        if on_demand_nodes:
+            print(f"⚠ {len(on_demand_nodes)} 个高入度节点改为按需计算")
         return self.results
     
     def save_results(self, output_dir):
@@ -150,15 +203,22 @@ class SEMRegressionPredictor:
             json.dump(self.results['cpt_json'], f, ensure_ascii=False, indent=2)
         print(f"已保存JSON结果到: {json_path}")
         
+        # 按需计算的高入度节点只保存线性方程
+        if self.results.get('on_demand_nodes'):
+            on_demand_path = os.path.join(output_dir, 'SEM_按需节点.json')
+            with open(on_demand_path, 'w', encoding='utf-8') as f:
+                json.dump(self.results['on_demand_nodes'], f, ensure_ascii=False, indent=2)
+            print(f"已保存按需计算节点到: {on_demand_path}")
+        
         # 2. 保存CSV汇总 (类似MLE_条件概率表汇总.csv)
         csv_summary_path = os.path.join(output_dir, 'SEM_条件概率表汇总.csv')
-        summary_df = pd.DataFrame(self.results['summary_csv'])
+        summary_df = self.results['summary_csv']
         summary_df.to_csv(csv_summary_path, index=False, encoding='utf-8')
         print(f"已保存CSV汇总到: {csv_summary_path}")
         
         # 3. 保存详细CSV数据 (类似MLE_条件概率表详细数据.csv)
         csv_detailed_path = os.path.join(output_dir, 'SEM_条件概率表详细数据.csv')
-        detailed_df = pd.DataFrame(self.results['detailed_results'])
+        detailed_df = self.results['detailed_results']
         detailed_df.to_csv(csv_detailed_path, index=False, encoding='utf-8')
         print(f"已保存详细CSV数据到: {csv_detailed_path}")
         
@@ -204,28 +264,35 @@ class SEMRegressionPredictor:
             f.write(f"生成的条件概率记录数: {len(self.results['detailed_results'])}\n\n")
             
             # 统计信息
-            all_probs_0 = [item['prob_0'] for item in self.results['detailed_results']]
-            all_probs_1 = [item['prob_1'] for item in self.results['detailed_results']]
-            all_predicted = [item['predicted_value'] for item in self.results['detailed_results']]
+            detailed = self.results['detailed_results']
+            if len(detailed) == 0:
+                return
+            all_probs_0 = detailed['prob_0'].to_numpy()
+            all_probs_1 = detailed['prob_1'].to_numpy()
+            all_predicted = detailed['predicted_value'].to_numpy()
             
             f.write("=== 统计信息 ===\n")
-            f.write(f"P(0)概率范围: {min(all_probs_0):.4f} - {max(all_probs_0):.4f}\n")
-            f.write(f"P(1)概率范围: {min(all_probs_1):.4f} - {max(all_probs_1):.4f}\n")
-            f.write(f"预测值范围: {min(all_predicted):.4f} - {max(all_predicted):.4f}\n")
+            f.write(f"P(0)概率范围: {all_probs_0.min():.4f} - {all_probs_0.max():.4f}\n")
+            f.write(f"P(1)概率范围: {all_probs_1.min():.4f} - {all_probs_1.max():.4f}\n")
+            f.write(f"预测值范围: {all_predicted.min():.4f} - {all_predicted.max():.4f}\n")
             f.write(f"平均P(0): {np.mean(all_probs_0):.4f}\n")
             f.write(f"平均P(1): {np.mean(all_probs_1):.4f}\n\n")
             
             # 节点详细信息
             f.write("=== 节点详细信息 ===\n")
             for node_name, cpt_data in self.results['cpt_json'].items():
-                node_results = [item for item in self.results['detailed_results'] if item['node'] == node_name]
-                node_probs_1 = [item['prob_1'] for item in node_results]
+                node_probs_1 = self.results['cpt_arrays'][node_name]['prob_1']
                 
                 f.write(f"\n节点: {node_name}\n")
                 f.write(f"  父节点: {', '.join(cpt_data['parents'])}\n")
                 f.write(f"  条件组合数: {len(cpt_data['probabilities'])}\n")
-                f.write(f"  P(1)范围: {min(node_probs_1):.4f} - {max(node_probs_1):.4f}\n")
+                f.write(f"  P(1)范围: {node_probs_1.min():.4f} - {node_probs_1.max():.4f}\n")
                 f.write(f"  平均P(1): {np.mean(node_probs_1):.4f}\n")
+            
+            if self.results.get('on_demand_nodes'):
+                f.write("\n=== 按需计算节点 ===\n")
+                for node_name, info in self.results['on_demand_nodes'].items():
+                    f.write(f"{node_name}: {len(info['parents'])} 个父节点\n")
 
 def main():
     # 文件路径
@@ -16,10 +16,11 @@ import warnings
 from itertools import product
 import networkx as nx
 import pickle
-from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import r2_score
 
+from SEM引擎 import GramSEM
+
 warnings.filterwarnings('ignore')
 
 # 设置中文字体
@@ -158,94 +159,22 @@ class SEMParameterEstimator:
                 nodes_to_process = [node for node in self.data.columns if node in graph_nodes]
                 print(f"处理图中的 {len(nodes_to_process)} 个节点")
             
-            total_r2 = 0
-            total_nodes_with_parents = 0
-            
+            # 父节点均不在数据中的节点不参与估计（与逐节点回归时一致）
+            parents_of = {}
             for node in nodes_to_process:
-                parents = list(self.graph.predecessors(node))
-                
-                if parents:
-                    # 确保所有父节点都在数据中
-                    valid_parents = [p for p in parents if p in self.data.columns]
-                    if not valid_parents:
-                        continue
-                    
-                    X = self.data[valid_parents].values
-                    y = self.data[node].values
-                    
-                    # 拟合线性模型
-                    model = LinearRegression()
-                    model.fit(X, y)
-                    
-                    # 计算预测值和残差
-                    y_pred = model.predict(X)
-                    residuals = y - y_pred
-                    
-                    # 计算各种统计量
-                    r2 = model.score(X, y)
-                    adjusted_r2 = 1 - (1 - r2) * (len(y) - 1) / (len(y) - len(valid_parents) - 1)
-                    mse = np.mean(residuals ** 2)
-                    rmse = np.sqrt(mse)
-                    mae = np.mean(np.abs(residuals))
-                    
-                    # 计算系数的标准误差（简化版）
-                    residual_var = np.var(residuals, ddof=len(valid_parents) + 1)
-                    X_with_intercept = np.column_stack([np.ones(len(X)), X])
-                    try:
-                        cov_matrix = residual_var * np.linalg.inv(X_with_intercept.T @ X_with_intercept)
-                        std_errors = np.sqrt(np.diag(cov_matrix))
-                        intercept_se = std_errors[0]
-                        coef_se = std_errors[1:].tolist()
-                    except:
-                        intercept_se = np.nan
-                        coef_se = [np.nan] * len(valid_parents)
-                    
-                    # 计算t统计量和p值（简化版）
-                    try:
-                        t_intercept = model.intercept_ / intercept_se if not np.isnan(intercept_se) else np.nan
-                        t_coefs = [coef / se for coef, se in zip(model.coef_, coef_se) if not np.isnan(se)]
-                    except:
-                        t_intercept = np.nan
-                        t_coefs = [np.nan] * len(valid_parents)
-                    
-                    sem_results[node] = {
-                        'type': 'structural_equation',
-                        'parents': valid_parents,
-                        'coefficients': model.coef_.tolist(),
-                        'intercept': float(model.intercept_),
-                        'coefficient_std_errors': coef_se,
-                        'intercept_std_error': float(intercept_se) if not np.isnan(intercept_se) else None,
-                        't_statistics': {
-                            'intercept': float(t_intercept) if not np.isnan(t_intercept) else None,
-                            'coefficients': t_coefs
-                        },
-                        'r_squared': float(r2),
-                        'adjusted_r_squared': float(adjusted_r2),
-                        'residual_variance': float(np.var(residuals)),
-                        'mse': float(mse),
-                        'rmse': float(rmse),
-                        'mae': float(mae),
-                        'sample_size': len(y),
-                        'degrees_of_freedom': len(y) - len(valid_parents) - 1
-                    }
-                    
-                    total_r2 += r2
-                    total_nodes_with_parents += 1
-                    
-                else:
-                    # 无父节点的情况（外生变量）
-                    mean_val = float(self.data[node].mean())
-                    var_val = float(self.data[node].var())
-                    std_val = float(self.data[node].std())
-                    
-                    sem_results[node] = {
-                        'type': 'exogenous_variable',
-                        'parents': [],
-                        'mean': mean_val,
-                        'variance': var_val,
-                        'standard_deviation': std_val,
-                        'sample_size': len(self.data[node])
-                    }
+                parents = list(self.graph.predecessors(node)) if node in graph_nodes else []
+                valid_parents = [p for p in parents if p in self.data.columns]
+                if parents and not valid_parents:
+                    continue
+                parents_of[node] = valid_parents
+            
+            # 叉积矩阵只计算一次，全部结构方程从其子块批量求解
+            engine = GramSEM(self.data[list(nodes_to_process)])
+            sem_results = engine.fit(parents_of)
+            
+            r2_values = [eq['r_squared'] for eq in sem_results.values() if eq['type'] == 'structural_equation']
+            total_r2 = sum(r2_values)
+            total_nodes_with_parents = len(r2_values)
             
             # 计算整体模型拟合统计量
             avg_r2 = total_r2 / max(total_nodes_with_parents, 1)
@@ -406,7 +335,7 @@ class SEMParameterEstimator:
                             '变量': parent,
                             '系数': f"{coef:.6f}",
                             '标准误': f"{se:.6f}" if not np.isnan(se) else 'N/A',
-                            't统计量': f"{t_stat:.4f}" if not np.isnan(t_stat) else 'N/A',
+                            't统计量': f"{t_stat:.4f}" if t_stat is not None and not np.isnan(t_stat) else 'N/A',
                             '变量类型': '解释变量'
                         })
             
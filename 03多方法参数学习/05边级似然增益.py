@@ -14,13 +14,17 @@ import json
 import os
 from datetime import datetime
 import warnings
-from itertools import product
+from concurrent.futures import ThreadPoolExecutor
 import networkx as nx
 import pickle
 from scipy import stats
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
 
+from 计数引擎 import CountEngine
+from 似然评估器 import CompiledLikelihood
+from 紧凑CPD import COMPACT_THRESHOLD, estimate_compact_cpt
+
 warnings.filterwarnings('ignore')
 
 # 设置中文字体
@@ -31,19 +35,30 @@ plt.rcParams['axes.unicode_minus'] = False
 class EdgeLikelihoodGainCalculator:
     """边级似然增益计算器"""
     
-    def __init__(self, data_file=None):
+    # EM的移除边似然沿用MLE近似
+    METHOD_KINDS = {'MLE': 'mle', 'Bayesian': 'bayesian', 'EM': 'mle', 'SEM': 'sem'}
+    # 与 MLE / 贝叶斯估计器一致的紧凑参数化（父节点数超过阈值的节点）
+    COMPACT_FAMILIES = {'mle': ('noisy_or', {}), 'bayesian': ('logistic', {'l2': 1.0})}
+    
+    def __init__(self, data_file=None, n_jobs=None, compact_threshold=COMPACT_THRESHOLD):
         """
         初始化边级似然增益计算器
         
         Args:
             data_file: 数据文件路径
+            n_jobs: 并行计算家族项的线程数
+            compact_threshold: 当前图中父节点数超过该值的节点，移除边前后都使用紧凑CPD
         """
         self.data_file = data_file
+        self.n_jobs = n_jobs
+        self.compact_threshold = compact_threshold
         self.data = None
         self.processed_data = None
         self.causal_edges = []
         self.graph = None
         self.results = {}
+        self._count_engine = None
+        self._family_cache = {}  # (方法类型, 节点, 父节点) -> 家族项
         
     def load_data(self):
         """加载数据"""
@@ -171,6 +186,9 @@ class EdgeLikelihoodGainCalculator:
         """
         计算边级似然增益 ΔLL(e) = LL_full - LL_drop(e)
         
+        似然按家族可分解：移除 s→t 只改变节点 t 的家族项，因此
+        ΔLL(s→t) = LL_t(Pa(t)) - LL_t(Pa(t) \ {s})，家族项按 (方法, 节点, 父节点) 缓存。
+        
         Args:
             method_name: 参数学习方法名称 ('MLE', 'Bayesian', 'EM', 'SEM')
         
@@ -180,45 +198,42 @@ class EdgeLikelihoodGainCalculator:
         print(f"\n开始计算 {method_name} 方法的边级似然增益...")
         
         try:
-            # 获取完整图的对数似然
-            if method_name in self.results:
-                if method_name == 'SEM':
-                    # SEM方法使用R²作为似然度量
-                    full_likelihood = self._calculate_sem_likelihood()
-                else:
-                    full_likelihood = self.results[method_name].get('log_likelihood', 0)
-            else:
+            if method_name not in self.results:
                 print(f"方法 {method_name} 的结果不存在")
                 return {}
             
+            kind = self.METHOD_KINDS.get(method_name)
+            if kind is None:
+                return {}
+            self._compute_family_terms(self._required_family_terms(kind))
+            
             edge_gains = {}
+            if kind == 'sem':
+                # SEM方法使用平均R²作为似然度量
+                full_sum, full_count = self._sem_totals()
+                full_likelihood = self._calculate_sem_likelihood()
+            else:
+                # 完整图的对数似然 = 各节点家族项之和
+                full_likelihood = sum(self._family_cache[(kind, node, parents)]
+                                      for node, parents in self._current_families())
             
-            # 对每条边计算似然增益
             for edge in self.causal_edges:
                 source, target = edge
+                parents, dropped = self._edge_families(source, target)
                 
-                # 创建移除该边的临时图
-                temp_graph = self.graph.copy()
-                temp_graph.remove_edge(source, target)
-                
-                # 保存原图并替换为临时图
-                original_graph = self.graph
-                self.graph = temp_graph
-                
-                # 重新估计参数并计算似然
-                if method_name == 'MLE':
-                    drop_likelihood = self._calculate_mle_likelihood_for_edge_removal()
-                elif method_name == 'Bayesian':
-                    drop_likelihood = self._calculate_bayesian_likelihood_for_edge_removal()
-                elif method_name == 'EM':
-                    drop_likelihood = self._calculate_em_likelihood_for_edge_removal()
-                elif method_name == 'SEM':
-                    drop_likelihood = self._calculate_sem_likelihood_for_edge_removal()
+                if parents is None:
+                    # 目标节点不在数据中，移除该边不改变似然
+                    drop_likelihood = full_likelihood
+                elif kind == 'sem':
+                    old = self._family_cache[(kind, target, parents)]
+                    new = self._family_cache[(kind, target, dropped)] if dropped else None
+                    drop_sum = full_sum - (old or 0) + (new or 0)
+                    drop_count = full_count - (old is not None) + (new is not None)
+                    drop_likelihood = drop_sum / max(1, drop_count)
                 else:
-                    drop_likelihood = 0
-                
-                # 恢复原图
-                self.graph = original_graph
+                    drop_likelihood = (full_likelihood
+                                       - self._family_cache[(kind, target, parents)]
+                                       + self._family_cache[(kind, target, dropped)])
                 
                 # 计算似然增益
                 likelihood_gain = full_likelihood - drop_likelihood
@@ -254,141 +269,123 @@ class EdgeLikelihoodGainCalculator:
             traceback.print_exc()
             return {}
     
-    def _calculate_mle_likelihood_for_edge_removal(self):
-        """为边移除计算MLE似然"""
-        try:
-            total_log_likelihood = 0
-            graph_nodes = set(self.graph.nodes())
-            
-            for node in graph_nodes:
-                if node not in self.processed_data.columns:
-                    continue
-                
-                parents = list(self.graph.predecessors(node))
-                parents = [p for p in parents if p in self.processed_data.columns]
-                
-                if not parents:
-                    # 无父节点，计算边际概率
-                    node_counts = self.processed_data[node].value_counts()
-                    total_count = len(self.processed_data)
-                    
-                    for value, count in node_counts.items():
-                        prob = count / total_count
-                        if prob > 0:
-                            total_log_likelihood += count * np.log(prob)
-                else:
-                    # 有父节点，计算条件概率
-                    parent_combinations = list(product(*[self.processed_data[p].unique() for p in parents]))
-                    
-                    for parent_combo in parent_combinations:
-                        # 创建父节点条件
-                        condition = pd.Series([True] * len(self.processed_data))
-                        for i, parent in enumerate(parents):
-                            condition &= (self.processed_data[parent] == parent_combo[i])
-                        
-                        if condition.sum() == 0:
-                            continue
-                        
-                        # 在给定父节点值的条件下，计算子节点的条件概率
-                        subset = self.processed_data[condition]
-                        node_counts = subset[node].value_counts()
-                        total_count = len(subset)
-                        
-                        for value, count in node_counts.items():
-                            prob = count / total_count
-                            if prob > 0:
-                                total_log_likelihood += count * np.log(prob)
-            
-            return total_log_likelihood
-        except Exception as e:
-            print(f"计算MLE似然失败: {e}")
-            return 0
+    def _data_parents(self, node):
+        """当前图中节点在数据里存在的父节点（保持图中顺序）"""
+        return tuple(p for p in self.graph.predecessors(node) if p in self.processed_data.columns)
     
-    def _calculate_bayesian_likelihood_for_edge_removal(self):
-        """为边移除计算贝叶斯似然"""
-        try:
-            total_log_likelihood = 0
-            alpha = 1.0  # Dirichlet先验参数
-            graph_nodes = set(self.graph.nodes())
-            
-            for node in graph_nodes:
-                if node not in self.processed_data.columns:
-                    continue
-                
-                parents = list(self.graph.predecessors(node))
-                parents = [p for p in parents if p in self.processed_data.columns]
-                
-                if not parents:
-                    # 无父节点
-                    node_counts = self.processed_data[node].value_counts()
-                    total_count = len(self.processed_data)
-                    
-                    for value, count in node_counts.items():
-                        prob = (count + alpha) / (total_count + alpha * len(node_counts))
-                        if prob > 0:
-                            total_log_likelihood += count * np.log(prob)
-                else:
-                    # 有父节点
-                    parent_combinations = list(product(*[self.processed_data[p].unique() for p in parents]))
-                    
-                    for parent_combo in parent_combinations:
-                        condition = pd.Series([True] * len(self.processed_data))
-                        for i, parent in enumerate(parents):
-                            condition &= (self.processed_data[parent] == parent_combo[i])
-                        
-                        if condition.sum() == 0:
-                            continue
-                        
-                        subset = self.processed_data[condition]
-                        node_counts = subset[node].value_counts()
-                        total_count = len(subset)
-                        
-                        for value, count in node_counts.items():
-                            prob = (count + alpha) / (total_count + alpha * len(node_counts))
-                            if prob > 0:
-                                total_log_likelihood += count * np.log(prob)
-            
-            return total_log_likelihood
-        except Exception as e:
-            print(f"计算贝叶斯似然失败: {e}")
-            return 0
+    def _current_families(self):
+        """当前图中所有在数据里的节点及其父节点"""
+        return [(node, self._data_parents(node)) for node in self.graph.nodes()
+                if node in self.processed_data.columns]
     
-    def _calculate_em_likelihood_for_edge_removal(self):
-        """为边移除计算EM似然"""
-        # 简化实现，使用MLE似然作为近似
-        return self._calculate_mle_likelihood_for_edge_removal()
+    def _edge_families(self, source, target):
+        """移除 source→target 前后目标节点的父节点；目标不在数据中时返回 (None, None)"""
+        if target not in self.processed_data.columns:
+            return None, None
+        parents = self._data_parents(target)
+        return parents, tuple(p for p in parents if p != source)
     
-    def _calculate_sem_likelihood_for_edge_removal(self):
-        """为边移除计算SEM似然"""
-        try:
-            total_r_squared = 0
-            node_count = 0
-            graph_nodes = set(self.graph.nodes())
-            
-            for node in graph_nodes:
-                if node not in self.processed_data.columns:
-                    continue
-                
-                parents = list(self.graph.predecessors(node))
-                parents = [p for p in parents if p in self.processed_data.columns]
-                
-                if parents:
-                    # 有父节点，进行线性回归
-                    X = self.processed_data[parents].values
-                    y = self.processed_data[node].values
-                    
-                    if len(np.unique(y)) > 1:  # 确保y有变化
-                        model = LinearRegression()
-                        model.fit(X, y)
-                        r_squared = model.score(X, y)
-                        total_r_squared += max(0, r_squared)  # 确保R²非负
-                        node_count += 1
-            
-            # 返回平均R²作为似然度量
-            return total_r_squared / max(1, node_count)
-        except Exception as e:
-            print(f"计算SEM似然失败: {e}")
-            return 0
+    def _required_family_terms(self, kind):
+        """计算某方法全部边的增益所需的家族项"""
+        terms = {(kind, node, parents) for node, parents in self._current_families()}
+        for source, target in self.causal_edges:
+            parents, dropped = self._edge_families(source, target)
+            if parents is not None and (kind != 'sem' or dropped):
+                terms.add((kind, target, dropped))
+        return terms
+    
+    def _compute_family_terms(self, terms):
+        """并行计算缓存中缺失的家族项"""
+        missing = [term for term in terms if term not in self._family_cache]
+        if not missing:
+            return
+        
+        # 当前图的 MLE/贝叶斯 家族项由编译后的似然评估器一次 gather 得到
+        for kind, alpha in (('mle', None), ('bayesian', 1.0)):
+            current = {(kind, node, parents) for node, parents in self._current_families()}
+            if any(term in current for term in missing):
+                per_node = CompiledLikelihood(self._fit_current_graph_cpts(alpha)).per_node(self.processed_data)
+                for node, parents in self._current_families():
+                    self._family_cache[(kind, node, parents)] = per_node[node]
+        
+        missing = [term for term in missing if term not in self._family_cache]
+        self._get_count_engine()  # 在主线程中完成数据编码，工作线程只读
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+            for term, value in zip(missing, executor.map(self._family_term_value, missing)):
+                self._family_cache[term] = value
+    
+    def _get_count_engine(self):
+        if self._count_engine is None:
+            graph_columns = [c for c in self.processed_data.columns if c in self.graph]
+            self._count_engine = CountEngine(self.processed_data[graph_columns])
+        return self._count_engine
+    
+    def _family_probabilities(self, counts, alpha=None):
+        """
+        家族频数 → 条件概率
+        
+        Args:
+            alpha: None 为MLE；否则为Dirichlet先验参数，分母按该父节点组合下
+                   实际出现的子节点取值个数计（与原贝叶斯似然实现一致）
+        """
+        if alpha is None:
+            return CountEngine.probabilities_from_counts(counts)
+        totals = counts.sum(axis=1, keepdims=True)
+        observed_values = (counts > 0).sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(totals > 0, (counts + alpha) / (totals + alpha * observed_values), 0.5)
+    
+    def _compact_family(self, kind, node):
+        """节点按当前图的父节点数决定是否使用紧凑CPD（移除边前后保持同一参数化，增益才可比）"""
+        if kind in self.COMPACT_FAMILIES and len(self._data_parents(node)) > self.compact_threshold:
+            return self.COMPACT_FAMILIES[kind]
+        return None
+    
+    def _family_term_value(self, term):
+        """单个家族项：MLE/贝叶斯为家族对数似然，SEM为回归R²（无父节点或y无变化时为None）"""
+        kind, node, parents = term
+        parents = list(parents)
+        
+        if kind == 'sem':
+            if not parents:
+                return None
+            X = self.processed_data[parents].values
+            y = self.processed_data[node].values
+            if len(np.unique(y)) <= 1:  # 确保y有变化
+                return None
+            model = LinearRegression()
+            model.fit(X, y)
+            return max(0, model.score(X, y))  # 确保R²非负
+        
+        compact = self._compact_family(kind, node)
+        if compact:
+            family, kwargs = compact
+            return estimate_compact_cpt(self._get_count_engine(), node, parents, family, **kwargs)[1]
+        
+        counts = self._get_count_engine().family_counts(node, parents).astype(np.float64)
+        probs = self._family_probabilities(counts, 1.0 if kind == 'bayesian' else None)
+        return CountEngine.log_likelihood_from_counts(counts, probs)
+    
+    def _fit_current_graph_cpts(self, alpha=None):
+        """在当前图结构下重新估计CPT（每个节点一次 bincount）"""
+        engine = self._get_count_engine()
+        cpts = {}
+        for node, parents in self._current_families():
+            compact = self._compact_family('mle' if alpha is None else 'bayesian', node)
+            if compact:
+                family, kwargs = compact
+                cpts[node] = estimate_compact_cpt(engine, node, list(parents), family, **kwargs)[0]
+                continue
+            counts = engine.family_counts(node, list(parents)).astype(np.float64)
+            cpts[node] = engine.to_cpt(list(parents), self._family_probabilities(counts, alpha))
+        return cpts
+    
+    def _sem_totals(self):
+        """当前图中各节点回归R²之和及参与的节点数"""
+        values = [self._family_cache[('sem', node, parents)]
+                  for node, parents in self._current_families() if parents]
+        values = [v for v in values if v is not None]
+        return sum(values), len(values)
     
     def _calculate_sem_likelihood(self):
         """计算完整SEM的似然"""
@@ -396,17 +393,25 @@ class EdgeLikelihoodGainCalculator:
             if 'SEM' in self.results and 'average_r_squared' in self.results['SEM']:
                 return self.results['SEM']['average_r_squared']
             else:
-                # 重新计算
-                return self._calculate_sem_likelihood_for_edge_removal()
+                # 重新计算：平均R²
+                self._compute_family_terms(self._required_family_terms('sem'))
+                total, count = self._sem_totals()
+                return total / max(1, count)
         except Exception as e:
             print(f"获取SEM似然失败: {e}")
             return 0
     
     def calculate_all_methods_gains(self):
-        """计算所有方法的边级似然增益"""
+        """计算所有方法的边级似然增益（先并行算好全部方法所需的家族项）"""
         all_gains = {}
         methods = ['MLE', 'Bayesian', 'EM', 'SEM']
         
+        terms = set()
+        for method in methods:
+            if method in self.results:
+                terms |= self._required_family_terms(self.METHOD_KINDS[method])
+        self._compute_family_terms(terms)
+        
         for method in methods:
             if method in self.results:
                 gains = self.calculate_edge_likelihood_gain(method)
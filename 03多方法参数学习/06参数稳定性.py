@@ -3,7 +3,7 @@
 """
 参数稳定性分析器
 评估同一边在不同参数学习方法下的一致性
-计算稳定性指标和一致性水平
+计算稳定性指标和一致性水平，并用加权频数自助法给出CPT与边增益的抽样置信区间
 """
 
 import pandas as pd
@@ -17,6 +17,8 @@ import warnings
 from itertools import combinations
 import networkx as nx
 
+from 自助法引擎 import WeightedBootstrap
+
 warnings.filterwarnings('ignore')
 
 # 设置中文字体
@@ -27,16 +29,84 @@ plt.rcParams['axes.unicode_minus'] = False
 class ParameterStabilityAnalyzer:
     """参数稳定性分析器"""
     
-    def __init__(self, data_file=None):
+    def __init__(self, data_file=None, n_bootstrap=1000, resampling='poisson', confidence=0.95, random_state=None):
         """
         初始化参数稳定性分析器
         
         Args:
             data_file: 数据文件路径
+            n_bootstrap: 自助法重复样本数（0 表示不做自助法）
+            resampling: 'poisson' 或 'multinomial' 行权重
+            confidence: 置信区间水平
+            random_state: 随机种子
         """
         self.data_file = data_file
+        self.n_bootstrap = n_bootstrap
+        self.resampling = resampling
+        self.confidence = confidence
+        self.random_state = random_state
+        self.processed_data = None
         self.causal_edges = []
         self.edge_gains = {}  # 存储各方法的边级似然增益结果
+        self.bootstrap_results = None
+    
+    def load_data(self):
+        """加载并二值化数据（与边级似然增益相同的预处理）"""
+        if not self.data_file or not os.path.exists(self.data_file):
+            print(f"⚠ 数据文件不存在，跳过自助法: {self.data_file}")
+            return False
+        
+        try:
+            data = pd.read_csv(self.data_file)
+            id_columns = [col for col in data.columns if 'id' in col.lower()]
+            if id_columns:
+                data = data.drop(columns=id_columns)
+            
+            for col in data.columns:
+                if data[col].dtype in ['object', 'category']:
+                    if len(data[col].unique()) == 2:
+                        data[col] = pd.Categorical(data[col]).codes
+                else:
+                    median_val = data[col].median()
+                    data[col] = (data[col] > median_val).astype(int)
+            
+            self.processed_data = data
+            print(f"成功加载数据: {data.shape}")
+            return True
+        except Exception as e:
+            print(f"加载数据失败: {e}")
+            return False
+    
+    def calculate_bootstrap_intervals(self):
+        """
+        加权频数自助法：所有CPT条目与边似然增益的置信区间
+        
+        Returns:
+            dict: WeightedBootstrap.run 的结果，失败时为None
+        """
+        if self.processed_data is None or self.n_bootstrap <= 0:
+            return None
+        
+        print(f"\n开始自助法 (B={self.n_bootstrap}, {self.resampling})...")
+        try:
+            parents_of = {}
+            for source, target in self.causal_edges:
+                if source in self.processed_data.columns and target in self.processed_data.columns:
+                    parents_of.setdefault(source, [])
+                    parents_of.setdefault(target, []).append(source)
+            
+            bootstrap = WeightedBootstrap(self.processed_data[list(parents_of)], parents_of,
+                                          n_replicates=self.n_bootstrap, resampling=self.resampling,
+                                          random_state=self.random_state)
+            self.bootstrap_results = bootstrap.run(self.causal_edges, confidence=self.confidence)
+            print(f"✓ 完成 {len(self.bootstrap_results['cpt_intervals'])} 个节点CPT、"
+                  f"{len(self.bootstrap_results['edge_gain_intervals'])} 条边增益的自助法置信区间")
+            return self.bootstrap_results
+        except Exception as e:
+            print(f"自助法计算失败: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
         
     def load_causal_edges(self):
         """加载因果边"""
@@ -179,6 +249,10 @@ class ParameterStabilityAnalyzer:
                 print("没有可用的边级似然增益结果")
                 return {}
             
+            # 方法间相关性与边无关，只计算一次
+            correlations = self._method_correlations()
+            bootstrap_gains = (self.bootstrap_results or {}).get('edge_gain_intervals', {})
+            
             # 计算每条边的稳定性
             edge_stability = {}
             processed_edges = 0
@@ -216,25 +290,6 @@ class ParameterStabilityAnalyzer:
                     max_diff = max(pairwise_diffs) if pairwise_diffs else 0
                     avg_diff = np.mean(pairwise_diffs) if pairwise_diffs else 0
                     
-                    # 计算方法间相关性
-                    correlations = {}
-                    if len(method_names) >= 2:
-                        for method1, method2 in combinations(method_names, 2):
-                            # 收集两个方法在所有边上的分数
-                            scores1, scores2 = [], []
-                            for e in self.causal_edges:
-                                ek = f"{e[0]}->{e[1]}"
-                                if (ek in self.edge_gains.get(method1, {}) and 
-                                    ek in self.edge_gains.get(method2, {})):
-                                    s1 = self.edge_gains[method1][ek].get('S_param', 0)
-                                    s2 = self.edge_gains[method2][ek].get('S_param', 0)
-                                    scores1.append(s1)
-                                    scores2.append(s2)
-                            
-                            if len(scores1) >= 2:
-                                corr = np.corrcoef(scores1, scores2)[0, 1]
-                                correlations[f"{method1}-{method2}"] = corr if not np.isnan(corr) else 0
-                    
                     stability_results[edge_key] = {
                         'edge': edge,
                         'method_scores': method_scores,
@@ -246,8 +301,13 @@ class ParameterStabilityAnalyzer:
                         'avg_pairwise_diff': avg_diff,
                         'num_methods': len(scores),
                         'consistency_level': self._classify_consistency(stability_score),
-                        'method_correlations': correlations
+                        'method_correlations': {
+                            f"{m1}-{m2}": correlations[f"{m1}-{m2}"]
+                            for m1, m2 in combinations(method_names, 2) if f"{m1}-{m2}" in correlations
+                        }
                     }
+                    if edge_key in bootstrap_gains:
+                        stability_results[edge_key]['bootstrap_gain'] = bootstrap_gains[edge_key]
             
             # 计算整体稳定性统计
             if stability_results:
@@ -283,6 +343,20 @@ class ParameterStabilityAnalyzer:
             traceback.print_exc()
             return {}
     
+    def _method_correlations(self):
+        """各方法对 S_param 在全部边上的成对相关系数（每对方法只计算一次）"""
+        correlations = {}
+        edge_keys = [f"{e[0]}->{e[1]}" for e in self.causal_edges]
+        for method1, method2 in combinations(list(self.edge_gains.keys()), 2):
+            gains1, gains2 = self.edge_gains[method1], self.edge_gains[method2]
+            shared = [ek for ek in edge_keys if ek in gains1 and ek in gains2]
+            if len(shared) >= 2:
+                scores1 = [gains1[ek].get('S_param', 0) for ek in shared]
+                scores2 = [gains2[ek].get('S_param', 0) for ek in shared]
+                corr = np.corrcoef(scores1, scores2)[0, 1]
+                correlations[f"{method1}-{method2}"] = corr if not np.isnan(corr) else 0
+        return correlations
+    
     def _classify_consistency(self, stability_score):
         """根据稳定性分数分类一致性水平"""
         if stability_score >= 0.8:
@@ -324,6 +398,10 @@ class ParameterStabilityAnalyzer:
         # 创建可视化
         self._create_visualizations(stability_results, output_folder)
         
+        # 自助法置信区间
+        if self.bootstrap_results:
+            self._create_bootstrap_csv(output_folder)
+        
         print(f"参数稳定性结果已保存到: {output_folder}")
     
     def _create_stability_summary_csv(self, stability_results, output_folder):
@@ -379,6 +457,53 @@ class ParameterStabilityAnalyzer:
         except Exception as e:
             print(f"创建稳定性汇总CSV失败: {e}")
     
+    def _create_bootstrap_csv(self, output_folder):
+        """保存CPT条目与边增益的自助法置信区间"""
+        try:
+            level = f"{self.bootstrap_results['confidence']:.0%}"
+            cpt_frames = []
+            for node, info in self.bootstrap_results['cpt_intervals'].items():
+                parents = info['parents']
+                n_configs = len(info['point'])
+                bits = (np.arange(n_configs)[:, None] >> np.arange(len(parents) - 1, -1, -1)) & 1
+                cpt_frames.append(pd.DataFrame({
+                    '节点': node,
+                    '父节点': ', '.join(parents),
+                    '条件': [','.join(map(str, row)) for row in bits] if parents else [''],
+                    'P(1)估计': info['point'],
+                    'P(1)自助均值': info['mean'],
+                    'P(1)标准误': info['std'],
+                    f'{level}下限': info['lower'],
+                    f'{level}上限': info['upper'],
+                    '有效重复样本数': info['n_effective'],
+                    '已观测': info['observed']
+                }))
+            if cpt_frames:
+                cpt_file = os.path.join(output_folder, "CPT自助法置信区间.csv")
+                pd.concat(cpt_frames, ignore_index=True).to_csv(cpt_file, index=False, encoding='utf-8-sig')
+            
+            gain_rows = []
+            for edge_key, info in self.bootstrap_results['edge_gain_intervals'].items():
+                gain_rows.append({
+                    '边': edge_key,
+                    '源节点': info['edge'][0],
+                    '目标节点': info['edge'][1],
+                    '似然增益': info['point'],
+                    '自助均值': info['mean'],
+                    '标准误': info['std'],
+                    f'{level}下限': info['lower'],
+                    f'{level}上限': info['upper'],
+                    '增益为正比例': info['positive_fraction']
+                })
+            if gain_rows:
+                gain_file = os.path.join(output_folder, "边增益自助法置信区间.csv")
+                pd.DataFrame(gain_rows).sort_values('似然增益', ascending=False).to_csv(
+                    gain_file, index=False, encoding='utf-8-sig')
+            
+            print(f"自助法置信区间已保存 (B={self.bootstrap_results['n_replicates']})")
+        except Exception as e:
+            print(f"保存自助法置信区间失败: {e}")
+    
     def _create_detailed_report(self, stability_results, output_folder):
         """创建详细报告"""
         try:
@@ -435,6 +560,11 @@ class ParameterStabilityAnalyzer:
                         f.write("  方法间相关性:\n")
                         for pair, corr in info['method_correlations'].items():
                             f.write(f"    {pair}: {corr:.4f}\n")
+                    
+                    if 'bootstrap_gain' in info:
+                        boot = info['bootstrap_gain']
+                        f.write(f"  自助法似然增益: {boot['point']:.4f} "
+                                f"[{boot['lower']:.4f}, {boot['upper']:.4f}], 标准误 {boot['std']:.4f}\n")
             
             print(f"详细报告已保存: {report_file}")
             
@@ -590,7 +720,7 @@ def main():
     base_dir = os.path.dirname(os.path.abspath(__file__))
     
     # 数据文件路径 - 使用绝对路径
-    data_file = os.path.join(base_dir, "..", "01数据预处理", "processed_data.csv")
+    data_file = os.path.join(base_dir, "..", "01数据预处理", "缩减数据_规格.csv")
     
     # 创建分析器实例
     analyzer = ParameterStabilityAnalyzer(data_file)
@@ -605,6 +735,10 @@ def main():
         print("边级似然增益结果加载失败，程序退出")
         return
     
+    # 自助法置信区间（数据不可用时跳过）
+    if analyzer.load_data():
+        analyzer.calculate_bootstrap_intervals()
+    
     # 计算参数稳定性
     stability_results = analyzer.calculate_parameter_stability()
     
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+07交叉验证 (K-Fold Predictive Evaluation)
+对 MLE、Bayesian、EM、SEM 四种方法做k折交叉验证，比较每个节点在留出数据上的对数损失
+
+    - 折划分只做一次；每个家族一次 np.bincount 得到全部折的频数 (k, 2^p, 2)，
+      训练频数 = 总频数 - 该折频数，MLE/贝叶斯 CPT 直接由频数差得到，不重新扫描数据
+    - SEM：每折的一阶矩与叉积矩阵同样由 总体 - 该折 得到，标准化后交给 SEM引擎 求解，
+      CPT 与 SEM回归预测 相同（父节点取 0/1 代入线性方程后经 sigmoid）；无父节点的根节点使用训练频数的边缘分布
+    - EM：充分统计量依赖参数，无法做频数差，每折在训练行的含缺失数据上运行 EM引擎
+    - 留出行由编译后的似然评估器一次 gather 打分，(折, 方法) 任务在线程池中并行
+"""
+
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+import json
+import os
+from datetime import datetime
+import warnings
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import networkx as nx
+
+from 计数引擎 import CountEngine
+from 似然评估器 import CompiledLikelihood
+from 狄利克雷先验 import posterior_probabilities
+from EM引擎 import MissingDataEM
+from SEM引擎 import GramSEM
+
+warnings.filterwarnings('ignore')
+
+# 设置中文字体
+plt.rcParams['font.family'] = ['WenQuanYi Micro Hei', 'DejaVu Sans']
+plt.rcParams['font.sans-serif'] = ['WenQuanYi Micro Hei', 'DejaVu Sans']
+plt.rcParams['axes.unicode_minus'] = False
+
+class CrossValidationEvaluator:
+    """
+    参数学习方法的k折交叉验证评估器
+    """
+
+    METHODS = ['MLE', 'Bayesian', 'EM', 'SEM']
+
+    def __init__(self, data_file=None, n_folds=5, alpha=1.0, n_workers=4, random_state=42,
+                 em_max_iterations=100, em_tolerance=1e-6):
+        # 设置数据文件路径
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        parent_dir = os.path.dirname(script_dir)
+        if data_file is None:
+            self.data_file = os.path.join(parent_dir, '01数据预处理/缩减数据_规格.csv')
+        else:
+            self.data_file = data_file
+        self.missing_data_file = os.path.join(parent_dir, '01数据预处理/缩减数据_规格_含缺失.csv')
+        self.n_folds = n_folds
+        self.alpha = alpha  # 贝叶斯Dirichlet先验参数
+        self.n_workers = n_workers
+        self.random_state = random_state
+        self.em_max_iterations = em_max_iterations
+        self.em_tolerance = em_tolerance
+        self.data = None
+        self.missing_data = None
+        self.causal_edges = []
+        self.graph = nx.DiGraph()
+        self.results = {}
+        self.output_folder = None
+
+    def load_data(self):
+        """加载数据文件（含缺失数据用于EM，不存在时EM使用完整数据）"""
+        try:
+            print(f"正在加载数据文件: {self.data_file}")
+            if not os.path.exists(self.data_file):
+                print(f"数据文件不存在: {self.data_file}")
+                return False
+            self.data = pd.read_csv(self.data_file, encoding='utf-8')
+            print(f"成功加载数据: {self.data.shape}")
+
+            if os.path.exists(self.missing_data_file):
+                missing_data = pd.read_csv(self.missing_data_file, encoding='utf-8')
+                if len(missing_data) == len(self.data):
+                    self.missing_data = missing_data
+                    print(f"成功加载含缺失数据: {missing_data.shape}")
+                else:
+                    print("⚠ 含缺失数据与完整数据行数不一致，EM使用完整数据")
+            return True
+        except Exception as e:
+            print(f"加载数据失败: {e}")
+            return False
+
+    def preprocess_data(self):
+        """数据预处理：排除ID列并二值化（与各估计器一致，含缺失数据保持NaN）"""
+        print("正在进行数据预处理...")
+
+        exclude_columns = ['RECORD_ID', 'ID', 'id', 'record_id']
+
+        def binarize(data, keep_missing):
+            data = data.drop(columns=[col for col in data.columns if col in exclude_columns])
+            for col in data.columns:
+                if data[col].dtype in ['float64', 'int64']:
+                    binary = data[col] > data[col].median()
+                    data[col] = binary.astype(float).where(data[col].notna()) if keep_missing else binary.astype(int)
+            return data
+
+        self.data = binarize(self.data, keep_missing=False)
+        if self.missing_data is not None:
+            self.missing_data = binarize(self.missing_data, keep_missing=True)
+
+        print(f"数据预处理完成，最终数据维度: {self.data.shape}")
+
+    def load_causal_edges(self):
+        """加载因果边"""
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        parent_dir = os.path.dirname(script_dir)
+        edge_file = os.path.join(parent_dir, '02因果发现/06候选因果边集合/精简因果边列表.csv')
+
+        if not os.path.exists(edge_file):
+            print(f"因果边文件不存在: {edge_file}")
+            return False
+
+        try:
+            print(f"正在加载因果边: {edge_file}")
+            df = pd.read_csv(edge_file, encoding='utf-8')
+            for source_col, target_col in [('源节点', '目标节点'), ('父节点', '子节点'), ('Source', 'Target')]:
+                if source_col in df.columns and target_col in df.columns:
+                    break
+            else:
+                print(f"未识别的列格式: {df.columns.tolist()}")
+                return False
+
+            sources = df[source_col].astype(str).str.strip()
+            targets = df[target_col].astype(str).str.strip()
+            valid = sources.isin(self.data.columns) & targets.isin(self.data.columns)
+            self.causal_edges = list(zip(sources[valid], targets[valid]))
+            self.graph.add_edges_from(self.causal_edges)
+
+            print(f"成功加载 {len(self.causal_edges)} 条有效因果边")
+            return True
+        except Exception as e:
+            print(f"加载因果边失败 {edge_file}: {e}")
+            return False
+
+    def prepare_folds(self):
+        """划分折，并一次性得到全部折的家族频数与SEM矩"""
+        graph_nodes = set(self.graph.nodes())
+        self.nodes = [node for node in self.data.columns if not graph_nodes or node in graph_nodes]
+        self.parents_of = {node: list(self.graph.predecessors(node)) if node in self.graph else []
+                           for node in self.nodes}
+
+        n = len(self.data)
+        k = self.n_folds
+        rng = np.random.default_rng(self.random_state)
+        self.fold_of = np.empty(n, dtype=np.int64)
+        self.fold_of[rng.permutation(n)] = np.arange(n) % k
+        self.fold_sizes = np.bincount(self.fold_of, minlength=k)
+
+        # 每个家族一次 bincount：下标偏移 折编号 · 2^(p+1)
+        engine = CountEngine(self.data[self.nodes])
+        self.fold_counts = {}
+        for node in self.nodes:
+            parents = self.parents_of[node]
+            size = 2 << len(parents)
+            flat = engine.parent_config(parents).astype(np.int64) * 2 + engine.column(node)
+            counts = np.bincount(flat + self.fold_of * size, minlength=k * size)
+            self.fold_counts[node] = counts.reshape(k, size // 2, 2).astype(np.float64)
+        self.total_counts = {node: counts.sum(axis=0) for node, counts in self.fold_counts.items()}
+
+        # SEM：每折的一阶矩与原始叉积
+        X = self.data[self.nodes].to_numpy(dtype=np.float64)
+        self.fold_sums = np.stack([X[self.fold_of == f].sum(axis=0) for f in range(k)])
+        self.fold_cross = np.stack([X[self.fold_of == f].T @ X[self.fold_of == f] for f in range(k)])
+
+        print(f"划分 {k} 折，每折 {self.fold_sizes.min()} ~ {self.fold_sizes.max()} 行，{len(self.nodes)} 个节点")
+
+    def _sem_tables(self, fold, train_counts):
+        """由 总体 - 该折 的矩差拟合标准化SEM，生成与 SEM回归预测 相同的CPT"""
+        n_train = len(self.data) - self.fold_sizes[fold]
+        sums = self.fold_sums.sum(axis=0) - self.fold_sums[fold]
+        cross = self.fold_cross.sum(axis=0) - self.fold_cross[fold]
+        means = sums / n_train
+        gram = cross - n_train * np.outer(means, means)
+
+        # StandardScaler：总体标准差，方差为0的列不缩放
+        scale = np.sqrt(np.maximum(np.diag(gram), 0) / n_train)
+        scale[scale == 0] = 1.0
+        standardized = GramSEM.from_moments(self.nodes, n_train, np.zeros(len(self.nodes)),
+                                            gram / np.outer(scale, scale))
+        equations = standardized.fit(self.parents_of)
+
+        tables = []
+        for node in self.nodes:
+            equation = equations[node]
+            if equation['type'] != 'structural_equation':
+                tables.append(CountEngine.probabilities_from_counts(train_counts[node]))
+                continue
+            p = len(equation['parents'])
+            design = ((np.arange(1 << p)[:, None] >> np.arange(p - 1, -1, -1)) & 1).astype(np.float64)
+            prob_1 = 1 / (1 + np.exp(-np.clip(equation['intercept'] + design @ np.asarray(equation['coefficients']), -500, 500)))
+            tables.append(np.column_stack([1 - prob_1, prob_1]))
+        return tables
+
+    def _em_tables(self, fold, train_counts):
+        """在训练行的含缺失数据上运行EM（无含缺失数据时EM等价于MLE）"""
+        if self.missing_data is None or not set(self.nodes) <= set(self.missing_data.columns):
+            return [CountEngine.probabilities_from_counts(train_counts[node]) for node in self.nodes]
+        train = self.missing_data.loc[self.fold_of != fold, self.nodes]
+        engine = MissingDataEM(train, self.parents_of, random_state=self.random_state)
+        fit = engine.fit(self.em_max_iterations, self.em_tolerance, verbose=False)
+        return fit['thetas']
+
+    def _evaluate(self, task):
+        """单个 (方法, 折) 任务：训练CPT并对留出行打分，返回各节点留出对数似然"""
+        method, fold = task
+        train_counts = {node: self.total_counts[node] - self.fold_counts[node][fold] for node in self.nodes}
+
+        if method == 'MLE':
+            tables = [CountEngine.probabilities_from_counts(train_counts[node]) for node in self.nodes]
+        elif method == 'Bayesian':
+            tables = [posterior_probabilities(train_counts[node], self.alpha) for node in self.nodes]
+        elif method == 'EM':
+            tables = self._em_tables(fold, train_counts)
+        else:
+            tables = self._sem_tables(fold, train_counts)
+
+        compiled = CompiledLikelihood.from_tables(self.nodes, self.parents_of, tables)
+        held_out = self.data.loc[self.fold_of == fold, self.nodes]
+        return method, fold, compiled.node_row_log_likelihood(held_out).sum(axis=0)
+
+    def cross_validate(self):
+        """并行评估全部 (方法, 折)"""
+        print(f"\n开始 {self.n_folds} 折交叉验证 (线程数: {self.n_workers})...")
+
+        try:
+            self.prepare_folds()
+            tasks = [(method, fold) for method in self.METHODS for fold in range(self.n_folds)]
+            with ThreadPoolExecutor(max_workers=self.n_workers) as pool:
+                outcomes = list(pool.map(self._evaluate, tasks))
+
+            n = len(self.data)
+            node_ll = {method: np.zeros(len(self.nodes)) for method in self.METHODS}
+            fold_loss = {method: np.zeros(self.n_folds) for method in self.METHODS}
+            for method, fold, ll in outcomes:
+                node_ll[method] += ll
+                fold_loss[method][fold] = -ll.sum() / self.fold_sizes[fold]
+
+            # 每个节点、每行的平均对数损失
+            node_loss = pd.DataFrame({method: -node_ll[method] / n for method in self.METHODS}, index=self.nodes)
+            node_loss['最优方法'] = node_loss[self.METHODS].idxmin(axis=1)
+
+            summary = pd.DataFrame({
+                '方法': self.METHODS,
+                '平均对数损失': [float(-node_ll[m].sum() / n) for m in self.METHODS],
+                '折间标准差': [float(fold_loss[m].std(ddof=1)) if self.n_folds > 1 else 0.0 for m in self.METHODS],
+                '最优节点数': [int((node_loss['最优方法'] == m).sum()) for m in self.METHODS]
+            }).sort_values('平均对数损失')
+
+            self.results['CV'] = {
+                'node_log_loss': node_loss,
+                'summary': summary,
+                'fold_log_loss': {m: fold_loss[m].tolist() for m in self.METHODS},
+                'best_method': summary.iloc[0]['方法'],
+                'n_folds': self.n_folds,
+                'alpha': self.alpha,
+                'sample_size': n,
+                'timestamp': datetime.now().isoformat()
+            }
+
+            for _, row in summary.iterrows():
+                print(f"  {row['方法']}: 对数损失 {row['平均对数损失']:.4f} ± {row['折间标准差']:.4f}，"
+                      f"最优节点 {row['最优节点数']} 个")
+            print(f"交叉验证完成，留出对数损失最低的方法: {self.results['CV']['best_method']}")
+            return True
+
+        except Exception as e:
+            print(f"交叉验证失败: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+    def create_output_folder(self):
+        """创建输出文件夹"""
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        self.output_folder = os.path.join(script_dir, "07交叉验证结果")
+        os.makedirs(self.output_folder, exist_ok=True)
+        print(f"输出目录: {self.output_folder}")
+
+    def save_results(self):
+        """保存结果"""
+        print("\n保存交叉验证结果...")
+
+        if 'CV' not in self.results:
+            print("没有交叉验证结果可保存")
+            return
+
+        result = self.results['CV']
+
+        node_file = os.path.join(self.output_folder, "交叉验证_节点对数损失.csv")
+        result['node_log_loss'].to_csv(node_file, index_label='节点', encoding='utf-8-sig')
+
+        summary_file = os.path.join(self.output_folder, "交叉验证_方法汇总.csv")
+        result['summary'].to_csv(summary_file, index=False, encoding='utf-8-sig')
+
+        json_file = os.path.join(self.output_folder, "交叉验证结果.json")
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'summary': result['summary'].to_dict(orient='records'),
+                'node_log_loss': result['node_log_loss'].to_dict(orient='index'),
+                'fold_log_loss': result['fold_log_loss'],
+                'best_method': result['best_method'],
+                'n_folds': result['n_folds'],
+                'alpha': result['alpha'],
+                'sample_size': result['sample_size'],
+                'timestamp': result['timestamp']
+            }, f, ensure_ascii=False, indent=2, default=str)
+
+        self.create_comparison_plot()
+
+        print(f"交叉验证结果已保存到: {self.output_folder}")
+
+    def create_comparison_plot(self):
+        """各方法留出对数损失对比图"""
+        try:
+            summary = self.results['CV']['summary']
+            plt.figure(figsize=(8, 5))
+            plt.bar(summary['方法'], summary['平均对数损失'], yerr=summary['折间标准差'],
+                    color='skyblue', edgecolor='black', capsize=5)
+            plt.ylabel('留出对数损失（每行）')
+            plt.title(f"{self.n_folds} 折交叉验证：各方法预测对数损失")
+            plt.grid(True, axis='y', alpha=0.3)
+            plt.tight_layout()
+            plt.savefig(os.path.join(self.output_folder, "交叉验证_方法对比.png"), dpi=300, bbox_inches='tight')
+            plt.close()
+        except Exception as e:
+            print(f"创建对比图失败: {e}")
+
+    def run(self):
+        """运行k折交叉验证"""
+        print("=== 参数学习方法k折交叉验证 ===")
+
+        # 加载数据
+        if not self.load_data():
+            print("数据加载失败，程序退出")
+            return False
+
+        # 数据预处理
+        self.preprocess_data()
+
+        # 加载因果边
+        self.load_causal_edges()
+
+        # 运行交叉验证
+        if not self.cross_validate():
+            print("交叉验证失败")
+            return False
+
+        # 保存结果
+        self.create_output_folder()
+        self.save_results()
+
+        print("\n=== k折交叉验证完成 ===")
+        print(f"结果已保存到: {self.output_folder}")
+        return True
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="参数学习方法k折交叉验证")
+    parser.add_argument('--folds', type=int, default=5, help="折数")
+    parser.add_argument('--alpha', type=float, default=1.0, help="贝叶斯Dirichlet先验参数α")
+    parser.add_argument('--workers', type=int, default=4, help="并行线程数")
+    parser.add_argument('--seed', type=int, default=42, help="折划分随机种子")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    evaluator = CrossValidationEvaluator(n_folds=args.folds, alpha=args.alpha,
+                                         n_workers=args.workers, random_state=args.seed)
+    evaluator.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CPT存储 (Compact CPT Store)
+以数组保存条件概率表，替代按 "0,1,0" 字符串键嵌套的字典
+
+    - dense:  父节点较少时，直接保存 2^k × 2 概率表，按组合编号下标访问
+    - sparse: 父节点较多时，只保存出现过的组合编号（升序）及其概率行，
+              其余组合统一使用默认行（未观测组合的 [0.5, 0.5]）
+    - compact: 紧凑参数化（noisy-OR / logistic）的节点只保存 O(k) 个参数，
+               查询时按参数计算概率行，只有 to_table 才展开 2^k 行
+    - 组合编号与 itertools.product([0, 1], repeat=k) 顺序一致（第一个父节点为最高位）
+
+持久化为未压缩的 .npz：所有节点的表拼接为少数几个数组，元数据（节点、父节点、
+布局、偏移）以JSON字节保存。读取时直接按zip本地文件头定位各数组在文件中的偏移，
+用 np.memmap 映射，不解压、不逐节点读取，加载全部方法的CPT只需毫秒级。
+
+与现有JSON结构互相转换：CPTStore.from_json_dict / to_json_dict，
+知识图谱与后端可通过 load_cpts_as_json 优先读取 .npz。
+紧凑参数化的节点参数随JSON元数据保存，to_dict 原样返回参数化的CPT字典，
+需要完整表的下游（推断引擎）自行调用 to_table。
+"""
+
+import json
+import os
+import pickle
+import struct
+import zipfile
+from itertools import product
+
+import numpy as np
+
+from 紧凑CPD import COMPACT_TYPES, cpd_from_dict
+
+FORMAT_VERSION = 1
+# 父节点数不超过该值时使用稠密布局（2^12 × 2 个 float64 ≈ 64KB）
+DENSE_MAX_PARENTS = 12
+DEFAULT_ROW = (0.5, 0.5)
+
+# 各方法CPT所在的结果文件夹
+METHOD_FOLDERS = {
+    'MLE': '01MLE_CPT结果',
+    'Bayesian': '02Bayesian_CPT结果',
+    'EM': '03EM_CPT结果'
+}
+
+
+def key_to_index(key):
+    """CPT条件键 "0,1,0" → 组合编号"""
+    index = 0
+    for bit in str(key).split(','):
+        index = (index << 1) | int(float(bit))
+    return index
+
+
+def index_to_key(index, n_parents):
+    """组合编号 → CPT条件键"""
+    return ','.join(str((int(index) >> (n_parents - 1 - j)) & 1) for j in range(n_parents))
+
+
+def _json_serialisable(value):
+    """extra 随 .npz 的JSON元数据保存，只保留可JSON序列化的字段（标量或 sample_counts 等容器）"""
+    try:
+        json.dumps(value, ensure_ascii=False)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+class CompactCPT:
+    """单个节点的数组化CPT"""
+
+    def __init__(self, node, parents, layout, table=None, configs=None, rows=None,
+                 default=DEFAULT_ROW, node_type=None, extra=None):
+        """
+        Args:
+            node: 节点名
+            parents: 父节点列表（顺序决定组合编号）
+            layout: 'dense' / 'sparse' / 'compact'
+            table: dense 布局的 2^k × 2 概率表
+            configs: sparse 布局中出现过的组合编号（升序）
+            rows: sparse 布局中对应的概率行 (m × 2)
+            default: sparse 布局中未保存组合的概率行
+            node_type: 'marginal' / 'conditional'
+            extra: 需要随CPT保存的字段（如 prior_alpha；compact 布局为紧凑CPD的参数）
+        """
+        self.node = node
+        self.parents = list(parents)
+        self.layout = layout
+        self.table = table
+        self.configs = configs
+        self.rows = rows
+        self.default = np.asarray(default, dtype=np.float64)
+        self.node_type = node_type or ('conditional' if self.parents else 'marginal')
+        self.extra = dict(extra or {})
+        self._cpd = None
+
+    @property
+    def n_parents(self):
+        return len(self.parents)
+
+    @property
+    def cpd(self):
+        """compact 布局对应的紧凑CPD（按参数惰性构建）"""
+        if self._cpd is None:
+            self._cpd = cpd_from_dict({'type': self.node_type, 'parents': self.parents, **self.extra})
+        return self._cpd
+
+    @classmethod
+    def from_table(cls, node, parents, table, dense_max_parents=DENSE_MAX_PARENTS,
+                   default=DEFAULT_ROW, **kwargs):
+        """由 2^k × 2 概率表构建，父节点过多时转换为稀疏布局（只保留与默认行不同的组合）"""
+        table = np.asarray(table, dtype=np.float64).reshape(-1, 2)
+        if len(parents) <= dense_max_parents:
+            return cls(node, parents, 'dense', table=table, default=default, **kwargs)
+        default = np.asarray(default, dtype=np.float64)
+        configs = np.flatnonzero(np.any(table != default, axis=1)).astype(np.int64)
+        return cls(node, parents, 'sparse', configs=configs, rows=table[configs],
+                   default=default, **kwargs)
+
+    @classmethod
+    def from_dict(cls, node, cpt, dense_max_parents=DENSE_MAX_PARENTS):
+        """由现有JSON结构的单节点CPT构建"""
+        parents = list(cpt.get('parents', []))
+        if cpt.get('type') in COMPACT_TYPES:
+            # 只保存参数，不展开 2^k 行的表
+            extra = {k: v for k, v in cpt.items() if k not in ('type', 'parents', 'probabilities')}
+            return cls(node, parents, 'compact', node_type=cpt['type'], extra=extra)
+        probabilities = cpt['probabilities']
+        default = cpt.get('default_probabilities', DEFAULT_ROW)
+        extra = {k: v for k, v in cpt.items()
+                 if k not in ('type', 'parents', 'probabilities', 'default_probabilities')
+                 and _json_serialisable(v)}
+
+        if not parents:
+            table = np.asarray([probabilities[:2]], dtype=np.float64)
+            return cls(node, parents, 'dense', table=table, default=default,
+                       node_type=cpt.get('type'), extra=extra)
+
+        configs = np.array([key_to_index(k) for k in probabilities], dtype=np.int64)
+        rows = np.array([list(v)[:2] for v in probabilities.values()], dtype=np.float64).reshape(-1, 2)
+        order = np.argsort(configs, kind='mergesort')
+        configs, rows = configs[order], rows[order]
+
+        if len(parents) <= dense_max_parents:
+            table = np.tile(np.asarray(default, dtype=np.float64), (1 << len(parents), 1))
+            table[configs] = rows
+            return cls(node, parents, 'dense', table=table, default=default,
+                       node_type=cpt.get('type'), extra=extra)
+
+        keep = np.any(rows != np.asarray(default, dtype=np.float64), axis=1)
+        return cls(node, parents, 'sparse', configs=configs[keep], rows=rows[keep],
+                   default=default, node_type=cpt.get('type'), extra=extra)
+
+    def lookup(self, config_indices):
+        """
+        按组合编号批量取概率行
+
+        Args:
+            config_indices: 组合编号（标量或数组）
+
+        Returns:
+            np.ndarray: (..., 2)
+        """
+        config_indices = np.asarray(config_indices, dtype=np.int64)
+        if self.layout == 'compact':
+            k = self.n_parents
+            design = (config_indices[..., None] >> np.arange(k - 1, -1, -1)) & 1
+            prob_1 = self.cpd.probability_one(design.reshape(-1, k)).reshape(config_indices.shape)
+            return np.stack([1 - prob_1, prob_1], axis=-1)
+        if self.layout == 'dense':
+            return np.asarray(self.table)[config_indices]
+
+        configs = np.asarray(self.configs)
+        result = np.broadcast_to(self.default, config_indices.shape + (2,)).copy()
+        if len(configs):
+            pos = np.searchsorted(configs, config_indices)
+            pos_clipped = np.minimum(pos, len(configs) - 1)
+            hit = configs[pos_clipped] == config_indices
+            result[hit] = np.asarray(self.rows)[pos_clipped[hit]]
+        return result
+
+    def probability(self, parent_values=()):
+        """按父节点取值查询 [P(0), P(1)]"""
+        index = 0
+        for value in parent_values:
+            index = (index << 1) | int(value)
+        return self.lookup(index).tolist()
+
+    def to_table(self):
+        """展开为 2^k × 2 稠密表（稀疏、紧凑布局下父节点很多时注意内存）"""
+        if self.layout == 'dense':
+            return np.asarray(self.table)
+        if self.layout == 'compact':
+            return self.cpd.to_table()
+        table = np.tile(self.default, (1 << self.n_parents, 1))
+        table[np.asarray(self.configs)] = np.asarray(self.rows)
+        return table
+
+    def to_dict(self, expand=None):
+        """
+        转换为现有JSON结构
+
+        Args:
+            expand: 是否展开全部 2^k 个组合；默认稠密布局展开、稀疏布局只输出已保存的组合
+                    并附带 default_probabilities；紧凑布局始终返回参数化的CPT字典
+        """
+        cpt = {'type': self.node_type, 'parents': list(self.parents)}
+        if self.layout == 'compact':
+            cpt.update(self.extra)
+            return cpt
+        if not self.parents:
+            cpt['probabilities'] = np.asarray(self.table)[0].tolist()
+        else:
+            expand = self.layout == 'dense' if expand is None else expand
+            if expand:
+                rows = self.to_table().tolist()
+                cpt['probabilities'] = {
+                    ','.join(map(str, combo)): rows[c]
+                    for c, combo in enumerate(product([0, 1], repeat=self.n_parents))
+                }
+            else:
+                cpt['probabilities'] = {
+                    index_to_key(c, self.n_parents): row
+                    for c, row in zip(np.asarray(self.configs).tolist(), np.asarray(self.rows).tolist())
+                }
+                cpt['default_probabilities'] = self.default.tolist()
+        cpt.update(self.extra)
+        return cpt
+
+
+class CPTStore:
+    """一种方法全部节点的CPT容器"""
+
+    def __init__(self, cpts=None, method=None):
+        self.cpts = dict(cpts or {})
+        self.method = method
+
+    def __getitem__(self, node):
+        return self.cpts[node]
+
+    def __contains__(self, node):
+        return node in self.cpts
+
+    def __len__(self):
+        return len(self.cpts)
+
+    def __iter__(self):
+        return iter(self.cpts)
+
+    def items(self):
+        return self.cpts.items()
+
+    @classmethod
+    def from_json_dict(cls, cpts, method=None, dense_max_parents=DENSE_MAX_PARENTS):
+        """由现有 {节点: CPT字典} 结构构建"""
+        return cls({node: CompactCPT.from_dict(node, cpt, dense_max_parents)
+                    for node, cpt in cpts.items()}, method)
+
+    @classmethod
+    def from_json_file(cls, json_file, method=None, dense_max_parents=DENSE_MAX_PARENTS):
+        with open(json_file, 'r', encoding='utf-8') as f:
+            return cls.from_json_dict(json.load(f), method, dense_max_parents)
+
+    def to_json_dict(self, expand=None):
+        return {node: cpt.to_dict(expand) for node, cpt in self.cpts.items()}
+
+    def save(self, npz_file):
+        """保存为未压缩 .npz（可被 load 以内存映射方式读取）"""
+        dense_parts, configs_parts, rows_parts = [], [], []
+        dense_offset = sparse_offset = 0
+        nodes_meta = []
+
+        for node, cpt in self.cpts.items():
+            meta = {
+                'node': node,
+                'parents': cpt.parents,
+                'type': cpt.node_type,
+                'layout': cpt.layout,
+                'default': cpt.default.tolist(),
+                'extra': cpt.extra
+            }
+            if cpt.layout == 'compact':
+                meta.update(offset=0, size=0)  # 参数在 extra 中
+            elif cpt.layout == 'dense':
+                table = np.asarray(cpt.table, dtype=np.float64).ravel()
+                meta.update(offset=dense_offset, size=int(table.size))
+                dense_parts.append(table)
+                dense_offset += table.size
+            else:
+                configs = np.asarray(cpt.configs, dtype=np.int64)
+                meta.update(offset=sparse_offset, size=int(configs.size))
+                configs_parts.append(configs)
+                rows_parts.append(np.asarray(cpt.rows, dtype=np.float64).reshape(-1, 2))
+                sparse_offset += configs.size
+            nodes_meta.append(meta)
+
+        header = json.dumps({
+            'format_version': FORMAT_VERSION,
+            'method': self.method,
+            'nodes': nodes_meta
+        }, ensure_ascii=False).encode('utf-8')
+
+        tmp_file = npz_file + '.tmp.npz'
+        np.savez(
+            tmp_file,
+            meta=np.frombuffer(header, dtype=np.uint8),
+            dense_tables=np.concatenate(dense_parts) if dense_parts else np.empty(0),
+            sparse_configs=np.concatenate(configs_parts) if configs_parts else np.empty(0, dtype=np.int64),
+            sparse_rows=np.concatenate(rows_parts) if rows_parts else np.empty((0, 2))
+        )
+        os.replace(tmp_file, npz_file)
+
+    @classmethod
+    def load(cls, npz_file, mmap=True):
+        """
+        读取 .npz
+
+        Args:
+            mmap: True 时各数组以只读内存映射方式打开，节点CPT为映射数组的视图
+        """
+        arrays = _mmap_npz(npz_file) if mmap else dict(np.load(npz_file))
+        header = json.loads(bytes(np.asarray(arrays['meta'])).decode('utf-8'))
+        dense = arrays['dense_tables']
+        configs = arrays['sparse_configs']
+        rows = arrays['sparse_rows']
+
+        cpts = {}
+        for meta in header['nodes']:
+            start, size = meta['offset'], meta['size']
+            common = dict(default=meta['default'], node_type=meta['type'], extra=meta.get('extra'))
+            if meta['layout'] == 'compact':
+                cpt = CompactCPT(meta['node'], meta['parents'], 'compact', **common)
+            elif meta['layout'] == 'dense':
+                cpt = CompactCPT(meta['node'], meta['parents'], 'dense',
+                                 table=dense[start:start + size].reshape(-1, 2), **common)
+            else:
+                cpt = CompactCPT(meta['node'], meta['parents'], 'sparse',
+                                 configs=configs[start:start + size],
+                                 rows=rows[start:start + size], **common)
+            cpts[meta['node']] = cpt
+        return cls(cpts, header.get('method'))
+
+
+def _mmap_npz(npz_file):
+    """
+    按zip本地文件头定位 .npz 中每个 .npy 成员的数据偏移，用 np.memmap 直接映射
+
+    np.load 对 .npz 不支持 mmap_mode；np.savez 写出的成员均为 ZIP_STORED（未压缩），
+    数据在文件中连续存放，因此可以直接映射。
+    """
+    arrays = {}
+    with zipfile.ZipFile(npz_file) as zf:
+        infos = zf.infolist()
+    with open(npz_file, 'rb') as f:
+        for info in infos:
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{npz_file} 中的 {info.filename} 已压缩，无法内存映射")
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            name_len, extra_len = struct.unpack('<HH', local_header[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(npz_file, dtype=dtype, mode='r', offset=f.tell(),
+                                         shape=shape, order='F' if fortran_order else 'C')
+    return arrays
+
+
+def save_method_cpts(cpts, output_folder, method, write_json=False):
+    """
+    把 {节点: CPT字典} 另存为 <方法>_CPTs.npz
+
+    估计器自己写JSON/pkl后调用；write_json=True 时同时重写 <方法>_CPTs.json 与 .pkl，
+    供不经过估计器的更新（如在线更新器）使用，避免 .npz 与JSON消费者看到不同的CPT。
+    """
+    npz_file = os.path.join(output_folder, f"{method}_CPTs.npz")
+    if write_json:
+        with open(os.path.join(output_folder, f"{method}_CPTs.json"), 'w', encoding='utf-8') as f:
+            json.dump(cpts, f, ensure_ascii=False, indent=2, default=str)
+        with open(os.path.join(output_folder, f"{method}_CPTs.pkl"), 'wb') as f:
+            pickle.dump(cpts, f)
+    CPTStore.from_json_dict(cpts, method).save(npz_file)
+    return npz_file
+
+
+def load_all_methods(base_dir=None, methods=None, mmap=True):
+    """
+    加载各方法的 .npz CPT
+
+    Returns:
+        dict: {方法: CPTStore}，不存在的方法跳过
+    """
+    base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+    stores = {}
+    for method in methods or METHOD_FOLDERS:
+        npz_file = os.path.join(base_dir, METHOD_FOLDERS[method], f"{method}_CPTs.npz")
+        if os.path.exists(npz_file):
+            stores[method] = CPTStore.load(npz_file, mmap=mmap)
+    return stores
+
+
+def load_cpts_as_json(json_file):
+    """
+    读取某方法的CPT并返回现有JSON结构：同名 .npz 存在时优先读取，否则读取JSON
+
+    供知识图谱与后端使用，调用方无需关心存储格式。.npz 损坏或读取失败时回退到JSON。
+    """
+    npz_file = os.path.splitext(json_file)[0] + '.npz'
+    if os.path.exists(npz_file):
+        try:
+            return CPTStore.load(npz_file).to_json_dict()
+        except Exception as e:
+            if not os.path.exists(json_file):
+                raise
+            print(f"⚠ 读取 {npz_file} 失败，回退到JSON: {e}")
+    with open(json_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EM引擎 (Vectorized EM for Binary Bayesian Networks with Missing Data)
+缺失值保持为 NaN，E步对缺失项做批量精确推断得到期望频数
+
+    - 完整观测的家族（子节点与父节点都观测到）频数与参数无关，只在初始化时计数一次
+    - 含缺失的行按缺失模式分组；同一模式内，共享某个家族的缺失变量并为一个连通分量，
+      不同分量在联合分布中相互独立，可分别枚举其 2^m 种补全
+    - 每个分量：补全矩阵 (行, 补全, 变量) 上按家族索引取 log θ 并求和，
+      logsumexp 得到该行的边缘似然，softmax 得到补全的后验权重，
+      带权 np.bincount 累加到期望频数
+    - M步：期望频数归一化（与MLE相同的 [0.5, 0.5] 兜底）
+    - 加速：acceleration='squarem' 时每轮做两次EM映射后按 SQUAREM (S3) 外推，
+      外推点再做一次EM映射稳定；外推点似然下降时退回普通的两步EM，保持单调
+    - 随机重启：fit_with_restarts 以 SeedSequence 派生的种子在进程池中运行多条链，保留最终似然最高者
+
+每次迭代只有按分量的少量数组运算，没有按行 × 节点的Python循环。
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from 计数引擎 import CountEngine
+from 似然评估器 import CompiledLikelihood
+
+
+SUPPORTED_ACCELERATION = (None, 'squarem')
+SQUAREM_BOUND = 1e-6  # 外推后的概率截断到 [ε, 1-ε]
+
+
+def _logsumexp(values, axis=-1):
+    peak = np.max(values, axis=axis, keepdims=True)
+    peak = np.where(np.isfinite(peak), peak, 0.0)
+    return np.squeeze(peak, axis=axis) + np.log(np.sum(np.exp(values - peak), axis=axis))
+
+
+def _pack(thetas):
+    """参数列表 → P(1) 向量"""
+    return np.concatenate([theta[:, 1] for theta in thetas])
+
+
+def _unpack(vector, thetas):
+    """P(1) 向量 → 与 thetas 同形的参数列表"""
+    result, start = [], 0
+    for theta in thetas:
+        prob_1 = vector[start:start + len(theta)]
+        result.append(np.column_stack([1 - prob_1, prob_1]))
+        start += len(theta)
+    return result
+
+
+class MissingDataEM:
+    """含缺失值的二值贝叶斯网络EM参数估计"""
+
+    def __init__(self, data, parents_of, max_component_size=20, chunk_size=1 << 16, random_state=None):
+        """
+        Args:
+            data: pd.DataFrame，取值为 0/1/NaN，列即网络节点
+            parents_of: {节点: 父节点列表}
+            max_component_size: 单个缺失分量允许枚举的最大变量数
+            chunk_size: 每批处理的 行数 × 补全数 上限（控制内存）
+            random_state: 参数随机初始化的种子
+        """
+        self.variables = list(data.columns)
+        self.index = {var: i for i, var in enumerate(self.variables)}
+        self.parents_of = {var: list(parents_of.get(var, [])) for var in self.variables}
+        self.max_component_size = max_component_size
+        self.chunk_size = chunk_size
+        self.rng = np.random.default_rng(random_state)
+
+        values = data.to_numpy(dtype=np.float64)
+        self.missing = np.isnan(values)
+        self.codes = np.where(self.missing, 0, values).astype(np.uint8)
+        self.n_samples = len(data)
+
+        # 家族 = 父节点 + 子节点（子节点在最低位），编码顺序与 计数引擎 一致
+        self.families = [
+            np.array([self.index[p] for p in self.parents_of[var]] + [self.index[var]], dtype=np.int64)
+            for var in self.variables
+        ]
+        self.table_sizes = [1 << len(family) for family in self.families]
+
+        self._prepare_observed_counts()
+        self._prepare_missing_groups()
+
+    @property
+    def n_missing_values(self):
+        return int(self.missing.sum())
+
+    @property
+    def n_missing_rows(self):
+        return int(self.missing.any(axis=1).sum())
+
+    def _flat_index(self, codes, family):
+        """家族取值编码为CPT扁平下标（codes 最后一维为变量）"""
+        flat = np.zeros(codes.shape[:-1], dtype=np.int64)
+        for col in family:
+            flat = (flat << 1) | codes[..., col]
+        return flat
+
+    def _prepare_observed_counts(self):
+        """完整观测家族的频数（与参数无关，只算一次）"""
+        self.observed_counts = []
+        for family, size in zip(self.families, self.table_sizes):
+            rows = ~self.missing[:, family].any(axis=1)
+            flat = self._flat_index(self.codes[rows], family)
+            self.observed_counts.append(np.bincount(flat, minlength=size).astype(np.float64))
+
+    def _prepare_missing_groups(self):
+        """按缺失模式分组，并把每个模式的缺失变量划分为相互独立的分量"""
+        self.components = []
+        incomplete = np.flatnonzero(self.missing.any(axis=1))
+        if len(incomplete) == 0:
+            return
+
+        patterns, inverse = np.unique(self.missing[incomplete], axis=0, return_inverse=True)
+        inverse = np.asarray(inverse).reshape(-1)
+        for p, pattern in enumerate(patterns):
+            rows = incomplete[inverse == p]
+            missing_vars = np.flatnonzero(pattern)
+
+            # 并查集：同一家族内的缺失变量属于同一分量
+            root = {v: v for v in missing_vars}
+
+            def find(v):
+                while root[v] != v:
+                    root[v] = root[root[v]]
+                    v = root[v]
+                return v
+
+            touched = []
+            for f, family in enumerate(self.families):
+                members = [v for v in family if pattern[v]]
+                if members:
+                    touched.append((f, members[0]))
+                    for v in members[1:]:
+                        root[find(v)] = find(members[0])
+
+            groups = {}
+            for v in missing_vars:
+                groups.setdefault(find(v), []).append(v)
+            for comp_root, comp_vars in groups.items():
+                if len(comp_vars) > self.max_component_size:
+                    raise ValueError(
+                        f"缺失变量分量过大 ({len(comp_vars)} > {self.max_component_size})，"
+                        f"涉及变量: {[self.variables[v] for v in comp_vars]}")
+                comp_families = [f for f, anchor in touched if find(anchor) == comp_root]
+                m = len(comp_vars)
+                completions = ((np.arange(1 << m)[:, None] >> np.arange(m - 1, -1, -1)) & 1).astype(np.uint8)
+                self.components.append({
+                    'rows': rows,
+                    'variables': np.array(comp_vars, dtype=np.int64),
+                    'families': comp_families,
+                    'completions': completions
+                })
+
+    def initialize_parameters(self):
+        """随机初始化参数：P(1) ~ U(0.3, 0.7)"""
+        thetas = []
+        for size in self.table_sizes:
+            prob_1 = self.rng.uniform(0.3, 0.7, size=size // 2)
+            thetas.append(np.column_stack([1 - prob_1, prob_1]))
+        return thetas
+
+    def e_step(self, thetas):
+        """
+        E步
+
+        Returns:
+            tuple: (期望频数列表, 当前参数下的观测数据对数似然)
+        """
+        compiled = CompiledLikelihood.from_tables(self.variables, self.parents_of, thetas)
+        log_tables = [compiled.node_table(var) for var in self.variables]
+        expected = [counts.copy() for counts in self.observed_counts]
+        log_likelihood = float(sum(np.dot(counts, log_t) for counts, log_t in zip(self.observed_counts, log_tables)))
+
+        for comp in self.components:
+            completions = comp['completions']
+            n_completions = len(completions)
+            step = max(1, self.chunk_size // n_completions)
+            for start in range(0, len(comp['rows']), step):
+                rows = comp['rows'][start:start + step]
+                filled = np.repeat(self.codes[rows][:, None, :], n_completions, axis=1)
+                filled[:, :, comp['variables']] = completions[None, :, :]
+
+                flats = [self._flat_index(filled, self.families[f]) for f in comp['families']]
+                log_joint = np.zeros(filled.shape[:2])
+                for f, flat in zip(comp['families'], flats):
+                    log_joint += log_tables[f][flat]
+
+                row_ll = _logsumexp(log_joint, axis=1)
+                weights = np.exp(log_joint - row_ll[:, None]).ravel()
+                log_likelihood += float(row_ll.sum())
+
+                for f, flat in zip(comp['families'], flats):
+                    expected[f] += np.bincount(flat.ravel(), weights=weights, minlength=self.table_sizes[f])
+
+        return expected, log_likelihood
+
+    @staticmethod
+    def m_step(expected):
+        """M步：期望频数归一化"""
+        return [CountEngine.probabilities_from_counts(counts.reshape(-1, 2)) for counts in expected]
+
+    def log_likelihood(self, thetas):
+        return self.e_step(thetas)[1]
+
+    def em_map(self, thetas):
+        """一次EM映射，返回 (新参数, 输入参数的对数似然)"""
+        expected, log_likelihood = self.e_step(thetas)
+        return self.m_step(expected), log_likelihood
+
+    def squarem_step(self, thetas):
+        """
+        一轮 SQUAREM (S3)：θ1 = F(θ0)，θ2 = F(θ1)，r = θ1-θ0，v = θ2-θ1-r，
+        α = -|r|/|v|（不大于 -1），θ' = θ0 - 2αr + α²v，再以 F(θ') 稳定
+
+        Returns:
+            tuple: (新参数, θ0 的对数似然, 本轮EM映射次数)
+        """
+        thetas_1, log_likelihood = self.em_map(thetas)
+        thetas_2, log_likelihood_1 = self.em_map(thetas_1)
+
+        x0, x1, x2 = _pack(thetas), _pack(thetas_1), _pack(thetas_2)
+        r = x1 - x0
+        v = x2 - x1 - r
+        v_norm = np.linalg.norm(v)
+        if v_norm == 0:
+            return thetas_2, log_likelihood, 2
+
+        alpha = min(-np.linalg.norm(r) / v_norm, -1.0)
+        extrapolated = np.clip(x0 - 2 * alpha * r + alpha ** 2 * v, SQUAREM_BOUND, 1 - SQUAREM_BOUND)
+        stabilized, log_likelihood_x = self.em_map(_unpack(extrapolated, thetas))
+        if not np.isfinite(log_likelihood_x) or log_likelihood_x < log_likelihood_1:
+            return thetas_2, log_likelihood, 3
+        return stabilized, log_likelihood, 3
+
+    def fit(self, max_iterations=100, tolerance=1e-6, thetas=None, verbose=True, acceleration=None):
+        """
+        运行EM
+
+        Args:
+            acceleration: None 为普通EM；'squarem' 为 SQUAREM 外推（每轮约3次EM映射）
+
+        Returns:
+            dict: thetas / iterations / em_evaluations / final_log_likelihood / log_likelihood_history / converged
+        """
+        if acceleration not in SUPPORTED_ACCELERATION:
+            raise ValueError(f"不支持的加速方式: {acceleration}，可选: {SUPPORTED_ACCELERATION}")
+        thetas = thetas if thetas is not None else self.initialize_parameters()
+        history = []
+        converged = False
+        evaluations = 0
+
+        for iteration in range(max_iterations):
+            if acceleration == 'squarem':
+                thetas, log_likelihood, n_maps = self.squarem_step(thetas)
+            else:
+                thetas, log_likelihood = self.em_map(thetas)
+                n_maps = 1
+            evaluations += n_maps
+            history.append(log_likelihood)
+
+            if iteration > 0:
+                improvement = log_likelihood - history[-2]
+                if verbose:
+                    print(f"迭代 {iteration + 1}: 对数似然 = {log_likelihood:.6f}, 改进 = {improvement:.6f}")
+                if abs(improvement) < tolerance:
+                    converged = True
+                    if verbose:
+                        print(f"在第 {iteration + 1} 次迭代后收敛")
+                    break
+            elif verbose:
+                print(f"迭代 {iteration + 1}: 对数似然 = {log_likelihood:.6f}")
+
+        return {
+            'thetas': thetas,
+            'iterations': len(history),
+            'em_evaluations': evaluations,
+            'final_log_likelihood': self.log_likelihood(thetas),
+            'log_likelihood_history': history,
+            'converged': converged
+        }
+
+    def to_cpts(self, thetas):
+        """转换为项目统一的CPT字典结构"""
+        return {
+            var: CountEngine.to_cpt(self.parents_of[var], theta)
+            for var, theta in zip(self.variables, thetas)
+        }
+
+
+def _run_restart(task):
+    """进程池任务：以给定种子运行一条EM链"""
+    data, parents_of, seed, fit_kwargs = task
+    engine = MissingDataEM(data, parents_of, random_state=seed)
+    fit = engine.fit(verbose=False, **fit_kwargs)
+    fit['seed'] = seed
+    return fit
+
+
+def fit_with_restarts(data, parents_of, n_restarts=1, random_state=None, max_workers=None, **fit_kwargs):
+    """
+    多次随机重启EM，保留最终对数似然最高的一条链
+
+    Args:
+        data / parents_of: 同 MissingDataEM
+        n_restarts: 重启次数
+        random_state: 主种子，各链种子由 np.random.SeedSequence 派生（可复现）
+        max_workers: 进程数，None 为CPU核数；n_restarts 为1或进程池不可用时顺序执行
+        fit_kwargs: 传给 MissingDataEM.fit（max_iterations / tolerance / acceleration）
+
+    Returns:
+        dict: best（最优链的 fit 结果，含 seed）/ restarts（每条链的 fit 结果）
+    """
+    seeds = np.random.SeedSequence(random_state).generate_state(n_restarts).tolist()
+    tasks = [(data, parents_of, seed, fit_kwargs) for seed in seeds]
+
+    fits = None
+    if n_restarts > 1 and max_workers != 1:
+        try:
+            # spawn：调用方可能处于线程池中，避免 fork 复制持锁线程
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+                fits = list(pool.map(_run_restart, tasks))
+        except Exception as e:
+            print(f"⚠ 进程池不可用，顺序运行随机重启: {e}")
+    if fits is None:
+        fits = [_run_restart(task) for task in tasks]
+
+    best = max(fits, key=lambda fit: fit['final_log_likelihood'])
+    return {'best': best, 'restarts': fits}
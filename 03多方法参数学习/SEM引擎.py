@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SEM引擎 (Gram-Matrix Batched Linear SEM)
+一次计算全部变量的中心化叉积矩阵 C = X_cᵀX_c，所有结构方程都从 C 的子块求解
+
+    β        = C_PP⁻¹ C_Py                      （Cholesky，按父节点数分组批量分解）
+    截距     = ȳ - βᵀ x̄_P
+    SSE      = C_yy - βᵀ C_Py,   R² = 1 - SSE / C_yy
+    Var(β)   = s² · C_PP⁻¹,      Var(截距) = s² · (1/n + x̄_Pᵀ C_PP⁻¹ x̄_P),  s² = SSE / (n - p - 1)
+
+与带截距的普通最小二乘（sklearn LinearRegression + (X̃ᵀX̃)⁻¹ 标准误）结果一致，
+拟合本身不再逐节点扫描数据；MAE 需要残差，由一次批量矩阵乘法得到全部方程的残差。
+"""
+
+import numpy as np
+
+
+class GramSEM:
+    """基于叉积矩阵的批量线性结构方程估计"""
+
+    def __init__(self, data, residual_pass=True):
+        """
+        Args:
+            data: pd.DataFrame，数值数据
+            residual_pass: 是否批量计算残差以得到 MAE（需要一次数据矩阵乘法）
+        """
+        self.variables = list(data.columns)
+        self.index = {var: i for i, var in enumerate(self.variables)}
+        self.residual_pass = residual_pass
+
+        X = data.to_numpy(dtype=np.float64)
+        self.n_samples = X.shape[0]
+        self.means = X.mean(axis=0) if self.n_samples else np.zeros(X.shape[1])
+        centered = X - self.means
+        self.gram = centered.T @ centered
+        self._centered = centered if residual_pass else None
+
+    @classmethod
+    def from_moments(cls, variables, n_samples, means, gram):
+        """
+        由样本量、均值与中心化叉积矩阵构建（如交叉验证中 总体 - 折 的矩差），不保留数据，MAE 记为缺失
+        """
+        engine = cls.__new__(cls)
+        engine.variables = list(variables)
+        engine.index = {var: i for i, var in enumerate(engine.variables)}
+        engine.residual_pass = False
+        engine.n_samples = int(n_samples)
+        engine.means = np.asarray(means, dtype=np.float64)
+        engine.gram = np.asarray(gram, dtype=np.float64)
+        engine._centered = None
+        return engine
+
+    def _solve_group(self, targets, parent_sets):
+        """
+        父节点数相同的一组方程：批量 Cholesky 分解子块
+
+        Returns:
+            tuple: (β (g, k), [C_PP⁻¹ (k, k) 或 None] × g)
+        """
+        P = np.array(parent_sets, dtype=np.int64)                 # (g, k)
+        y = np.array(targets, dtype=np.int64)                     # (g,)
+        C_pp = self.gram[P[:, :, None], P[:, None, :]]            # (g, k, k)
+        C_py = self.gram[P, y[:, None]]                           # (g, k)
+
+        try:
+            L = np.linalg.cholesky(C_pp)
+        except np.linalg.LinAlgError:
+            # 组内有奇异子块：逐个方程分解，只有奇异的方程退回最小范数解
+            solved = [self._solve_single(C_pp[g], C_py[g]) for g in range(len(y))]
+            return np.array([b for b, _ in solved]), [c for _, c in solved]
+
+        L_inv = np.linalg.inv(L)
+        C_inv = np.swapaxes(L_inv, -1, -2) @ L_inv
+        beta = np.einsum('gij,gj->gi', C_inv, C_py)
+        return beta, list(C_inv)
+
+    @staticmethod
+    def _solve_single(C_pp, C_py):
+        """单个方程：Cholesky；子块奇异（共线/常数父节点）时用最小范数解，标准误记为缺失"""
+        try:
+            L = np.linalg.cholesky(C_pp)
+        except np.linalg.LinAlgError:
+            return np.linalg.lstsq(C_pp, C_py, rcond=None)[0], None
+        L_inv = np.linalg.inv(L)
+        C_inv = L_inv.T @ L_inv
+        return C_inv @ C_py, C_inv
+
+    def fit(self, parents_of):
+        """
+        估计全部节点的结构方程
+
+        Args:
+            parents_of: {节点: 父节点列表}（父节点为空的节点视为外生变量）
+
+        Returns:
+            dict: 与 SEM_结构方程.json 相同结构的 {节点: 方程信息}
+        """
+        n = self.n_samples
+        equations = {}
+        groups = {}
+        for node, parents in parents_of.items():
+            parents = [p for p in parents if p in self.index]
+            if parents:
+                groups.setdefault(len(parents), []).append((node, parents))
+
+        fitted = {}
+        for k, members in groups.items():
+            targets = [self.index[node] for node, _ in members]
+            parent_sets = [[self.index[p] for p in parents] for _, parents in members]
+            beta, C_inv = self._solve_group(targets, parent_sets)
+            for g, (node, parents) in enumerate(members):
+                fitted[node] = (parents, parent_sets[g], beta[g], C_inv[g])
+
+        # 全部方程的残差：一次矩阵乘法（父节点系数放入 V × E 稀疏列）
+        mae = {}
+        if self.residual_pass and fitted and n:
+            nodes = list(fitted)
+            B = np.zeros((len(self.variables), len(nodes)))
+            for e, node in enumerate(nodes):
+                _, idx, beta, _ = fitted[node]
+                B[idx, e] = beta
+            residuals = self._centered[:, [self.index[node] for node in nodes]] - self._centered @ B
+            mae = dict(zip(nodes, np.abs(residuals).mean(axis=0).tolist()))
+
+        for node in parents_of:
+            if node not in fitted:
+                i = self.index[node]
+                variance = float(self.gram[i, i] / (n - 1)) if n > 1 else float('nan')
+                equations[node] = {
+                    'type': 'exogenous_variable',
+                    'parents': [],
+                    'mean': float(self.means[i]),
+                    'variance': variance,
+                    'standard_deviation': float(np.sqrt(variance)),
+                    'sample_size': n
+                }
+                continue
+
+            parents, idx, beta, C_inv = fitted[node]
+            y = self.index[node]
+            p = len(parents)
+            dof = n - p - 1
+
+            sst = float(self.gram[y, y])
+            sse = max(float(sst - beta @ self.gram[idx, y]), 0.0)
+            if sst > 0:
+                r2 = 1 - sse / sst
+            else:
+                r2 = 1.0 if sse == 0 else 0.0
+            adjusted_r2 = 1 - (1 - r2) * (n - 1) / dof if dof != 0 else float('nan')
+            intercept = float(self.means[y] - beta @ self.means[idx])
+            mse = sse / n
+
+            if C_inv is not None and dof > 0:
+                s2 = sse / dof
+                coef_se = np.sqrt(np.maximum(s2 * np.diag(C_inv), 0.0)).tolist()
+                mean_p = self.means[idx]
+                intercept_se = float(np.sqrt(max(s2 * (1.0 / n + mean_p @ C_inv @ mean_p), 0.0)))
+            else:
+                coef_se = [np.nan] * p
+                intercept_se = np.nan
+
+            t_intercept = intercept / intercept_se if not np.isnan(intercept_se) and intercept_se > 0 else np.nan
+            # 与 coefficients 逐位对应，没有标准误的位置为 None
+            t_coefs = [float(coef / se) if not np.isnan(se) and se > 0 else None
+                       for coef, se in zip(beta.tolist(), coef_se)]
+
+            equations[node] = {
+                'type': 'structural_equation',
+                'parents': parents,
+                'coefficients': beta.tolist(),
+                'intercept': intercept,
+                'coefficient_std_errors': coef_se,
+                'intercept_std_error': intercept_se if not np.isnan(intercept_se) else None,
+                't_statistics': {
+                    'intercept': float(t_intercept) if not np.isnan(t_intercept) else None,
+                    'coefficients': t_coefs
+                },
+                'r_squared': float(r2),
+                'adjusted_r_squared': float(adjusted_r2),
+                'residual_variance': float(mse),
+                'mse': float(mse),
+                'rmse': float(np.sqrt(mse)),
+                'mae': float(mae.get(node, np.nan)),
+                'sample_size': n,
+                'degrees_of_freedom': dof
+            }
+
+        return equations
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+似然评估器 (Compiled Log-Likelihood Evaluator)
+把一组CPT编译为扁平数组，用整数下标 gather 对整个数据集打分
+
+    - 每个节点的CPT展开为 2^k × 2 的 log θ 表，所有节点首尾相接存入一个扁平数组
+    - 家族下标 = 父节点组合编号 · 2 + 子节点取值（第一个父节点为最高位，
+      与 itertools.product 和 计数引擎 的编码一致），再加上该节点表的偏移
+    - 父节点列按 (节点, 位) 排成索引矩阵，按位乘加一次得到全部节点的家族下标，
+      log_table[下标] 即为 (行, 节点) 的对数似然矩阵
+
+MLE、贝叶斯、EM、边级似然增益共用本评估器，并可返回逐行、逐节点的对数似然，
+用于留出集评估。紧凑参数化（noisy-OR / logistic）的节点不展开为表，
+由 紧凑CPD 按参数直接对该列打分。
+"""
+
+import numpy as np
+
+# 概率下限（避免 log(0)，与EM原实现一致）
+PROB_FLOOR = 1e-10
+
+
+def _parse_key(key):
+    """CPT条件键 "0,1,0" → 组合编号（第一个父节点为最高位）"""
+    index = 0
+    for bit in str(key).split(','):
+        index = (index << 1) | int(float(bit))
+    return index
+
+
+class CompiledLikelihood:
+    """编译后的离散贝叶斯网络对数似然"""
+
+    def __init__(self, cpts, chunk_size=1 << 16):
+        """
+        Args:
+            cpts: 项目统一的CPT字典 {节点: {'type', 'parents', 'probabilities'}}，
+                  也可以是 紧凑CPD 的参数化字典
+            chunk_size: 每批处理的行数（控制 行 × 节点 的中间数组大小）
+        """
+        from 紧凑CPD import COMPACT_TYPES, cpd_from_dict  # 紧凑CPD 依赖本模块的 PROB_FLOOR，延迟导入
+
+        tables = {}
+        parents_of = {}
+        compact = {}
+        for node, cpt in cpts.items():
+            parents = list(cpt.get('parents', []))
+            parents_of[node] = parents
+            if cpt.get('type') in COMPACT_TYPES:
+                compact[node] = cpd_from_dict(cpt)
+                tables[node] = np.full((1, 2), 0.5)  # 占位，该列由紧凑CPD打分
+                continue
+            table = np.full((1 << len(parents), 2), 0.5)
+            if parents:
+                for key, probs in cpt['probabilities'].items():
+                    table[_parse_key(key)] = probs[:2]
+            else:
+                table[0] = cpt['probabilities'][:2]
+            tables[node] = table
+        self._compile(list(cpts.keys()), parents_of, tables, chunk_size, compact)
+
+    @classmethod
+    def from_tables(cls, nodes, parents_of, tables, chunk_size=1 << 16):
+        """
+        由概率表直接编译（供EM等引擎在迭代中使用，省去字典转换）
+
+        Args:
+            nodes: 节点列表
+            parents_of: {节点: 父节点列表}
+            tables: 与 nodes 对应的 2^k × 2 概率数组列表
+        """
+        compiled = cls.__new__(cls)
+        compiled._compile(list(nodes), {n: list(parents_of.get(n, [])) for n in nodes},
+                          dict(zip(nodes, tables)), chunk_size)
+        return compiled
+
+    def _compile(self, nodes, parents_of, tables, chunk_size, compact=None):
+        self.nodes = nodes
+        self.parents_of = parents_of
+        self.chunk_size = chunk_size
+
+        # 评估时需要的数据列：节点本身 + 全部父节点
+        columns = list(nodes)
+        for node in nodes:
+            columns.extend(p for p in parents_of[node] if p not in columns)
+        self.columns = list(dict.fromkeys(columns))
+        col_index = {c: i for i, c in enumerate(self.columns)}
+
+        sizes = np.array([np.asarray(tables[n]).size for n in nodes], dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        self.log_table = np.log(np.maximum(
+            np.concatenate([np.asarray(tables[n], dtype=np.float64).ravel() for n in nodes])
+            if nodes else np.empty(0), PROB_FLOOR))
+
+        # (节点, 位) 索引矩阵：父节点列下标与对应位权，不足的位用权重0填充
+        # 紧凑CPD节点：(节点序号, CPD, 父节点列下标)，表中只占2个位置
+        compact = compact or {}
+        self.compact = [(i, compact[n], np.array([col_index[p] for p in parents_of[n]], dtype=np.int64))
+                        for i, n in enumerate(nodes) if n in compact]
+
+        max_parents = max((len(parents_of[n]) for n in nodes if n not in compact), default=0)
+        self.parent_cols = np.zeros((len(nodes), max_parents), dtype=np.int64)
+        self.parent_weights = np.zeros((len(nodes), max_parents), dtype=np.int64)
+        for i, node in enumerate(nodes):
+            if node in compact:
+                continue
+            k = len(parents_of[node])
+            for j, parent in enumerate(parents_of[node]):
+                self.parent_cols[i, j] = col_index[parent]
+                self.parent_weights[i, j] = 1 << (k - j)  # 子节点占最低位
+        self.child_cols = np.array([col_index[n] for n in nodes], dtype=np.int64)
+
+    def node_table(self, node):
+        """某节点的 log θ 扁平表（下标 = 组合编号 · 2 + 子节点取值）"""
+        i = self.nodes.index(node)
+        for j, cpd, _ in self.compact:
+            if j == i:
+                return np.log(np.maximum(cpd.to_table().ravel(), PROB_FLOOR))
+        size = (1 << len(self.parents_of[node])) * 2
+        return self.log_table[self.offsets[i]:self.offsets[i] + size]
+
+    def _encode(self, data):
+        """取出所需列并转换为 uint8 矩阵"""
+        missing = [c for c in self.columns if c not in data.columns]
+        if missing:
+            raise KeyError(f"数据缺少CPT涉及的列: {missing}")
+        values = data[self.columns].to_numpy(dtype=np.float64)
+        if np.isnan(values).any():
+            raise ValueError("数据含缺失值，请使用 EM引擎 计算边缘似然")
+        return values.astype(np.uint8)
+
+    def node_row_log_likelihood(self, data):
+        """
+        逐行、逐节点的对数似然
+
+        Returns:
+            np.ndarray: 形状 (行数, 节点数)
+        """
+        codes = self._encode(data)
+        result = np.empty((len(codes), len(self.nodes)))
+        for start in range(0, len(codes), self.chunk_size):
+            block = codes[start:start + self.chunk_size]
+            flat = block[:, self.child_cols].astype(np.int64) + self.offsets
+            for j in range(self.parent_cols.shape[1]):
+                flat += block[:, self.parent_cols[:, j]] * self.parent_weights[:, j]
+            result[start:start + len(block)] = self.log_table[flat]
+            for i, cpd, cols in self.compact:
+                result[start:start + len(block), i] = cpd.row_log_likelihood(block[:, cols], block[:, self.child_cols[i]])
+        return result
+
+    def per_row(self, data):
+        """每一行的对数似然（留出集评估）"""
+        return self.node_row_log_likelihood(data).sum(axis=1)
+
+    def per_node(self, data):
+        """每个节点的对数似然 {节点: LL}"""
+        totals = self.node_row_log_likelihood(data).sum(axis=0)
+        return dict(zip(self.nodes, totals.tolist()))
+
+    def total(self, data):
+        """整个数据集的对数似然"""
+        return float(self.node_row_log_likelihood(data).sum())
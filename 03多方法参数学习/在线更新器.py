@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+在线更新器 (Online CPT Updater)
+为当前DAG常驻各节点的条件频数表，新到达的一批记录只做一次增量计数
+
+    - partial_fit(batch)：每个家族一次 np.bincount 得到本批频数，复杂度 O(行数 × 节点数)
+    - 只对频数发生变化的父节点组合重新计算 MLE / 贝叶斯 概率行，
+      与旧概率比较后只把真正改变的条目写入 CPTStore，并以JSON结构返回变化量
+    - 漂移处理：
+        window  滑动窗口（按行），超出窗口的最早记录从频数中扣除
+        decay   指数遗忘，每批先把已有频数乘以 decay 再累加本批频数
+                （MLE 概率对整体缩放不变，只有本批涉及的组合会变化；贝叶斯概率随之全部更新）
+
+频数与概率的编码与 计数引擎 / CPT存储 一致（第一个父节点为最高位，未观测组合 [0.5, 0.5]）。
+"""
+
+import os
+from collections import deque
+
+import numpy as np
+
+from 计数引擎 import CountEngine
+from 狄利克雷先验 import posterior_probabilities
+from CPT存储 import CPTStore, CompactCPT, DENSE_MAX_PARENTS, METHOD_FOLDERS, index_to_key, save_method_cpts
+
+ONLINE_METHODS = ('MLE', 'Bayesian')
+
+
+class OnlineCPTUpdater:
+    """流式记录下的增量CPT估计"""
+
+    def __init__(self, parents_of, prior_alpha=1.0, window=None, decay=None,
+                 thresholds=None, tolerance=1e-12, dense_max_parents=DENSE_MAX_PARENTS):
+        """
+        Args:
+            parents_of: {节点: 父节点列表}，当前DAG
+            prior_alpha: 贝叶斯CPT的Dirichlet先验 α（每个单元格）
+            window: 滑动窗口大小（行数），None 表示不限
+            decay: 指数遗忘因子 (0, 1]，None 表示不衰减；与 window 不能同时使用
+            thresholds: 可选 {列: 阈值}，按 (x > 阈值) 二值化原始数值记录（如训练集中位数）
+            tolerance: 概率变化小于该值的条目不视为变化
+        """
+        if window is not None and decay is not None:
+            raise ValueError("window 与 decay 不能同时使用")
+        if decay is not None and not 0 < decay <= 1:
+            raise ValueError(f"decay 必须在 (0, 1] 内: {decay}")
+
+        self.nodes = list(parents_of)
+        self.parents_of = {node: list(parents_of[node]) for node in self.nodes}
+        self.prior_alpha = prior_alpha
+        self.window = window
+        self.decay = decay
+        self.thresholds = dict(thresholds or {})
+        self.tolerance = tolerance
+
+        columns = list(self.nodes)
+        for node in self.nodes:
+            columns.extend(p for p in self.parents_of[node] if p not in columns)
+        self.columns = list(dict.fromkeys(columns))
+        col_index = {c: i for i, c in enumerate(self.columns)}
+        # 家族列下标：父节点在前，子节点在最低位
+        self.families = {
+            node: np.array([col_index[p] for p in self.parents_of[node]] + [col_index[node]], dtype=np.int64)
+            for node in self.nodes
+        }
+
+        self.counts = {node: np.zeros((1 << len(self.parents_of[node]), 2)) for node in self.nodes}
+        self.n_rows = 0
+        self.n_batches = 0
+        self._history = deque()  # 滑动窗口：每批 (行数, {节点: 家族下标})
+
+        self.stores = {}
+        for method in ONLINE_METHODS:
+            cpts = {}
+            for node in self.nodes:
+                extra = {'prior_alpha': prior_alpha} if method == 'Bayesian' else None
+                table = np.full((1 << len(self.parents_of[node]), 2), 0.5)
+                cpts[node] = CompactCPT.from_table(node, self.parents_of[node], table,
+                                                   dense_max_parents=dense_max_parents, extra=extra)
+            self.stores[method] = CPTStore(cpts, method)
+
+    @classmethod
+    def from_edges(cls, edges, **kwargs):
+        """由因果边列表 [(源, 目标)] 构建"""
+        parents_of = {}
+        for source, target in edges:
+            parents_of.setdefault(source, [])
+            parents_of.setdefault(target, [])
+            if source not in parents_of[target]:
+                parents_of[target].append(source)
+        return cls(parents_of, **kwargs)
+
+    def _encode(self, batch):
+        """本批记录 → 每个节点的家族扁平下标（家族含缺失值的行记为 -1，不计数）"""
+        missing = [c for c in self.columns if c not in batch.columns]
+        if missing:
+            raise KeyError(f"记录缺少DAG涉及的列: {missing}")
+        values = batch[self.columns].to_numpy(dtype=np.float64)
+        for j, col in enumerate(self.columns):
+            if col in self.thresholds:
+                observed = ~np.isnan(values[:, j])
+                values[observed, j] = values[observed, j] > self.thresholds[col]
+        nan_mask = np.isnan(values)
+        codes = np.where(nan_mask, 0, values).astype(np.int64)
+
+        flats = {}
+        for node, family in self.families.items():
+            flat = np.zeros(len(codes), dtype=np.int64)
+            for col in family:
+                flat = (flat << 1) | codes[:, col]
+            flat[nan_mask[:, family].any(axis=1)] = -1
+            flats[node] = flat
+        return len(codes), flats
+
+    def _bincount(self, node, flat):
+        return np.bincount(flat[flat >= 0], minlength=self.counts[node].size).reshape(-1, 2)
+
+    def _evict(self):
+        """滑动窗口：扣除超出窗口的最早记录，返回被改变的组合"""
+        touched = {}
+        while self.window is not None and self.n_rows > self.window and self._history:
+            n_batch, flats = self._history[0]
+            excess = self.n_rows - self.window
+            take = min(excess, n_batch)
+            for node, flat in flats.items():
+                removed = self._bincount(node, flat[:take])
+                self.counts[node] -= removed
+                touched.setdefault(node, []).append(np.flatnonzero(removed.sum(axis=1)))
+                flats[node] = flat[take:]
+            self.n_rows -= take
+            if take == n_batch:
+                self._history.popleft()
+            else:
+                self._history[0] = (n_batch - take, flats)
+        return touched
+
+    def _refresh(self, node, configs):
+        """重新计算给定组合的概率行，写入CPTStore，返回 {方法: {条件键: [P0, P1]}}"""
+        counts = self.counts[node][configs]
+        new_rows = {
+            'MLE': CountEngine.probabilities_from_counts(counts),
+            'Bayesian': posterior_probabilities(counts, self.prior_alpha)
+        }
+        k = len(self.parents_of[node])
+        changes = {}
+        for method, rows in new_rows.items():
+            cpt = self.stores[method][node]
+            old = cpt.lookup(configs)
+            changed = np.any(np.abs(rows - old) > self.tolerance, axis=1)
+            if not changed.any():
+                continue
+            self._write_rows(cpt, configs[changed], rows[changed])
+            if k:
+                changes[method] = {
+                    index_to_key(c, k): row
+                    for c, row in zip(configs[changed].tolist(), rows[changed].tolist())
+                }
+            else:
+                changes[method] = rows[0].tolist()
+        return changes
+
+    @staticmethod
+    def _write_rows(cpt, configs, rows):
+        """就地更新CompactCPT的若干组合（稀疏布局合并组合编号）"""
+        if cpt.layout == 'dense':
+            if not np.asarray(cpt.table).flags.writeable:
+                cpt.table = np.array(cpt.table)  # 内存映射读取的只读表
+            cpt.table[configs] = rows
+            return
+        merged = dict(zip(np.asarray(cpt.configs).tolist(), np.asarray(cpt.rows).tolist()))
+        merged.update(zip(configs.tolist(), rows.tolist()))
+        keys = np.array(sorted(merged), dtype=np.int64)
+        cpt.configs = keys
+        cpt.rows = np.array([merged[c] for c in keys.tolist()], dtype=np.float64).reshape(-1, 2)
+
+    def partial_fit(self, batch):
+        """
+        追加一批记录
+
+        Args:
+            batch: pd.DataFrame，包含DAG涉及的全部列（0/1，或配合 thresholds 的原始数值）
+
+        Returns:
+            dict: 本批改变的条目 {方法: {节点: {条件键: [P0, P1]}}}（无父节点时为 [P0, P1]）
+        """
+        n_batch, flats = self._encode(batch)
+        touched = {}
+
+        if self.decay is not None:
+            for node in self.nodes:
+                self.counts[node] *= self.decay
+
+        for node, flat in flats.items():
+            delta = self._bincount(node, flat)
+            self.counts[node] += delta
+            touched.setdefault(node, []).append(np.flatnonzero(delta.sum(axis=1)))
+            if self.decay is not None and self.decay < 1:
+                # 衰减改变了全部已观测组合的贝叶斯概率
+                touched[node].append(np.flatnonzero(self.counts[node].sum(axis=1)))
+
+        self.n_rows += n_batch
+        self.n_batches += 1
+        if self.window is not None:
+            self._history.append((n_batch, flats))
+            for node, configs in self._evict().items():
+                touched.setdefault(node, []).extend(configs)
+
+        changes = {method: {} for method in ONLINE_METHODS}
+        for node, parts in touched.items():
+            configs = np.unique(np.concatenate(parts)).astype(np.int64)
+            if not len(configs):
+                continue
+            for method, entries in self._refresh(node, configs).items():
+                changes[method][node] = entries
+        return changes
+
+    def fit(self, data, batch_size=None):
+        """从头拟合（可分批送入），返回最后一批的变化量"""
+        batch_size = batch_size or max(len(data), 1)
+        changes = {}
+        for start in range(0, len(data), batch_size):
+            changes = self.partial_fit(data.iloc[start:start + batch_size])
+        return changes
+
+    def to_json_dicts(self):
+        """当前CPT的JSON结构 {方法: {节点: CPT}}"""
+        return {method: store.to_json_dict() for method, store in self.stores.items()}
+
+    def save(self, base_dir=None):
+        """把当前CPT写入各方法结果文件夹的 <方法>_CPTs.npz，并同步重写同名 .json / .pkl"""
+        base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+        saved = {}
+        for method, store in self.stores.items():
+            folder = os.path.join(base_dir, METHOD_FOLDERS[method])
+            os.makedirs(folder, exist_ok=True)
+            saved[method] = save_method_cpts(store.to_json_dict(), folder, method, write_json=True)
+        return saved
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+推断引擎 (Junction-Tree Exact Inference over Learned CPTs)
+把DAG与某种方法（MLE/Bayesian/EM/SEM回归CPT）的条件概率表编译为联结树，回答
+
+    P(疾病_X | 药物_Y=1, 检验_Z=0)            条件查询
+    P(疾病_X | do(药物_Y=1), 检验_Z=0)        干预查询（图手术：切断 药物_Y 的入边）
+
+    - 编译（只做一次）：道德化 → 最小填充启发式三角化 → 极大团 → 按分隔集大小的最大生成树，
+      每个CPT因子乘入包含其家族的团，团势为 (2,)*|C| 的数组
+    - 查询：Shafer-Shenoy 消息传递，只计算指向目标团的消息并缓存；
+      证据变化时只作废从变化变量所在团"向外"的消息，其余消息与团势继续复用
+    - do() 查询：被干预变量改为无父节点的根（均匀先验），干预值作为证据；
+      按干预变量集合缓存切割后的联结树
+
+不在CPT中的父节点（如 SEM回归CPT 不输出的根节点）按均匀先验 [0.5, 0.5] 处理。
+父节点集合含有向环时（精简因果边列表中存在 A→B、B→A 这样的双向边）编译前先断环：
+    - 只处理强连通分量内部（位于环上）的边，无环部分保持原样
+    - 先删除违反领域层级（疾病_ → 药物_ → 检验_，与 02因果发现/领域约束配置.json 一致）的边
+    - 同一层级内仍成环时，逐条删除环上依赖最弱的边（子节点CPT中该父节点两种取值下
+      P(X=1) 的平均绝对差最小）
+    - 被删除的父节点按均匀先验从子节点CPT中边缘化，与缺失父节点的处理一致
+break_cycles=False 时不断环，含有向环即抛出 ValueError 并给出一个环。
+get_engine / answer_query / answer_queries 供 Flask 后端调用。
+"""
+
+import os
+import json
+import threading
+
+import networkx as nx
+import numpy as np
+
+from CPT存储 import CPTStore, load_cpts_as_json
+
+# 各方法CPT文件（相对参数学习目录），同名 .npz 存在时优先读取
+METHOD_CPT_FILES = {
+    'MLE': os.path.join('01MLE_CPT结果', 'MLE_CPTs.json'),
+    'Bayesian': os.path.join('02Bayesian_CPT结果', 'Bayesian_CPTs.json'),
+    'EM': os.path.join('03EM_CPT结果', 'EM_CPTs.json'),
+    'SEM': os.path.join('04SEM_结果', 'SEM_CPT结果', 'SEM_CPTs.json')
+}
+
+# 断环使用的领域层级（与因果发现阶段的领域约束配置一致）
+DEFAULT_DOMAIN_TIERS = [['疾病_'], ['药物_'], ['检验_']]
+DOMAIN_CONSTRAINT_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                      '02因果发现', '领域约束配置.json')
+
+
+def load_domain_tiers(config_file=None):
+    """读取领域层级（配置不存在时使用默认层级，约束未启用时返回空列表）"""
+    config_file = config_file or DOMAIN_CONSTRAINT_FILE
+    config = {"启用": True, "层级": DEFAULT_DOMAIN_TIERS}
+    if os.path.exists(config_file):
+        try:
+            with open(config_file, 'r', encoding='utf-8') as f:
+                config.update(json.load(f))
+        except Exception as e:
+            print(f"⚠ 领域约束配置读取失败，使用默认层级: {e}")
+    return config["层级"] if config.get("启用", True) else []
+
+
+def _tier(node, tiers):
+    for level, prefixes in enumerate(tiers):
+        if any(str(node).startswith(p) for p in prefixes):
+            return level
+    return None
+
+
+def _drop_parent(parents, table, parent):
+    """按均匀先验把 parent 从 (2,)*(k+1) 的CPT中边缘化"""
+    axis = parents.index(parent)
+    return parents[:axis] + parents[axis + 1:], table.mean(axis=axis)
+
+
+def _dependence(parents, table, parent):
+    """父节点两种取值下 P(X=1) 的平均绝对差（CPT对该父节点的依赖强度）"""
+    axis = parents.index(parent)
+    return float(np.mean(np.abs(np.take(table, 1, axis=axis) - np.take(table, 0, axis=axis))[..., 1]))
+
+
+def break_parent_cycles(parents_of, tables, tiers=None):
+    """
+    删除父节点集合中位于有向环上的边，使其成为DAG
+
+    Args:
+        parents_of: {节点: 父节点列表}
+        tables: {节点: (2,)*(k+1) 的CPT数组}，轴顺序为父节点在前、子节点在后
+        tiers: 领域层级前缀列表
+
+    Returns:
+        tuple: (新的 parents_of, 新的 tables, 删除的边 [(父节点, 子节点)])
+    """
+    tiers = DEFAULT_DOMAIN_TIERS if tiers is None else tiers
+    parents_of = {node: list(parents) for node, parents in parents_of.items()}
+    tables = dict(tables)
+    removed = []
+
+    def cyclic_edges():
+        graph = nx.DiGraph()
+        graph.add_nodes_from(parents_of)
+        graph.add_edges_from((p, node) for node, parents in parents_of.items() for p in parents)
+        edges = []
+        for component in nx.strongly_connected_components(graph):
+            if len(component) > 1:
+                edges.extend((u, v) for u, v in graph.subgraph(component).edges())
+        return sorted(edges)
+
+    def remove(parent, node):
+        if node in tables:
+            parents_of[node], tables[node] = _drop_parent(parents_of[node], tables[node], parent)
+        else:
+            parents_of[node].remove(parent)
+        removed.append((parent, node))
+
+    # 1. 环上违反领域层级（下游指向上游）的边
+    for parent, node in cyclic_edges():
+        upstream, downstream = _tier(node, tiers), _tier(parent, tiers)
+        if upstream is not None and downstream is not None and downstream > upstream:
+            remove(parent, node)
+
+    # 2. 同层级内仍成环：每次删除环上依赖最弱的边
+    edges = cyclic_edges()
+    while edges:
+        parent, node = min(edges, key=lambda e: (
+            _dependence(parents_of[e[1]], tables[e[1]], e[0]) if e[1] in tables else 0.0, e))
+        remove(parent, node)
+        edges = cyclic_edges()
+
+    return parents_of, tables, removed
+
+
+def _align(variables, table, target):
+    """把 variables 上的表转置并重塑到 target 的轴顺序（缺失的轴长度为1，便于广播）"""
+    positions = [target.index(v) for v in variables]
+    table = np.transpose(table, np.argsort(positions))
+    present = set(variables)
+    return table.reshape([2 if v in present else 1 for v in target])
+
+
+class JunctionTreeEngine:
+    """二值贝叶斯网络的联结树精确推断"""
+
+    def __init__(self, cpts, do_variables=(), break_cycles=True, tiers=None):
+        """
+        Args:
+            cpts: 项目统一的CPT字典 {节点: {'type', 'parents', 'probabilities'}}
+            do_variables: 需要做图手术的干预变量（切断入边，改为均匀先验的根）
+            break_cycles: 父节点集合含有向环时按领域层级与依赖强度断环
+            tiers: 断环使用的领域层级，默认读取领域约束配置
+
+        Raises:
+            ValueError: 不断环且图手术后的父节点集合含有向环
+        """
+        store = CPTStore.from_json_dict(cpts)
+        parents_of = {node: list(cpt.parents) for node, cpt in store.items()}
+        for parents in list(parents_of.values()):
+            for parent in parents:
+                parents_of.setdefault(parent, [])
+        tables = {node: cpt.to_table().reshape((2,) * (cpt.n_parents + 1)) for node, cpt in store.items()}
+
+        self.cpts = cpts
+        self.do_variables = frozenset(do_variables)
+        self.break_cycles = break_cycles
+        self.tiers = load_domain_tiers() if tiers is None else tiers
+        self.removed_edges = []
+        if break_cycles:
+            parents_of, tables, self.removed_edges = break_parent_cycles(parents_of, tables, self.tiers)
+        self._check_acyclic(parents_of)
+        self.nodes = list(parents_of)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+
+        # 因子：(变量编号元组（父节点在前，子节点在后）, 概率数组)
+        self.factors = []
+        for node, parents in parents_of.items():
+            if node in self.do_variables or node not in store:
+                self.factors.append(((self.index[node],), np.array([0.5, 0.5])))
+                continue
+            self.factors.append((tuple(self.index[p] for p in parents) + (self.index[node],), tables[node]))
+
+        self._triangulate()
+        self._build_tree()
+        self._assign_factors()
+
+        self.evidence = {}
+        self._messages = {}
+        self._local_cache = {}
+        self._belief_cache = {}
+        self._do_engines = {}
+        self.lock = threading.Lock()
+
+    # ---------- 编译 ----------
+
+    def _check_acyclic(self, parents_of):
+        """有向环上的CPT相乘得到的不是联合分布，查询结果没有后验意义"""
+        graph = nx.DiGraph()
+        graph.add_nodes_from(parents_of)
+        graph.add_edges_from((parent, node) for node, parents in parents_of.items()
+                             if node not in self.do_variables for parent in parents)
+        if not nx.is_directed_acyclic_graph(graph):
+            cycle = [u for u, _ in nx.find_cycle(graph)]
+            raise ValueError(f"CPT父节点集合含有向环，不是贝叶斯网络: {' -> '.join(cycle + cycle[:1])}")
+
+    def _triangulate(self):
+        """道德图上按最小填充边数消元，记录极大团"""
+        adjacency = {i: set() for i in range(len(self.nodes))}
+        for variables, _ in self.factors:
+            for a in variables:
+                adjacency[a].update(v for v in variables if v != a)
+
+        cliques = []
+        remaining = {v: set(nbrs) for v, nbrs in adjacency.items()}
+        while remaining:
+            def fill_in(v):
+                nbrs = list(remaining[v])
+                return sum(1 for i, a in enumerate(nbrs) for b in nbrs[i + 1:] if b not in remaining[a])
+
+            v = min(remaining, key=lambda u: (fill_in(u), len(remaining[u]), u))
+            nbrs = remaining.pop(v)
+            for a in nbrs:
+                remaining[a].discard(v)
+                remaining[a].update(b for b in nbrs if b != a)
+            clique = frozenset(nbrs | {v})
+            if not any(clique <= other for other in cliques):
+                cliques.append(clique)
+
+        cliques = [c for c in cliques if not any(c < other for other in cliques)]
+        self.cliques = [tuple(sorted(c)) for c in cliques]
+
+    def _build_tree(self):
+        """按分隔集大小的最大生成森林（Kruskal）连接极大团"""
+        candidates = []
+        for i in range(len(self.cliques)):
+            for j in range(i + 1, len(self.cliques)):
+                weight = len(set(self.cliques[i]) & set(self.cliques[j]))
+                if weight:
+                    candidates.append((-weight, i, j))
+        candidates.sort()
+
+        root = list(range(len(self.cliques)))
+
+        def find(x):
+            while root[x] != x:
+                root[x] = root[root[x]]
+                x = root[x]
+            return x
+
+        self.neighbors = {i: [] for i in range(len(self.cliques))}
+        self.separators = {}
+        for _, i, j in candidates:
+            ri, rj = find(i), find(j)
+            if ri != rj:
+                root[ri] = rj
+                separator = tuple(sorted(set(self.cliques[i]) & set(self.cliques[j])))
+                self.neighbors[i].append(j)
+                self.neighbors[j].append(i)
+                self.separators[(i, j)] = self.separators[(j, i)] = separator
+
+    def _assign_factors(self):
+        """每个因子乘入包含其家族的最小团；每个变量的归属团用于证据与查询"""
+        self.potentials = [np.ones((2,) * len(c)) for c in self.cliques]
+        sets = [set(c) for c in self.cliques]
+        for variables, table in self.factors:
+            home = min((i for i, s in enumerate(sets) if s.issuperset(variables)), key=lambda i: len(sets[i]))
+            self.potentials[home] = self.potentials[home] * _align(variables, table, self.cliques[home])
+
+        self.home = {}
+        for v in range(len(self.nodes)):
+            self.home[v] = min((i for i, s in enumerate(sets) if v in s), key=lambda i: len(sets[i]))
+
+    # ---------- 证据与消息 ----------
+
+    def _local(self, c):
+        """团势 × 该团负责的证据指示"""
+        if c not in self._local_cache:
+            arr = self.potentials[c]
+            clique = self.cliques[c]
+            for v, value in self.evidence.items():
+                if self.home[v] == c:
+                    indicator = np.zeros(2)
+                    indicator[value] = 1.0
+                    arr = arr * _align((v,), indicator, clique)
+            self._local_cache[c] = arr
+        return self._local_cache[c]
+
+    def _invalidate(self, c):
+        """团 c 的证据改变：作废所有从 c 向外传出的消息（下游缓存必依赖上游，可剪枝）"""
+        self._local_cache.pop(c, None)
+        self._belief_cache.clear()
+        stack = [c]
+        while stack:
+            u = stack.pop()
+            for w in self.neighbors[u]:
+                if self._messages.pop((u, w), None) is not None:
+                    stack.append(w)
+
+    def set_evidence(self, evidence):
+        """
+        设置证据 {变量: 0/1}，只对变化的变量作废相关消息
+
+        Raises:
+            KeyError: 变量不在网络中
+            ValueError: 取值不是0/1
+        """
+        new = {}
+        for name, value in (evidence or {}).items():
+            if name not in self.index:
+                raise KeyError(f"变量不在网络中: {name}")
+            if int(value) not in (0, 1):
+                raise ValueError(f"变量 {name} 的取值必须为0或1: {value}")
+            new[self.index[name]] = int(value)
+
+        changed = {v for v in set(new) | set(self.evidence) if new.get(v) != self.evidence.get(v)}
+        self.evidence = new
+        for v in changed:
+            self._invalidate(self.home[v])
+
+    def _message(self, i, j):
+        """团 i → 团 j 的消息（按需递归计算并缓存，迭代实现避免深树递归）"""
+        if (i, j) in self._messages:
+            return self._messages[(i, j)]
+
+        # 后序遍历：先算好 i 一侧所有缺失的消息
+        order, stack = [], [(i, j)]
+        while stack:
+            u, w = stack.pop()
+            order.append((u, w))
+            for k in self.neighbors[u]:
+                if k != w and (k, u) not in self._messages:
+                    stack.append((k, u))
+
+        for u, w in reversed(order):
+            clique = self.cliques[u]
+            arr = self._local(u)
+            for k in self.neighbors[u]:
+                if k != w:
+                    arr = arr * _align(self.separators[(k, u)], self._messages[(k, u)], clique)
+            separator = set(self.separators[(u, w)])
+            arr = arr.sum(axis=tuple(a for a, v in enumerate(clique) if v not in separator))
+            total = arr.sum()
+            self._messages[(u, w)] = arr / total if total > 0 else arr
+        return self._messages[(i, j)]
+
+    def _belief(self, c):
+        """团 c 的归一化后验"""
+        if c not in self._belief_cache:
+            clique = self.cliques[c]
+            arr = self._local(c)
+            for k in self.neighbors[c]:
+                arr = arr * _align(self.separators[(k, c)], self._message(k, c), clique)
+            total = arr.sum()
+            if total <= 0:
+                raise ValueError("证据的概率为0，无法计算后验")
+            self._belief_cache[c] = arr / total
+        return self._belief_cache[c]
+
+    # ---------- 查询 ----------
+
+    def marginal(self, target):
+        """当前证据下单个变量的后验 [P(0), P(1)]"""
+        if target not in self.index:
+            raise KeyError(f"变量不在网络中: {target}")
+        v = self.index[target]
+        if v in self.evidence:
+            result = np.zeros(2)
+            result[self.evidence[v]] = 1.0
+            return result
+        c = self.home[v]
+        clique = self.cliques[c]
+        belief = self._belief(c)
+        return belief.sum(axis=tuple(a for a, u in enumerate(clique) if u != v))
+
+    def _do_engine(self, do_variables):
+        """切断干预变量入边后的联结树（按干预变量集合缓存）"""
+        key = frozenset(do_variables)
+        if key not in self._do_engines:
+            self._do_engines[key] = JunctionTreeEngine(self.cpts, do_variables=key,
+                                                       break_cycles=self.break_cycles, tiers=self.tiers)
+        return self._do_engines[key]
+
+    def query(self, targets, evidence=None, do=None):
+        """
+        条件/干预查询
+
+        Args:
+            targets: 变量名或变量名列表
+            evidence: 观测证据 {变量: 0/1}
+            do: 干预 {变量: 0/1}
+
+        Returns:
+            dict: {变量: [P(0), P(1)]}
+        """
+        if isinstance(targets, str):
+            targets = [targets]
+        if do:
+            missing = [name for name in do if name not in self.index]
+            if missing:
+                raise KeyError(f"变量不在网络中: {missing}")
+            engine = self._do_engine(do)
+            return engine.query(targets, {**(evidence or {}), **do})
+        self.set_evidence(evidence)
+        return {target: self.marginal(target).tolist() for target in targets}
+
+    def query_batch(self, queries):
+        """
+        批量查询：按证据排序后依次处理，相邻查询共享的消息不重算
+
+        Args:
+            queries: [{'targets': [...], 'evidence': {...}, 'do': {...}}]
+
+        Returns:
+            list: 与输入顺序一致的结果
+        """
+        def sort_key(i):
+            q = queries[i]
+            return (sorted((q.get('do') or {}).items()), sorted((q.get('evidence') or {}).items()))
+
+        results = [None] * len(queries)
+        for i in sorted(range(len(queries)), key=sort_key):
+            q = queries[i]
+            results[i] = self.query(q['targets'], q.get('evidence'), q.get('do'))
+        return results
+
+
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_engine(method='MLE', base_dir=None):
+    """
+    某方法CPT编译出的联结树（进程内缓存，CPT文件更新后重新编译）
+
+    父节点集合中的有向环在编译前断开（见 break_parent_cycles），删除的边记录在 engine.removed_edges。
+
+    Raises:
+        ValueError: 未知方法
+        FileNotFoundError: CPT文件不存在
+    """
+    if method not in METHOD_CPT_FILES:
+        raise ValueError(f"未知方法: {method}，可选: {list(METHOD_CPT_FILES)}")
+    base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+    json_file = os.path.join(base_dir, METHOD_CPT_FILES[method])
+    npz_file = os.path.splitext(json_file)[0] + '.npz'
+    source = npz_file if os.path.exists(npz_file) else json_file
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"{method} 的CPT文件不存在: {json_file}")
+
+    key = (method, base_dir)
+    mtime = os.path.getmtime(source)
+    with _ENGINES_LOCK:
+        cached = _ENGINES.get(key)
+        if cached is None or cached[0] != mtime:
+            engine = JunctionTreeEngine(load_cpts_as_json(json_file))
+            if engine.removed_edges:
+                print(f"⚠ {method} 的CPT父节点集合含有向环，编译前删除 {len(engine.removed_edges)} 条环上的边")
+            _ENGINES[key] = (mtime, engine)
+        return _ENGINES[key][1]
+
+
+def answer_query(method, targets, evidence=None, do=None, base_dir=None):
+    """供后端调用的单次查询"""
+    engine = get_engine(method, base_dir)
+    with engine.lock:
+        return engine.query(targets, evidence, do)
+
+
+def answer_queries(method, queries, base_dir=None):
+    """供后端调用的批量查询"""
+    engine = get_engine(method, base_dir)
+    with engine.lock:
+        return engine.query_batch(queries)
+
+
+if __name__ == "__main__":
+    # 自检：各方法已提交的CPT都能编译为联结树
+    for method in METHOD_CPT_FILES:
+        try:
+            engine = get_engine(method)
+        except FileNotFoundError as e:
+            print(f"- {method}: 跳过（{e}）")
+            continue
+        removed = ', '.join(f"{u}->{v}" for u, v in engine.removed_edges) or '无'
+        print(f"✓ {method}: {len(engine.nodes)} 个节点, {len(engine.cliques)} 个团, 断环删除的边: {removed}")
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑CPD (Compact CPD Families for High In-Degree Nodes)
+父节点较多时用 O(k) 个参数代替 2^k 行的条件概率表
+
+    - noisy_or:  P(X=1 | pa) = 1 - (1 - λ0) · Π (1 - λ_i)^{pa_i}，λ0 为泄漏概率；
+                 以 u_i = -log(1 - λ_i) 参数化时对数似然是 u 的凹函数，
+                 L-BFGS-B（解析梯度，盒约束）直接求全局最优
+    - logistic:  P(X=1 | pa) = σ(b + w · pa)，对 w 加 L2 正则，IRLS（牛顿法）求解，
+                 每步一次 (k+1) × (k+1) 线性方程组
+
+两种参数化都记录 converged_，未收敛时 estimate_compact_cpt 给出警告。
+
+拟合前先把数据压缩为"出现过的父节点组合 × 子节点取值"的频数（np.unique + bincount），
+迭代代价与出现过的组合数成正比，而不是与行数或 2^k 成正比。
+
+CPT字典结构与表格CPT并列：
+    {'type': 'noisy_or', 'parents': [...], 'leak': λ0, 'activations': [λ_i], ...}
+    {'type': 'logistic', 'parents': [...], 'intercept': b, 'coefficients': [w_i], 'l2': ...}
+似然评估器按参数直接对数据打分；CPT存储 / 推断引擎 需要表格时由 to_table 展开。
+"""
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+from scipy.optimize import minimize
+
+from 似然评估器 import PROB_FLOOR
+
+# 父节点数超过该值的节点自动改用紧凑参数化
+COMPACT_THRESHOLD = 8
+COMPACT_BOUND = 1e-6  # 概率参数截断到 [ε, 1-ε]
+
+
+def _compress(parent_matrix, child, weights=None):
+    """逐行数据 → (出现过的父节点组合 (m, k), 子节点频数 (m, 2))"""
+    parent_matrix = np.asarray(parent_matrix, dtype=np.uint8).reshape(len(child), -1)
+    child = np.asarray(child, dtype=np.int64)
+    if parent_matrix.shape[1] == 0:
+        patterns = np.zeros((1, 0), dtype=np.uint8)
+        inverse = np.zeros(len(child), dtype=np.int64)
+    else:
+        patterns, inverse = np.unique(parent_matrix, axis=0, return_inverse=True)
+        inverse = np.asarray(inverse).reshape(-1)
+    counts = np.bincount(inverse * 2 + child, weights=weights, minlength=len(patterns) * 2)
+    return patterns.astype(np.float64), counts.reshape(-1, 2).astype(np.float64)
+
+
+class CompactCPD(ABC):
+    """紧凑参数化CPD的公共接口"""
+
+    kind = None
+
+    def __init__(self, parents):
+        self.parents = list(parents)
+        self.log_likelihood_ = None
+        self.n_iterations_ = 0
+        self.converged_ = None
+
+    @property
+    def n_parameters(self):
+        return len(self.parents) + 1
+
+    @abstractmethod
+    def probability_one(self, parent_matrix):
+        """每行父节点取值下 P(X=1)"""
+
+    @abstractmethod
+    def _fit_compressed(self, patterns, counts, max_iterations, tolerance):
+        """由压缩后的频数拟合参数，记录 n_iterations_ 与 converged_"""
+
+    def fit(self, parent_matrix, child, weights=None, max_iterations=200, tolerance=1e-8):
+        """
+        拟合参数
+
+        Args:
+            parent_matrix: (行, k) 父节点取值，列顺序与 parents 一致
+            child: (行,) 子节点取值
+            weights: 可选的样本权重
+        """
+        patterns, counts = _compress(parent_matrix, child, weights)
+        self._fit_compressed(patterns, counts, max_iterations, tolerance)
+        self.log_likelihood_ = self._counts_log_likelihood(patterns, counts)
+        return self
+
+    def _counts_log_likelihood(self, patterns, counts):
+        prob_1 = np.clip(self.probability_one(patterns), PROB_FLOOR, 1 - PROB_FLOOR)
+        return float(counts[:, 0] @ np.log(1 - prob_1) + counts[:, 1] @ np.log(prob_1))
+
+    def row_log_likelihood(self, parent_matrix, child):
+        """逐行对数似然（与似然评估器相同的概率下限）"""
+        prob_1 = self.probability_one(parent_matrix)
+        probs = np.where(np.asarray(child) == 1, prob_1, 1 - prob_1)
+        return np.log(np.maximum(probs, PROB_FLOOR))
+
+    def to_table(self):
+        """展开为 2^k × 2 概率表（第一个父节点为最高位），供表格化的下游使用"""
+        k = len(self.parents)
+        design = (np.arange(1 << k)[:, None] >> np.arange(k - 1, -1, -1)) & 1
+        prob_1 = self.probability_one(design)
+        return np.column_stack([1 - prob_1, prob_1])
+
+    @abstractmethod
+    def _parameters(self):
+        """参数字段（写入CPT字典）"""
+
+    def to_dict(self):
+        """转换为CPT字典"""
+        cpt = {'type': self.kind, 'parents': list(self.parents)}
+        cpt.update(self._parameters())
+        cpt['n_parameters'] = self.n_parameters
+        if self.log_likelihood_ is not None:
+            cpt['log_likelihood'] = self.log_likelihood_
+        if self.converged_ is not None:
+            cpt['converged'] = bool(self.converged_)
+        return cpt
+
+
+class NoisyOrCPD(CompactCPD):
+    """带泄漏的 noisy-OR"""
+
+    kind = 'noisy_or'
+
+    def __init__(self, parents, leak=0.5, activations=None):
+        super().__init__(parents)
+        self.leak = float(leak)
+        self.activations = (np.full(len(self.parents), 0.5) if activations is None
+                            else np.asarray(activations, dtype=np.float64))
+
+    def probability_one(self, parent_matrix):
+        parent_matrix = np.asarray(parent_matrix, dtype=np.float64).reshape(-1, len(self.parents))
+        log_off = np.log1p(-self.leak) + parent_matrix @ np.log1p(-self.activations)
+        return -np.expm1(log_off)
+
+    def _fit_compressed(self, patterns, counts, max_iterations, tolerance):
+        """
+        u = -log(1 - λ)（泄漏项为第0维）：-log P(X=0|pa) = η = u0 + pa·u，
+        对数似然 Σ -n0·η + n1·log(1 - e^{-η}) 对 u 是凹的，梯度 Aᵀ(-n0 + n1·q/p)；
+        L-BFGS-B 在 λ ∈ [ε, 1-ε] 对应的盒约束内最大化
+        """
+        design = np.column_stack([np.ones(len(patterns)), patterns])
+        n0, n1 = counts[:, 0], counts[:, 1]
+
+        def objective(u):
+            eta = design @ u
+            q = np.exp(-eta)
+            p = np.maximum(-np.expm1(-eta), PROB_FLOOR)
+            log_likelihood = -n0 @ eta + n1 @ np.log(p)
+            gradient = design.T @ (-n0 + n1 * q / p)
+            return -log_likelihood, -gradient
+
+        start = -np.log1p(-np.concatenate([[self.leak], self.activations]))
+        bounds = [(-np.log1p(-COMPACT_BOUND), -np.log(COMPACT_BOUND))] * len(start)
+        result = minimize(objective, start, jac=True, method='L-BFGS-B', bounds=bounds,
+                          options={'maxiter': max_iterations, 'ftol': tolerance * 1e-4, 'gtol': tolerance})
+
+        lam = -np.expm1(-result.x)
+        self.leak = float(lam[0])
+        self.activations = lam[1:]
+        self.n_iterations_ = int(result.nit)
+        self.converged_ = bool(result.success)
+
+    def _parameters(self):
+        return {'leak': self.leak, 'activations': self.activations.tolist()}
+
+
+class LogisticCPD(CompactCPD):
+    """L2 正则化的逻辑回归CPD（截距不正则化）"""
+
+    kind = 'logistic'
+
+    def __init__(self, parents, intercept=0.0, coefficients=None, l2=1.0):
+        super().__init__(parents)
+        self.intercept = float(intercept)
+        self.coefficients = (np.zeros(len(self.parents)) if coefficients is None
+                             else np.asarray(coefficients, dtype=np.float64))
+        self.l2 = float(l2)
+
+    def probability_one(self, parent_matrix):
+        parent_matrix = np.asarray(parent_matrix, dtype=np.float64).reshape(-1, len(self.parents))
+        return 1 / (1 + np.exp(-np.clip(self.intercept + parent_matrix @ self.coefficients, -500, 500)))
+
+    def _fit_compressed(self, patterns, counts, max_iterations, tolerance):
+        """IRLS：梯度 Aᵀ(n1 - n·p) - Λβ，Hessian Aᵀ diag(n·p(1-p)) A + Λ"""
+        design = np.column_stack([np.ones(len(patterns)), patterns])
+        totals = counts.sum(axis=1)
+        penalty = np.full(design.shape[1], self.l2)
+        penalty[0] = 0.0
+        beta = np.concatenate([[self.intercept], self.coefficients])
+
+        for iteration in range(max_iterations):
+            prob_1 = 1 / (1 + np.exp(-np.clip(design @ beta, -500, 500)))
+            gradient = design.T @ (counts[:, 1] - totals * prob_1) - penalty * beta
+            hessian = (design.T * (totals * prob_1 * (1 - prob_1))) @ design + np.diag(penalty)
+            hessian[np.diag_indices_from(hessian)] += 1e-9  # 完全分离时保持可解
+            step = np.linalg.solve(hessian, gradient)
+            beta = beta + step
+            self.n_iterations_ = iteration + 1
+            if np.max(np.abs(step)) < tolerance:
+                self.converged_ = True
+                break
+        else:
+            self.converged_ = False
+
+        self.intercept = float(beta[0])
+        self.coefficients = beta[1:]
+
+    def _parameters(self):
+        return {'intercept': self.intercept, 'coefficients': self.coefficients.tolist(), 'l2': self.l2}
+
+
+COMPACT_TYPES = {
+    NoisyOrCPD.kind: NoisyOrCPD,
+    LogisticCPD.kind: LogisticCPD
+}
+
+
+def is_compact(cpt):
+    """CPT字典是否为紧凑参数化"""
+    return cpt.get('type') in COMPACT_TYPES
+
+
+def cpd_from_dict(cpt):
+    """由CPT字典恢复紧凑CPD"""
+    parents = cpt.get('parents', [])
+    if cpt['type'] == NoisyOrCPD.kind:
+        cpd = NoisyOrCPD(parents, cpt['leak'], cpt['activations'])
+    elif cpt['type'] == LogisticCPD.kind:
+        cpd = LogisticCPD(parents, cpt['intercept'], cpt['coefficients'], cpt.get('l2', 1.0))
+    else:
+        raise ValueError(f"不是紧凑CPD类型: {cpt.get('type')}")
+    cpd.log_likelihood_ = cpt.get('log_likelihood')
+    cpd.converged_ = cpt.get('converged')
+    return cpd
+
+
+def describe_compact(cpt):
+    """紧凑CPD参数的单行描述（用于汇总与报告）"""
+    if cpt['type'] == NoisyOrCPD.kind:
+        items = [f"泄漏={cpt['leak']:.4f}"]
+        items += [f"{p}:{a:.4f}" for p, a in zip(cpt['parents'], cpt['activations'])]
+    else:
+        items = [f"截距={cpt['intercept']:.4f}"]
+        items += [f"{p}:{w:.4f}" for p, w in zip(cpt['parents'], cpt['coefficients'])]
+    return ', '.join(items)
+
+
+def use_compact(parents, family, threshold=COMPACT_THRESHOLD):
+    """父节点数超过阈值且指定了紧凑族时改用紧凑参数化"""
+    return family is not None and len(parents) > threshold
+
+
+def estimate_compact_cpt(engine, node, parents, family, **kwargs):
+    """
+    由计数引擎的数据拟合单个节点的紧凑CPD
+
+    Args:
+        engine: CountEngine
+        family: 'noisy_or' 或 'logistic'
+        kwargs: 传给CPD构造函数（如 logistic 的 l2）
+
+    Returns:
+        tuple: (CPT字典, 该节点的对数似然)
+    """
+    if family not in COMPACT_TYPES:
+        raise ValueError(f"不支持的紧凑CPD类型: {family}，可选: {list(COMPACT_TYPES)}")
+    cpd = COMPACT_TYPES[family](parents, **kwargs)
+    cpd.fit(engine.parent_matrix(parents), engine.column(node))
+    if not cpd.converged_:
+        print(f"⚠ {node} 的 {family} CPD 未收敛（{cpd.n_iterations_} 次迭代），参数与对数似然为近似值")
+    return cpd.to_dict(), cpd.log_likelihood_
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自助法引擎 (Weighted-Count Bootstrap for CPTs and Edge Gains)
+用行权重代替重抽样：第 b 个重复样本的条件频数 = 以 w_b 为权重的 bincount
+
+    - poisson:      w_bi ~ Poisson(1)，各行独立，n 较大时与经典自助法等价
+    - multinomial:  w_b ~ Multinomial(n, 1/n)，即经典的有放回重抽样
+
+每个家族的下标（父节点组合 · 2 + 子节点）只编码一次；一批 b 个重复样本的频数
+由一次带权 bincount 得到（下标偏移 b · 2^(k+1)），B 个重复样本不需要重新读数据或重跑估计器。
+移除边 s→t 后的家族频数由 t 的频数表在 s 所在维度上求和得到，因此边增益
+ΔLL(s→t) = LL_t(Pa(t)) - LL_t(Pa(t)∖{s}) 也不需要额外计数。
+
+MLE 下某个重复样本中父节点组合的总权重为0时，该组合的 P(1) 没有定义（CPT中的 0.5
+只是占位值），记为 NaN 并不计入均值、标准误与分位数；每个条目记录有效重复样本数。
+边增益不受影响：频数为0的组合对似然的贡献为0。
+"""
+
+import warnings
+
+import numpy as np
+
+from 计数引擎 import CountEngine
+from 似然评估器 import PROB_FLOOR
+
+SUPPORTED_RESAMPLING = ('poisson', 'multinomial')
+
+
+def _probabilities(counts, prior_alpha=None):
+    """频数 (..., q, 2) → P，MLE 时未观测组合取 [0.5, 0.5]"""
+    totals = counts.sum(axis=-1, keepdims=True)
+    if prior_alpha is not None:
+        return (counts + prior_alpha) / (totals + 2 * prior_alpha)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(totals > 0, counts / totals, 0.5)
+
+
+def _log_likelihood(counts, prior_alpha=None):
+    """每个重复样本的家族对数似然 (..., q, 2) → (...)"""
+    probs = _probabilities(counts, prior_alpha)
+    return (counts * np.log(np.maximum(probs, PROB_FLOOR))).sum(axis=(-2, -1))
+
+
+class WeightedBootstrap:
+    """基于加权频数的CPT与边增益自助法"""
+
+    def __init__(self, data, parents_of, n_replicates=1000, resampling='poisson',
+                 batch_size=64, prior_alpha=None, random_state=None):
+        """
+        Args:
+            data: pd.DataFrame，已二值化（0/1）的数据
+            parents_of: {节点: 父节点列表}
+            n_replicates: 重复样本数 B
+            resampling: 'poisson' 或 'multinomial'
+            batch_size: 每批同时计数的重复样本数（控制 批 × 行 的中间数组大小）
+            prior_alpha: None 为MLE；否则为Dirichlet先验 (N_jk + α) / (N_j + 2α)
+            random_state: 随机种子
+        """
+        if resampling not in SUPPORTED_RESAMPLING:
+            raise ValueError(f"不支持的重抽样方式: {resampling}，可选: {SUPPORTED_RESAMPLING}")
+        self.engine = CountEngine(data)
+        self.n_samples = self.engine.n_samples
+        self.n_replicates = n_replicates
+        self.resampling = resampling
+        self.batch_size = batch_size
+        self.prior_alpha = prior_alpha
+        self.rng = np.random.default_rng(random_state)
+
+        self.parents_of = {
+            node: [p for p in parents if p in self.engine.index]
+            for node, parents in parents_of.items() if node in self.engine.index
+        }
+        # 家族扁平下标只编码一次
+        self.flat = {}
+        for node, parents in self.parents_of.items():
+            child = self.engine.column(node).astype(np.int64)
+            if parents:
+                self.flat[node] = self.engine.parent_config(parents).astype(np.int64) * 2 + child
+            else:
+                self.flat[node] = child
+
+    def _weights(self, n_batch):
+        """一批重复样本的行权重 (b, n)"""
+        if self.resampling == 'poisson':
+            return self.rng.poisson(1.0, size=(n_batch, self.n_samples)).astype(np.float64)
+        uniform = np.full(self.n_samples, 1.0 / self.n_samples)
+        return self.rng.multinomial(self.n_samples, uniform, size=n_batch).astype(np.float64)
+
+    def _batch_counts(self, node, weights):
+        """一次带权 bincount 得到整批重复样本的频数 (b, 2^k, 2)"""
+        n_batch = len(weights)
+        size = 2 << len(self.parents_of[node])
+        offsets = (np.arange(n_batch, dtype=np.int64) * size)[:, None]
+        counts = np.bincount((offsets + self.flat[node][None, :]).ravel(),
+                             weights=weights.ravel(), minlength=n_batch * size)
+        return counts.reshape(n_batch, size // 2, 2)
+
+    def _edge_gain(self, counts, parents, source):
+        """由家族频数计算移除 source 后的似然增益 (b,)"""
+        k = len(parents)
+        j = parents.index(source)
+        shaped = counts.reshape((len(counts),) + (2,) * k + (2,))
+        dropped = shaped.sum(axis=1 + j).reshape(len(counts), -1, 2)
+        return _log_likelihood(counts, self.prior_alpha) - _log_likelihood(dropped, self.prior_alpha)
+
+    def run(self, edges, confidence=0.95):
+        """
+        运行自助法
+
+        Args:
+            edges: [(源节点, 目标节点)]，只评估源节点是目标节点父节点的边
+            confidence: 置信水平
+
+        Returns:
+            dict: cpt_intervals / edge_gain_intervals / n_replicates / resampling / confidence
+        """
+        edges = [(s, t) for s, t in edges if t in self.parents_of and s in self.parents_of[t]]
+        edges_by_target = {}
+        for s, t in edges:
+            edges_by_target.setdefault(t, []).append(s)
+
+        prob_samples = {node: [] for node in self.parents_of}
+        effective_counts = {node: 0 for node in self.parents_of}
+        gain_samples = {edge: [] for edge in edges}
+
+        for start in range(0, self.n_replicates, self.batch_size):
+            weights = self._weights(min(self.batch_size, self.n_replicates - start))
+            for node, parents in self.parents_of.items():
+                counts = self._batch_counts(node, weights)
+                prob_1 = _probabilities(counts, self.prior_alpha)[:, :, 1]
+                if self.prior_alpha is None:
+                    # 总权重为0的组合在该重复样本中没有MLE，不用占位值 0.5 参与统计
+                    effective = counts.sum(axis=-1) > 0
+                    prob_1 = np.where(effective, prob_1, np.nan)
+                    effective_counts[node] = effective_counts[node] + effective.sum(axis=0)
+                else:
+                    effective_counts[node] = effective_counts[node] + len(counts)
+                prob_samples[node].append(prob_1)
+                for source in edges_by_target.get(node, []):
+                    gain_samples[(source, node)].append(self._edge_gain(counts, parents, source))
+
+        lower_q, upper_q = 50 * (1 - confidence), 50 * (1 + confidence)
+        ones = np.ones((1, self.n_samples))
+
+        cpt_intervals = {}
+        for node, parents in self.parents_of.items():
+            samples = np.concatenate(prob_samples[node])                     # (B, q)，无定义处为 NaN
+            n_effective = np.broadcast_to(effective_counts[node], samples.shape[1:]).astype(np.int64)
+            point_counts = self._batch_counts(node, ones)
+            with warnings.catch_warnings():
+                # 全部重复样本都无定义（未观测组合）或有效样本不足2个时结果为 NaN
+                warnings.simplefilter('ignore', RuntimeWarning)
+                lower, upper = np.nanpercentile(samples, [lower_q, upper_q], axis=0)
+                mean = np.nanmean(samples, axis=0)
+                std = np.nanstd(samples, axis=0, ddof=1)
+            cpt_intervals[node] = {
+                'parents': parents,
+                'point': _probabilities(point_counts, self.prior_alpha)[0, :, 1],
+                'mean': mean,
+                'std': np.where(n_effective > 1, std, 0.0),
+                'lower': lower,
+                'upper': upper,
+                'n_effective': n_effective,
+                'observed': point_counts[0].sum(axis=1) > 0
+            }
+
+        edge_gain_intervals = {}
+        for (source, target), chunks in gain_samples.items():
+            samples = np.concatenate(chunks)                                 # (B,)
+            point = self._edge_gain(self._batch_counts(target, ones), self.parents_of[target], source)[0]
+            lower, upper = np.percentile(samples, [lower_q, upper_q])
+            edge_gain_intervals[f"{source}->{target}"] = {
+                'edge': (source, target),
+                'point': float(point),
+                'mean': float(samples.mean()),
+                'std': float(samples.std(ddof=1)) if len(samples) > 1 else 0.0,
+                'lower': float(lower),
+                'upper': float(upper),
+                'positive_fraction': float((samples > 0).mean())
+            }
+
+        return {
+            'cpt_intervals': cpt_intervals,
+            'edge_gain_intervals': edge_gain_intervals,
+            'n_replicates': self.n_replicates,
+            'resampling': self.resampling,
+            'confidence': confidence
+        }
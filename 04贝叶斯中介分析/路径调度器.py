@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+路径调度器 (Process-Pool Mediation Path Scheduler)
+把中介路径分配到多个工作进程，吞吐量随路径数而不是链数扩展
+
+    - 核数预算 core_budget 按 cores_per_worker 划分为若干工作进程；
+      每个进程内的 pm.sample 以 cores_per_worker 个核运行各条链（默认1，链依次运行）
+    - 每个工作进程在初始化时加载一次数据、构建并编译一次模型（get_compiled_model），
+      之后每条路径只 pm.set_data 后采样
+    - 结果以轻量汇总流式返回主进程：去掉 trace / model，只保留汇总统计与
+      绘图所需的间接效应、直接效应后验样本（float32）
+"""
+
+import importlib.util
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# 绘图需要的后验样本
+SAMPLE_VARIABLES = ('indirect_effect', 'tau_prime')
+
+_WORKER = {}
+
+
+def summarize_result(result):
+    """单条路径的分析结果 → 轻量汇总（可跨进程传输）"""
+    summary = {k: v for k, v in result.items() if k not in ('trace', 'model')}
+    posterior = result['trace'].posterior
+    summary['samples'] = {var: posterior[var].values.ravel().astype(np.float32) for var in SAMPLE_VARIABLES}
+    return summary
+
+
+def _init_worker(module_file, data, prior_strength, sampling):
+    """工作进程初始化：按文件加载分析脚本，构建分析器并编译模型"""
+    spec = importlib.util.spec_from_file_location('_mediation_worker', module_file)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    analyzer = module.BayesianMediationAnalysis.for_worker(data, **sampling)
+    analyzer.get_compiled_model(prior_strength)
+    _WORKER.update(analyzer=analyzer, prior_strength=prior_strength)
+
+
+def _analyze_path(path_info):
+    analyzer = _WORKER['analyzer']
+    result = analyzer.analyze_single_path(path_info, _WORKER['prior_strength'])
+    return path_info['id'], summarize_result(result) if result else None
+
+
+class PathScheduler:
+    """中介路径的进程池调度器"""
+
+    def __init__(self, module_file, data, core_budget=None, cores_per_worker=1,
+                 draws=500, tune=500, chains=4):
+        """
+        Args:
+            module_file: 02贝叶斯中介分析.py 的路径（工作进程按文件加载）
+            data: 已标准化的数据（含 *_std 列）
+            core_budget: 总核数预算，None 为CPU核数
+            cores_per_worker: 每个工作进程内 pm.sample 使用的核数
+            draws / tune / chains: 采样设置
+        """
+        self.module_file = module_file
+        self.data = data
+        self.core_budget = core_budget or os.cpu_count() or 1
+        self.cores_per_worker = max(1, min(cores_per_worker, chains))
+        self.n_workers = max(1, self.core_budget // self.cores_per_worker)
+        self.sampling = {'draws': draws, 'tune': tune, 'chains': chains, 'cores': self.cores_per_worker}
+
+    def run(self, paths, prior_strength=1.0):
+        """
+        并行分析全部路径，按完成顺序逐条产出 (路径ID, 轻量汇总或None)
+        """
+        n_workers = min(self.n_workers, len(paths))
+        if n_workers == 0:
+            return
+        print(f"路径调度：{len(paths)} 条路径，{n_workers} 个工作进程 × 每进程 {self.cores_per_worker} 核")
+
+        # spawn：PyTensor / BLAS 的线程状态不随 fork 复制
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(self.module_file, self.data, prior_strength, self.sampling)) as pool:
+            futures = {pool.submit(_analyze_path, path): path for path in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    yield future.result()
+                except Exception as e:
+                    print(f"路径 {path['id']} 分析失败: {e}")
+                    yield path['id'], None
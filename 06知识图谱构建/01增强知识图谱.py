@@ -23,6 +23,7 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
 import os
+import sys
 import json
 import warnings
 from collections import defaultdict, Counter
@@ -276,12 +277,16 @@ class EnhancedKnowledgeGraph:
             ]
             cpt_dir = os.path.join(os.path.dirname(self.base_dir), "03多方法参数学习")
             
+            # 优先读取数组化CPT（.npz），转换为原有JSON结构
+            if cpt_dir not in sys.path:
+                sys.path.append(cpt_dir)
+            from CPT存储 import load_cpts_as_json
+            
             for method, folder_name in cpt_methods:
                 try:
                     cpt_file = os.path.join(cpt_dir, f"{folder_name}/{method}_CPTs.json")
                     if os.path.exists(cpt_file):
-                        with open(cpt_file, 'r', encoding='utf-8') as f:
-                            self.cpt_data[method] = json.load(f)
+                        self.cpt_data[method] = load_cpts_as_json(cpt_file)
                         print(f"✓ 成功加载 {method} CPT数据: {len(self.cpt_data[method])} 个节点")
                     else:
                         print(f"⚠ CPT文件不存在: {cpt_file}")
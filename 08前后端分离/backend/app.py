@@ -7,6 +7,7 @@
 
 import json
 import os
+import sys
 from flask import Flask, jsonify, request, session, make_response
 from werkzeug.security import check_password_hash, generate_password_hash
 import time
@@ -37,6 +38,26 @@ USERS_FILE = '/home/zkr/因果发现/secure_credentials/users.json'
 USER_LOG_FILE = '/home/zkr/因果发现/secure_credentials/users.log'
 JWT_SECRET = os.environ.get('JWT_SECRET', 'dev-jwt-secret')
 JWT_TTL_SECONDS = 7 * 24 * 3600
+PARAM_LEARNING_DIR = '/home/zkr/因果发现/03多方法参数学习'
+
+def load_method_cpt_file(fp):
+    """读取方法CPT文件：同名 .npz（CPT存储.py）存在时优先读取并转换为JSON结构，读取失败时回退到JSON"""
+    try:
+        if PARAM_LEARNING_DIR not in sys.path:
+            sys.path.append(PARAM_LEARNING_DIR)
+        from CPT存储 import load_cpts_as_json
+        return load_cpts_as_json(fp)
+    except Exception as e:
+        print(f"读取 .npz CPT失败，回退到JSON: {e}")
+        with open(fp, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+def load_inference_module():
+    """导入参数学习目录下的推断引擎（联结树按方法缓存在进程内）"""
+    if PARAM_LEARNING_DIR not in sys.path:
+        sys.path.append(PARAM_LEARNING_DIR)
+    import 推断引擎
+    return 推断引擎
 
 def ensure_dir(p):
     try:
@@ -321,8 +342,7 @@ class KnowledgeGraphAPI:
                 try:
                     if not os.path.exists(fp):
                         continue
-                    with open(fp, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
+                    data = load_method_cpt_file(fp)
                     # 兼容列表/字典两种结构
                     if isinstance(data, dict):
                         for k in data.keys():
@@ -523,8 +543,7 @@ class KnowledgeGraphAPI:
             try:
                 if not os.path.exists(fp):
                     continue
-                with open(fp, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                data = load_method_cpt_file(fp)
                 found = None
                 if isinstance(data, dict):
                     if param_id in data:
@@ -1340,6 +1359,40 @@ def search_parameters_route():
             'error': str(e)
         }), 500
 
+@app.route('/api/inference/query', methods=['POST'])
+def inference_query_route():
+    """
+    基于学习到的CPT做精确推断
+    请求体: {"method": "MLE", "targets": [...], "evidence": {...}, "do": {...}}
+           或 {"method": "MLE", "queries": [{"targets", "evidence", "do"}, ...]}
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        method = body.get('method', 'MLE')
+        inference = load_inference_module()
+        if 'queries' in body:
+            data = inference.answer_queries(method, body.get('queries') or [])
+        else:
+            targets = body.get('targets') or []
+            if not targets:
+                return jsonify({'success': False, 'error': '请指定查询变量 targets'}), 400
+            data = inference.answer_query(method, targets, body.get('evidence'), body.get('do'))
+        return jsonify({
+            'success': True,
+            'method': method,
+            'data': data
+        })
+    except (KeyError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except Exception as e:
+        logger.error(f"推断查询失败: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/pathways', methods=['GET'])
 def get_pathways():
     """获取路径分析数据"""
@@ -0,0 +1,635 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+规模基准测试统一执行脚本 (Scale Benchmark Suite)
+在不同规模的合成队列上依次运行 02因果发现 ~ 06知识图谱构建 各阶段，
+记录每个阶段的耗时、峰值常驻内存 (RSS) 以及相对真实DAG的结构汉明距离 (SHD)，
+并与保存的基线比较，超出容忍度时标记为性能回退。
+
+用法示例:
+    python 00规模基准测试.py                       # 默认规模扫描
+    python 00规模基准测试.py --rows 1000 10000 --vars 30 100
+    python 00规模基准测试.py --stages 02 03 --timeout 600
+    python 00规模基准测试.py --candidate-parents none --n-jobs 4   # 02阶段全量搜索 + 并行GES
+    python 00规模基准测试.py --update-baseline     # 以本次结果更新基线
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import traceback
+import importlib.util
+import multiprocessing as mp
+from datetime import datetime
+
+import pandas as pd
+import networkx as nx
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+
+from 合成队列生成器 import generate_cohort, structural_hamming_distance
+
+# 默认规模扫描范围
+DEFAULT_ROWS = [1000, 10000, 100000, 1000000]
+DEFAULT_VARS = [30, 100, 300, 1000]
+ALL_STAGES = ['02', '03', '04', '05', '06']
+
+STAGE_NAMES = {
+    '02': '因果发现',
+    '03': '多方法参数学习',
+    '04': '贝叶斯中介分析',
+    '05': '三角测量',
+    '06': '知识图谱构建'
+}
+
+# 回退判定容忍度：耗时/内存超过基线 25% 视为回退
+REGRESSION_TOLERANCE = 0.25
+# 小于该值的耗时(秒)/内存(MB)差异视为噪声
+TIME_NOISE_FLOOR = 1.0
+MEMORY_NOISE_FLOOR = 16.0
+# 峰值内存口径：阶段子进程的 ru_maxrss（不在计时区间内开启 tracemalloc）；
+# 口径不同的旧基线不参与内存回退判定
+MEMORY_METRIC = 'ru_maxrss'
+
+# 02阶段各算法的仓库入口：(算法, 脚本, 结果目录, 边列表文件, 入口函数, 入口支持的基准参数)
+DISCOVERY_SCRIPTS = [
+    ("PC算法", "02因果发现/01PC算法.py", "01PC算法结果", "PC_因果边列表.csv",
+     "run_pc_algorithm", ()),
+    ("爬山算法", "02因果发现/02爬山算法.py", "02爬山算法结果", "HillClimbing_AIC-D_因果边列表.csv",
+     "run_hillclimbing_algorithm", ('time_budget', 'candidate_method', 'max_candidates')),
+    ("贪婪等价搜索", "02因果发现/03贪婪等价搜索.py", "03贪婪等价搜索结果", "GreedyEquivalence_AIC-D_因果边列表.csv",
+     "run_ges_algorithm", ('time_budget', 'candidate_method', 'max_candidates', 'n_jobs')),
+    ("树搜索", "02因果发现/04树搜索.py", "04树搜索结果", "TAN_因果边列表.csv",
+     "run_tree_search_algorithm", ()),
+]
+
+RESULT_DIR = os.path.join(SCRIPT_DIR, "基准结果")
+BASELINE_FILE = os.path.join(RESULT_DIR, "基准基线.json")
+
+
+def load_repo_module(relative_path, module_name):
+    """按文件路径加载仓库中的阶段脚本（脚本名以数字开头，无法直接import）"""
+    file_path = os.path.join(REPO_DIR, relative_path)
+    # 阶段脚本会直接 import 同目录下的共享模块（如 领域约束、计数引擎）
+    module_dir = os.path.dirname(file_path)
+    if module_dir not in sys.path:
+        sys.path.insert(0, module_dir)
+    spec = importlib.util.spec_from_file_location(module_name, file_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def redirect_script_io(module, df, output_dir):
+    """
+    阶段脚本的输入数据与输出目录写在 load_data / create_output_folder 中（指向仓库目录），
+    基准测试改为读取合成队列、写入工作区，入口函数的其余流程保持不变
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    module.load_data = lambda: df.copy()
+    module.create_output_folder = lambda: output_dir
+
+
+def read_edge_csv(file_path):
+    """读取 源节点/目标节点 格式的因果边CSV"""
+    if not os.path.exists(file_path):
+        return []
+    df = pd.read_csv(file_path, encoding='utf-8-sig')
+    if df.empty:
+        return []
+    return list(zip(df['源节点'].astype(str), df['目标节点'].astype(str)))
+
+
+def write_edge_csv(edges, file_path):
+    """以与02因果发现各脚本相同的格式保存因果边"""
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    pd.DataFrame(list(edges), columns=["源节点", "目标节点"]).to_csv(
+        file_path, index=False, encoding="utf-8-sig"
+    )
+
+
+# ============================================================
+# 各阶段实现：全部读写工作区目录，目录结构与仓库保持一致
+# ============================================================
+
+def stage_02_causal_discovery(workspace, data_file, true_edges, options):
+    """02 因果发现：调用仓库中 PC / 爬山 / GES / TAN 脚本的入口函数 + 因果边筛选"""
+    df = pd.read_csv(data_file, index_col=0)
+    df = df.dropna(axis=1, how='all').astype('float32')
+    stage_dir = os.path.join(workspace, "02因果发现")
+
+    metrics = {}
+    all_edges = []
+    for name, script, folder, csv_name, entry, supported in DISCOVERY_SCRIPTS:
+        module = load_repo_module(script, f"bench_{entry}")
+        output_dir = os.path.join(stage_dir, folder)
+        redirect_script_io(module, df, output_dir)
+        kwargs = {key: options[key] for key in supported if options.get(key) is not None}
+
+        start = time.perf_counter()
+        getattr(module, entry)(**kwargs)
+        metrics[f"{name}_耗时秒"] = round(time.perf_counter() - start, 3)
+
+        edges = read_edge_csv(os.path.join(output_dir, csv_name))
+        metrics[f"{name}_SHD"] = structural_hamming_distance(true_edges, edges)
+
+        if edges:
+            edge_df = pd.DataFrame(edges, columns=['源节点', '目标节点'])
+            edge_df['算法'] = name
+            edge_df['边标识'] = edge_df['源节点'] + ' -> ' + edge_df['目标节点']
+            all_edges.append(edge_df)
+
+    # 因果边筛选（与06因果边筛选算法.py的流程一致）
+    selection = load_repo_module("02因果发现/06因果边筛选算法.py", "bench_edge_selection")
+    selector = selection.ProfessionalCausalEdgeSelector()
+    edge_df = selector.merge_and_analyze_edges(all_edges)
+    edge_df = selector.calculate_advanced_scores(edge_df)
+    edge_df = selector.ensemble_scoring(edge_df)
+    selector.adaptive_threshold_selection(edge_df)
+    selected_edges = selector.quality_based_selection(edge_df)
+
+    output_dir = os.path.join(stage_dir, "06候选因果边集合")
+    os.makedirs(output_dir, exist_ok=True)
+    edge_df.to_csv(os.path.join(output_dir, '因果边综合评分结果.csv'),
+                   index=False, encoding='utf-8-sig')
+    selected_edges.to_csv(os.path.join(output_dir, '高质量因果边候选集.csv'),
+                          index=False, encoding='utf-8-sig')
+    selected_edges[['源节点', '目标节点', '质量等级', '集成评分', '支持算法数量']].to_csv(
+        os.path.join(output_dir, '精简因果边列表.csv'), index=False, encoding='utf-8-sig'
+    )
+
+    screened = read_edge_csv(os.path.join(output_dir, '精简因果边列表.csv'))
+    metrics['SHD'] = structural_hamming_distance(true_edges, screened)
+    metrics['边数'] = len(screened)
+    return metrics
+
+
+def stage_03_parameter_learning(workspace, data_file, true_edges, options):
+    """03 多方法参数学习：MLE / Bayesian / EM / SEM + 边级似然增益 + 参数稳定性"""
+    stage_dir = os.path.join(workspace, "03多方法参数学习")
+    edges = read_edge_csv(os.path.join(workspace, "02因果发现/06候选因果边集合/精简因果边列表.csv"))
+
+    estimator_specs = [
+        ("MLE", "01最大似然估计器.py", "MLEParameterEstimator", "mle_estimation", "01MLE_CPT结果"),
+        ("Bayesian", "02贝叶斯估计器.py", "BayesianParameterEstimator", "bayesian_estimation", "02Bayesian_CPT结果"),
+        ("EM", "03期望最大化(EM).py", "EMParameterEstimator", "em_estimation", "03EM_CPT结果"),
+        ("SEM", "04结构方程模型估计器.py", "SEMParameterEstimator", "sem_estimation", "04SEM_结果"),
+    ]
+
+    metrics = {}
+    for method, script, class_name, estimate_name, folder in estimator_specs:
+        module = load_repo_module(f"03多方法参数学习/{script}", f"bench_{method}")
+        estimator = getattr(module, class_name)(data_file=data_file)
+
+        start = time.perf_counter()
+        estimator.load_data()
+        estimator.preprocess_data()
+        for source, target in edges:
+            if source in estimator.data.columns and target in estimator.data.columns:
+                estimator.causal_edges.append((source, target))
+                estimator.graph.add_edge(source, target)
+        getattr(estimator, estimate_name)()
+        metrics[f"{method}_耗时秒"] = round(time.perf_counter() - start, 3)
+
+        estimator.output_folder = os.path.join(stage_dir, folder)
+        os.makedirs(estimator.output_folder, exist_ok=True)
+        estimator.save_results()
+
+    # 边级似然增益
+    gain_module = load_repo_module("03多方法参数学习/05边级似然增益.py", "bench_edge_gain")
+    calculator = gain_module.EdgeLikelihoodGainCalculator(data_file)
+    calculator.load_data()
+    calculator.preprocess_data()
+    calculator.causal_edges = list(edges)
+    calculator.graph = nx.DiGraph()
+    calculator.graph.add_edges_from(edges)
+    for method, (folder, filename) in {
+        'MLE': ('01MLE_CPT结果', 'MLE_CPTs.json'),
+        'Bayesian': ('02Bayesian_CPT结果', 'Bayesian_CPTs.json'),
+        'EM': ('03EM_CPT结果', 'EM_CPTs.json'),
+        'SEM': ('04SEM_结果', 'SEM_结构方程.json')
+    }.items():
+        result_file = os.path.join(stage_dir, folder, filename)
+        if os.path.exists(result_file):
+            with open(result_file, 'r', encoding='utf-8') as f:
+                calculator.results[method] = json.load(f)
+
+    gain_folder = os.path.join(stage_dir, "05边级似然增益结果")
+    os.makedirs(gain_folder, exist_ok=True)
+    calculator.create_output_folder = lambda: gain_folder
+
+    start = time.perf_counter()
+    all_gains = calculator.calculate_all_methods_gains()
+    metrics["边级似然增益_耗时秒"] = round(time.perf_counter() - start, 3)
+    calculator.save_results(all_gains)
+
+    # 参数稳定性
+    stability_module = load_repo_module("03多方法参数学习/06参数稳定性.py", "bench_stability")
+    analyzer = stability_module.ParameterStabilityAnalyzer(data_file)
+    analyzer.causal_edges = list(edges)
+    analyzer.edge_gains = all_gains
+
+    stability_folder = os.path.join(stage_dir, "06参数稳定性结果")
+    os.makedirs(stability_folder, exist_ok=True)
+    analyzer.create_output_folder = lambda: stability_folder
+
+    start = time.perf_counter()
+    stability_results = analyzer.calculate_parameter_stability()
+    metrics["参数稳定性_耗时秒"] = round(time.perf_counter() - start, 3)
+    if stability_results:
+        analyzer.save_results(stability_results)
+
+    metrics['边数'] = len(edges)
+    return metrics
+
+
+def stage_04_mediation(workspace, data_file, true_edges, options):
+    """04 贝叶斯中介分析：中介路径提取 + 贝叶斯中介效应估计"""
+    stage_dir = os.path.join(workspace, "04贝叶斯中介分析")
+    path_dir = os.path.join(stage_dir, "01中介路径分析结果")
+    result_dir = os.path.join(stage_dir, "02贝叶斯中介分析结果")
+    os.makedirs(path_dir, exist_ok=True)
+    os.makedirs(result_dir, exist_ok=True)
+
+    extractor = load_repo_module("04贝叶斯中介分析/01提取完整中介路径.py", "bench_path_extract")
+    edge_file = os.path.join(workspace, "02因果发现/06候选因果边集合/精简因果边列表.csv")
+    complete_paths = extractor.extract_complete_mediation_paths(edge_file, path_dir) or []
+
+    metrics = {'中介路径数': len(complete_paths), '计划分析路径数': 0, '分析路径数': 0, '失败路径数': 0}
+    summary_file = os.path.join(result_dir, '贝叶斯中介分析汇总.csv')
+
+    if complete_paths:
+        mediation = load_repo_module("04贝叶斯中介分析/02贝叶斯中介分析.py", "bench_mediation")
+        analyzer = mediation.BayesianMediationAnalysis(
+            data_path=data_file,
+            mediation_paths_file=os.path.join(path_dir, '完整中介路径结果.txt'),
+            max_paths=options['max_paths']
+        )
+        analyzer.output_dir = result_dir
+        metrics['计划分析路径数'] = len(analyzer.mediation_paths)
+        analyzer.run_full_analysis()
+        analyzer.generate_summary_report()
+        metrics['分析路径数'] = len(analyzer.results)
+        metrics['失败路径数'] = metrics['计划分析路径数'] - metrics['分析路径数']
+
+    if not os.path.exists(summary_file):
+        pd.DataFrame(columns=['路径ID', '路径描述', '间接效应均值', '间接效应95%HDI', '直接效应均值',
+                              '总效应均值', '中介比例', '显著性概率', '是否显著']).to_csv(
+            summary_file, index=False, encoding='utf-8-sig'
+        )
+    if metrics['失败路径数'] > 0:
+        raise StageFailure(f"{metrics['失败路径数']} / {metrics['计划分析路径数']} 条中介路径分析失败", metrics)
+    return metrics
+
+
+def stage_05_triangulation(workspace, data_file, true_edges, options):
+    """05 三角测量：四维评分 + 核心因果边识别"""
+    triangulation_module = load_repo_module("05三角测量/因果发现结果三角验证.py", "bench_triangulation")
+    triangulation = triangulation_module.EvidenceTriangulation(base_dir=workspace)
+
+    if not (triangulation.load_structural_data()
+            and triangulation.load_parameter_data()
+            and triangulation.load_mediation_data()):
+        raise RuntimeError("三角测量输入数据加载失败")
+
+    triangulation.calculate_structural_consistency_score()
+    triangulation.calculate_parameter_fitting_score()
+    triangulation.calculate_mediation_support_score()
+    triangulation.calculate_expert_orientation_score()
+    triangulation.calculate_triangulation_confidence()
+    core_edges = triangulation.identify_core_causal_edges()
+    triangulation.save_detailed_results()
+    triangulation.save_core_edges(core_edges)
+
+    core = read_edge_csv(os.path.join(triangulation.output_dir, "核心因果边集合.csv"))
+    return {'SHD': structural_hamming_distance(true_edges, core), '边数': len(core)}
+
+
+def stage_06_knowledge_graph(workspace, data_file, true_edges, options):
+    """06 知识图谱构建：加载各阶段结果并构建增强知识图谱"""
+    kg_module = load_repo_module("06知识图谱构建/01增强知识图谱.py", "bench_knowledge_graph")
+    kg = kg_module.EnhancedKnowledgeGraph(base_dir=os.path.join(workspace, "06知识图谱构建"))
+
+    if not kg.load_all_data():
+        raise RuntimeError("知识图谱输入数据加载失败")
+    kg.build_enhanced_knowledge_graph()
+
+    kg_edges = [(str(u), str(v)) for u, v in kg.knowledge_graph.edges()]
+    return {
+        'SHD': structural_hamming_distance(true_edges, kg_edges),
+        '边数': len(kg_edges),
+        '节点数': kg.knowledge_graph.number_of_nodes()
+    }
+
+
+STAGE_FUNCTIONS = {
+    '02': stage_02_causal_discovery,
+    '03': stage_03_parameter_learning,
+    '04': stage_04_mediation,
+    '05': stage_05_triangulation,
+    '06': stage_06_knowledge_graph,
+}
+
+
+class StageFailure(RuntimeError):
+    """阶段调用返回但结果不完整：记为失败，同时保留已得到的阶段指标"""
+
+    def __init__(self, message, metrics):
+        super().__init__(message)
+        self.metrics = metrics
+
+
+# ============================================================
+# 阶段执行与度量
+# ============================================================
+
+def _stage_worker(stage, workspace, data_file, true_edges, options, queue):
+    """子进程入口：运行单个阶段并回传耗时、峰值常驻内存和阶段指标"""
+    log_file = os.path.join(workspace, f"阶段{stage}_日志.txt")
+    with open(log_file, 'w', encoding='utf-8') as log:
+        sys.stdout = log
+        sys.stderr = log
+
+        # ru_maxrss 由内核统计，不给计时区间增加开销（tracemalloc 会拖慢每次分配）
+        start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        try:
+            metrics = STAGE_FUNCTIONS[stage](workspace, data_file, true_edges, options)
+            status, error = '成功', None
+        except StageFailure as e:
+            metrics, status, error = e.metrics, '失败', str(e)
+        except Exception as e:
+            metrics, status, error = {}, '失败', f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        elapsed = time.perf_counter() - start
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    queue.put({
+        '状态': status,
+        '错误': error,
+        '耗时秒': round(elapsed, 3),
+        '峰值内存MB': round(peak_rss / 1024, 2),
+        '起始常驻内存MB': round(start_rss / 1024, 2),
+        '阶段指标': metrics
+    })
+
+
+def run_stage(stage, workspace, data_file, true_edges, options, timeout):
+    """在独立子进程中运行一个阶段，保证内存峰值互不干扰并支持超时"""
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_stage_worker,
+                          args=(stage, workspace, data_file, true_edges, options, queue))
+    process.start()
+    process.join(timeout)
+
+    if process.is_alive():
+        process.terminate()
+        process.join()
+        return {'状态': '超时', '错误': f"超过 {timeout} 秒", '耗时秒': float(timeout),
+                '峰值内存MB': None, '起始常驻内存MB': None, '阶段指标': {}}
+
+    if queue.empty():
+        return {'状态': '失败', '错误': f"子进程异常退出 (exitcode={process.exitcode})",
+                '耗时秒': None, '峰值内存MB': None, '起始常驻内存MB': None, '阶段指标': {}}
+    return queue.get()
+
+
+def baseline_key(stage, rows, n_vars):
+    return f"{stage}|{rows}x{n_vars}"
+
+
+def compare_with_baseline(record, baseline):
+    """
+    与基线比较，返回回退原因列表（为空表示无回退）
+
+    判定规则:
+        - 耗时 / 峰值内存 超过基线 (1 + 容忍度) 倍，且绝对差超过噪声下限
+        - SHD 比基线更差
+    """
+    if not baseline or record['状态'] != '成功':
+        return []
+
+    reasons = []
+    for field, floor in [('耗时秒', TIME_NOISE_FLOOR), ('峰值内存MB', MEMORY_NOISE_FLOOR)]:
+        if field == '峰值内存MB' and baseline.get('内存口径') != MEMORY_METRIC:
+            continue
+        current, base = record.get(field), baseline.get(field)
+        if current is None or not base:
+            continue
+        if current > base * (1 + REGRESSION_TOLERANCE) and current - base > floor:
+            reasons.append(f"{field}: {base} → {current} (+{(current / base - 1) * 100:.0f}%)")
+
+    current_shd = record['阶段指标'].get('SHD')
+    base_shd = baseline.get('SHD')
+    if current_shd is not None and base_shd is not None and current_shd > base_shd:
+        reasons.append(f"SHD: {base_shd} → {current_shd}")
+
+    return reasons
+
+
+def load_baseline():
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_baseline(baseline):
+    os.makedirs(RESULT_DIR, exist_ok=True)
+    with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2)
+
+
+def run_benchmark(rows_list, vars_list, stages, timeout, max_paths, seed, keep_workspace,
+                  discovery_options=None):
+    """
+    执行完整的规模扫描
+
+    Args:
+        discovery_options: 02阶段入口参数（candidate_method / max_candidates / n_jobs / time_budget）
+    """
+    baseline = load_baseline()
+    records = []
+    timed_out = []  # (stage, rows, vars)：更大的规模将直接跳过
+
+    workspace_root = os.path.join(RESULT_DIR, "工作区")
+    options = {'max_paths': max_paths, **(discovery_options or {})}
+
+    for n_vars in sorted(vars_list):
+        for rows in sorted(rows_list):
+            print(f"\n{'=' * 60}")
+            print(f"规模: {rows} 行 × {n_vars} 变量")
+            print(f"{'=' * 60}")
+
+            workspace = os.path.join(workspace_root, f"r{rows}_v{n_vars}")
+            if os.path.exists(workspace):
+                shutil.rmtree(workspace)
+
+            data_dir = os.path.join(workspace, "01数据预处理")
+            data_file, true_edges = generate_cohort(rows, n_vars, data_dir, seed=seed)
+            print(f"✓ 合成队列已生成，真实因果边 {len(true_edges)} 条")
+
+            upstream_ok = True
+            for stage in stages:
+                record = {
+                    '阶段': stage,
+                    '阶段名称': STAGE_NAMES[stage],
+                    '样本数': rows,
+                    '变量数': n_vars,
+                    '真实边数': len(true_edges)
+                }
+
+                skipped_by = next(((s, r, v) for s, r, v in timed_out
+                                   if s == stage and rows >= r and n_vars >= v), None)
+                if not upstream_ok or skipped_by:
+                    reason = "上游阶段未成功" if not upstream_ok else \
+                        f"较小规模 {skipped_by[1]}×{skipped_by[2]} 已超时"
+                    record.update({'状态': '跳过', '错误': reason, '耗时秒': None,
+                                   '峰值内存MB': None, '起始常驻内存MB': None,
+                                   '阶段指标': {}, '回退': []})
+                    print(f"  - 阶段{stage} {STAGE_NAMES[stage]}: 跳过（{reason}）")
+                    records.append(record)
+                    upstream_ok = False
+                    continue
+
+                result = run_stage(stage, workspace, data_file, true_edges, options, timeout)
+                record.update(result)
+                record['回退'] = compare_with_baseline(
+                    record, baseline.get(baseline_key(stage, rows, n_vars)))
+                records.append(record)
+
+                shd = record['阶段指标'].get('SHD')
+                shd_text = f", SHD={shd}" if shd is not None else ""
+                mark = {'成功': '✓', '超时': '⏱', '失败': '❌'}[record['状态']]
+                print(f"  {mark} 阶段{stage} {STAGE_NAMES[stage]}: {record['状态']}, "
+                      f"耗时 {record['耗时秒']}s, 峰值内存 {record['峰值内存MB']}MB{shd_text}")
+                if record['错误']:
+                    print(f"      错误: {record['错误']}")
+                for reason in record['回退']:
+                    print(f"      ⚠ 性能回退 - {reason}")
+
+                if record['状态'] == '超时':
+                    timed_out.append((stage, rows, n_vars))
+                if record['状态'] != '成功':
+                    upstream_ok = False
+
+            if not keep_workspace:
+                shutil.rmtree(workspace, ignore_errors=True)
+
+    return records, baseline
+
+
+def save_report(records):
+    """保存本次基准测试结果（JSON + CSV）"""
+    os.makedirs(RESULT_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    json_file = os.path.join(RESULT_DIR, f"基准报告_{timestamp}.json")
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=2, default=str)
+
+    rows = []
+    for record in records:
+        rows.append({
+            '阶段': record['阶段'],
+            '阶段名称': record['阶段名称'],
+            '样本数': record['样本数'],
+            '变量数': record['变量数'],
+            '状态': record['状态'],
+            '耗时秒': record['耗时秒'],
+            '峰值内存MB': record['峰值内存MB'],
+            '起始常驻内存MB': record['起始常驻内存MB'],
+            'SHD': record['阶段指标'].get('SHD'),
+            '真实边数': record['真实边数'],
+            '失败路径数': record['阶段指标'].get('失败路径数'),
+            '回退': '; '.join(record['回退'])
+        })
+    csv_file = os.path.join(RESULT_DIR, f"基准报告_{timestamp}.csv")
+    pd.DataFrame(rows).to_csv(csv_file, index=False, encoding='utf-8-sig')
+    return json_file, csv_file
+
+
+def update_baseline(records, baseline):
+    """用本次成功的记录覆盖基线"""
+    for record in records:
+        if record['状态'] != '成功':
+            continue
+        baseline[baseline_key(record['阶段'], record['样本数'], record['变量数'])] = {
+            '耗时秒': record['耗时秒'],
+            '峰值内存MB': record['峰值内存MB'],
+            '内存口径': MEMORY_METRIC,
+            'SHD': record['阶段指标'].get('SHD'),
+            '更新时间': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+    save_baseline(baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="因果发现流水线规模基准测试")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help="样本数列表")
+    parser.add_argument('--vars', type=int, nargs='+', default=DEFAULT_VARS, help="变量数列表")
+    parser.add_argument('--stages', nargs='+', default=ALL_STAGES, choices=ALL_STAGES, help="要运行的阶段")
+    parser.add_argument('--timeout', type=int, default=3600, help="单个阶段的超时时间（秒）")
+    parser.add_argument('--max-paths', type=int, default=5, help="04阶段最多分析的中介路径数")
+    parser.add_argument('--seed', type=int, default=42, help="合成队列随机种子")
+    parser.add_argument('--candidate-parents', choices=['mi', 'none'], default='mi',
+                        help="02阶段爬山/GES的候选父节点筛选（none 为全量搜索）")
+    parser.add_argument('--max-candidates', type=int, default=10, help="02阶段每个节点的候选父节点上限")
+    parser.add_argument('--n-jobs', type=int, default=None, help="02阶段GES并行评分的进程数")
+    parser.add_argument('--time-budget', type=float, default=None, help="02阶段爬山/GES的时间预算（秒）")
+    parser.add_argument('--keep-workspace', action='store_true', help="保留各规模的工作区目录")
+    parser.add_argument('--update-baseline', action='store_true', help="以本次结果更新基线")
+    args = parser.parse_args()
+
+    stages = [s for s in ALL_STAGES if s in args.stages]
+
+    print("=" * 60)
+    print("因果发现流水线 - 规模基准测试")
+    print("=" * 60)
+    print(f"样本数: {sorted(args.rows)}")
+    print(f"变量数: {sorted(args.vars)}")
+    print(f"阶段: {', '.join(f'{s}{STAGE_NAMES[s]}' for s in stages)}")
+    print(f"单阶段超时: {args.timeout} 秒")
+
+    discovery_options = {
+        'candidate_method': None if args.candidate_parents == 'none' else args.candidate_parents,
+        'max_candidates': args.max_candidates,
+        'n_jobs': args.n_jobs,
+        'time_budget': args.time_budget
+    }
+    records, baseline = run_benchmark(args.rows, args.vars, stages, args.timeout,
+                                      args.max_paths, args.seed, args.keep_workspace, discovery_options)
+    json_file, csv_file = save_report(records)
+
+    regressions = [r for r in records if r['回退']]
+    print(f"\n{'=' * 60}")
+    print("基准测试完成")
+    print(f"{'=' * 60}")
+    print(f"  - 成功: {sum(1 for r in records if r['状态'] == '成功')} / {len(records)}")
+    print(f"  - 性能回退: {len(regressions)}")
+    print(f"  - JSON报告: {json_file}")
+    print(f"  - CSV报告: {csv_file}")
+
+    if args.update_baseline:
+        update_baseline(records, baseline)
+        print(f"✓ 基线已更新: {BASELINE_FILE}")
+    elif not baseline:
+        print("⚠ 尚无基线，可使用 --update-baseline 保存本次结果作为基线")
+
+    if regressions and not args.update_baseline:
+        print("\n❌ 检测到性能回退:")
+        for r in regressions:
+            print(f"  阶段{r['阶段']} {r['样本数']}×{r['变量数']}: {'; '.join(r['回退'])}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
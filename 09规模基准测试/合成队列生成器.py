@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成队列生成器 (Synthetic Cohort Generator)
+从已知的随机DAG中采样二值化患者队列，用于规模基准测试
+
+变量按 疾病_ / 药物_ / 检验_ 前缀命名，真实DAG的边方向遵循
+疾病 → 药物 → 检验 的领域层级，使三角测量中的领域规则同样适用。
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# 领域层级（按因果先后顺序）
+DOMAIN_TIERS = ['疾病', '药物', '检验']
+
+
+def build_variable_names(n_vars, tier_ratio=(0.34, 0.33, 0.33)):
+    """
+    按领域层级生成变量名
+
+    Args:
+        n_vars: 变量总数
+        tier_ratio: 疾病/药物/检验 三类变量的占比
+
+    Returns:
+        list: 变量名列表（已按层级排好序，即一个合法的拓扑序）
+    """
+    counts = [int(round(n_vars * r)) for r in tier_ratio]
+    counts[-1] = n_vars - sum(counts[:-1])
+
+    names = []
+    for prefix, count in zip(DOMAIN_TIERS, counts):
+        names.extend(f"{prefix}_合成{i + 1:04d}" for i in range(count))
+    return names
+
+
+def generate_random_dag(names, expected_parents=2.0, max_parents=5, seed=42):
+    """
+    生成遵循领域层级的随机DAG
+
+    names 的顺序即拓扑序，每个节点只从排在它前面的节点中选父节点，
+    因此跨层级的边一定是 疾病→药物、疾病→检验 或 药物→检验。
+
+    Args:
+        names: 变量名列表（拓扑序）
+        expected_parents: 每个节点的期望父节点数
+        max_parents: 单个节点的最大父节点数
+        seed: 随机种子
+
+    Returns:
+        list: 真实因果边列表 [(source, target), ...]
+    """
+    rng = np.random.default_rng(seed)
+    edges = []
+
+    for j in range(1, len(names)):
+        n_parents = min(rng.poisson(expected_parents), max_parents, j)
+        if n_parents == 0:
+            continue
+        # 偏向近邻节点，避免远距离边过多导致结构不现实
+        weights = np.exp(-np.arange(j)[::-1] / max(j / 4, 1.0))
+        weights /= weights.sum()
+        parents = rng.choice(j, size=n_parents, replace=False, p=weights)
+        for i in sorted(parents):
+            edges.append((names[i], names[j]))
+
+    return edges
+
+
+def sample_binary_cohort(names, edges, n_rows, seed=42):
+    """
+    按拓扑序对二值队列进行前向采样
+
+    每个节点的条件分布为 logistic 形式:
+        P(X=1 | pa) = sigmoid(b + Σ w_i · pa_i)
+    截距取负值使阳性率低于 0.5，与真实病历数据的稀疏性一致
+    （同时避免各阶段 "大于中位数" 二值化把整列变成常数）。
+
+    Args:
+        names: 变量名列表（拓扑序）
+        edges: 真实因果边列表
+        n_rows: 样本数
+        seed: 随机种子
+
+    Returns:
+        pd.DataFrame: 以 RECORD_ID 为索引的 float32 二值数据
+    """
+    rng = np.random.default_rng(seed + 1)
+    index = {name: i for i, name in enumerate(names)}
+    parents_of = {name: [] for name in names}
+    for source, target in edges:
+        parents_of[target].append(index[source])
+
+    data = np.zeros((n_rows, len(names)), dtype=np.int8)
+
+    for j, name in enumerate(names):
+        intercept = rng.uniform(-2.5, -1.0)
+        logits = np.full(n_rows, intercept, dtype=np.float64)
+
+        parents = parents_of[name]
+        if parents:
+            signs = rng.choice([-1.0, 1.0], size=len(parents), p=[0.3, 0.7])
+            weights = signs * rng.uniform(0.8, 2.0, size=len(parents))
+            logits += data[:, parents].astype(np.float64) @ weights
+
+        probs = 1.0 / (1.0 + np.exp(-logits))
+        data[:, j] = (rng.random(n_rows) < probs).astype(np.int8)
+
+    record_ids = [f"SYN{i:08d}-1" for i in range(n_rows)]
+    df = pd.DataFrame(data.astype(np.float32), columns=names, index=record_ids)
+    df.index.name = 'RECORD_ID'
+    return df
+
+
+def structural_hamming_distance(true_edges, estimated_edges):
+    """
+    计算结构汉明距离 (SHD)
+
+    SHD = 缺失边 + 多余边 + 方向错误边（反向边只计1次）
+
+    Args:
+        true_edges: 真实DAG的边
+        estimated_edges: 估计得到的边
+
+    Returns:
+        int: SHD
+    """
+    true_set = set(map(tuple, true_edges))
+    est_set = set(map(tuple, estimated_edges))
+
+    true_skeleton = {frozenset(e) for e in true_set}
+    est_skeleton = {frozenset(e) for e in est_set}
+
+    missing = len(true_skeleton - est_skeleton)
+    extra = len(est_skeleton - true_skeleton)
+    reversed_edges = sum(
+        1 for (u, v) in est_set
+        if (v, u) in true_set and (u, v) not in true_set
+    )
+    return missing + extra + reversed_edges
+
+
+def generate_cohort(n_rows, n_vars, output_dir, expected_parents=2.0,
+                    max_parents=5, seed=42):
+    """
+    生成一个合成队列并保存到输出目录
+
+    保存内容:
+        - 合成队列数据.csv (与 缩减数据_规格.csv 同格式)
+        - 真实因果边列表.csv
+        - 队列元信息.json
+
+    Returns:
+        tuple: (数据文件路径, 真实因果边列表)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    names = build_variable_names(n_vars)
+    edges = generate_random_dag(names, expected_parents, max_parents, seed)
+    df = sample_binary_cohort(names, edges, n_rows, seed)
+
+    data_file = os.path.join(output_dir, "合成队列数据.csv")
+    df.to_csv(data_file, encoding='utf-8', float_format='%.1f')
+
+    edges_file = os.path.join(output_dir, "真实因果边列表.csv")
+    pd.DataFrame(edges, columns=['源节点', '目标节点']).to_csv(
+        edges_file, index=False, encoding='utf-8-sig'
+    )
+
+    meta = {
+        "样本数": int(n_rows),
+        "变量数": int(n_vars),
+        "真实边数": len(edges),
+        "期望父节点数": expected_parents,
+        "最大父节点数": max_parents,
+        "随机种子": seed,
+        "阳性率": {name: float(df[name].mean()) for name in names[:10]}
+    }
+    with open(os.path.join(output_dir, "队列元信息.json"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    return data_file, edges
+
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    out = os.path.join(script_dir, "合成队列", "r1000_v30")
+    data_file, true_edges = generate_cohort(1000, 30, out)
+    print(f"✓ 合成队列已生成: {data_file}")
+    print(f"✓ 真实因果边数量: {len(true_edges)}")